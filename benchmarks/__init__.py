@@ -0,0 +1 @@
+"""Performance benchmarks for uTidylib, run with ``python -m benchmarks.<name>``."""
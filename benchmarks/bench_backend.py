@@ -0,0 +1,55 @@
+"""
+Compare the native and ctypes backends.
+
+The native backend needs the optional C extension to be built. Run from
+the repository root::
+
+    python -m benchmarks.bench_backend
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import tidy
+import tidy.lib
+
+
+def measure(text: bytes, repeat: int) -> float:
+    config = tidy.TidyConfig(tidy_mark=False)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with config.parseString(text) as doc:
+            doc.getvalue()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    inputs = {
+        "small": b"<p>Hello <b>world</b>",
+        "large": b"<html>\n" + b"<p>Paragraph with <i>text</i>\n" * 2000,
+    }
+    default = tidy.lib.get_backend()
+    backends = [
+        name for name in tidy.lib.BACKENDS if name == "ctypes" or default == "native"
+    ]
+    print(f"{'input':<8}" + "".join(f"{name:>12}" for name in backends))
+    try:
+        for label, text in inputs.items():
+            repeat = args.repeat if label == "small" else max(args.repeat // 100, 1)
+            timings = []
+            for name in backends:
+                tidy.lib.set_backend(name)
+                timings.append(measure(text, repeat))
+            print(f"{label:<8}" + "".join(f"{t * 1e6:>10.1f}us" for t in timings))
+    finally:
+        tidy.lib.set_backend(default)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare throughput of serial, threaded and multiprocess batch tidying.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_batch
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import time
+
+import tidy
+
+
+def generate_page(rng: random.Random, paragraphs: int) -> bytes:
+    """Generate a sloppy page resembling crawled content."""
+    body = "".join(
+        f"<p class=c{rng.randrange(10)}>Paragraph {index} with <b>bold"
+        f" <i>text</b></i> and <a href=/page/{rng.randrange(1000)}>a link</a>\n"
+        for index in range(rng.randrange(paragraphs // 2, paragraphs))
+    )
+    return f"<html><title>Page</title>\n{body}".encode()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--paragraphs", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=16)
+    args = parser.parse_args()
+
+    rng = random.Random(0)  # noqa: S311
+    corpus = [generate_page(rng, args.paragraphs) for _ in range(args.documents)]
+    size = sum(len(page) for page in corpus)
+    print(f"{args.documents} documents, {size / 1e6:.1f} MB, {args.workers} workers")
+    print(f"{'mode':<10} {'time':>10} {'docs/s':>10} {'MB/s':>8}")
+
+    def report(name: str, elapsed: float) -> None:
+        print(
+            f"{name:<10} {elapsed:>9.2f}s {args.documents / elapsed:>10.0f}"
+            f" {size / elapsed / 1e6:>8.1f}"
+        )
+
+    config = tidy.TidyConfig(tidy_mark=False)
+    start = time.perf_counter()
+    for page in corpus:
+        config.parseString(page).getvalue()
+    report("serial", time.perf_counter() - start)
+
+    for mode in ("thread", "process"):
+        start = time.perf_counter()
+        for _ in tidy.parse_many(
+            corpus, args.workers, mode, chunksize=args.chunksize, config=config
+        ):
+            pass
+        report(mode, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
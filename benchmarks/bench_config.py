@@ -0,0 +1,66 @@
+"""
+Measure per-document setup cost with and without a TidyConfig profile or pool.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_config
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import tidy
+from tidy.lib import docfactory
+
+OPTIONS: tidy.lib.OPTION_DICT_TYPE = {
+    "add_xml_decl": True,
+    "alt_text": "image",
+    "char_encoding": "utf8",
+    "doctype": "strict",
+    "drop_empty_paras": True,
+    "indent": "auto",
+    "indent_spaces": 2,
+    "logical_emphasis": True,
+    "newline": "LF",
+    "output_xhtml": True,
+    "quote_nbsp": False,
+    "show_warnings": False,
+    "tidy_mark": False,
+    "wrap": 0,
+}
+
+
+def measure(label: str, repeat: int, func: tidy.lib.Callable[[], object]) -> None:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / repeat * 1e6:>10.1f}us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5000)
+    args = parser.parse_args()
+
+    config = tidy.TidyConfig(**OPTIONS)
+    text = b"<p>Hello <b>world</b>"
+    print(f"{len(OPTIONS)} options, {args.repeat} documents")
+    measure(
+        "create (kwargs)",
+        args.repeat,
+        lambda: docfactory.create(config=None, **OPTIONS),
+    )
+    measure("create (config)", args.repeat, lambda: docfactory.create(config=config))
+    measure(
+        "parseString (kwargs)", args.repeat, lambda: tidy.parseString(text, **OPTIONS)
+    )
+    measure("parseString (config)", args.repeat, lambda: config.parseString(text))
+    pool = tidy.DocumentPool(config)
+    measure("parseString (pool)", args.repeat, lambda: pool.parseString(text).close())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compare parsed text reports to structured diagnostics.
+
+Measures time to tidy a warning-heavy document and collect its messages,
+and memory held by the collected messages. Run from the repository root::
+
+    python -m benchmarks.bench_diagnostics
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+
+import tidy
+from benchmarks.bench_errors import warning_heavy
+
+
+def collect(text: str, *, diagnostics: bool) -> object:
+    with tidy.parseString(text, diagnostics=diagnostics) as doc:
+        return doc.diagnostics if diagnostics else doc.errors
+
+
+def run(text: str, *, diagnostics: bool, repeat: int) -> tuple[float, int, int]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        collect(text, diagnostics=diagnostics)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    messages = collect(text, diagnostics=diagnostics)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(messages)  # type: ignore[arg-type]
+    return elapsed / repeat, size, count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = warning_heavy(args.paragraphs)
+    print(f"{'mode':<12} {'time/doc':>12} {'memory':>10} {'messages':>10} {'B/msg':>8}")
+    for name, diagnostics in (("report", False), ("diagnostics", True)):
+        elapsed, size, count = run(text, diagnostics=diagnostics, repeat=args.repeat)
+        print(
+            f"{name:<12} {elapsed * 1000:>10.2f}ms {size / 1024:>8.0f}KB"
+            f" {count:>10} {size / max(count, 1):>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Compare error collection through Python callbacks and native buffers.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_errors
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import tidy
+import tidy.lib
+
+
+def warning_heavy(paragraphs: int) -> str:
+    """Generate markup producing several warnings per paragraph."""
+    return (
+        "<html>\n"
+        + "<p align=center><img src=a.png><center>x</center> text</p>\n" * paragraphs
+    )
+
+
+def run(text: str, *, buffered: bool, repeat: int) -> tuple[float, int, int]:
+    callbacks = 0
+    original = tidy.lib._Sink.putByte
+
+    def counting(self: tidy.lib._Sink, byte: bytes) -> None:
+        nonlocal callbacks
+        callbacks += 1
+        original(self, byte)
+
+    tidy.lib._Sink.putByte = counting  # type: ignore[method-assign]
+    tidy.lib.sinkfactory.buffered = buffered
+    try:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            errors = tidy.parseString(text).errors
+        elapsed = time.perf_counter() - start
+    finally:
+        tidy.lib._Sink.putByte = original  # type: ignore[method-assign]
+        tidy.lib.sinkfactory.buffered = True
+    return elapsed / repeat, callbacks // repeat, len(errors)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = warning_heavy(args.paragraphs)
+    print(f"{'mode':<10} {'time/doc':>12} {'callbacks':>12} {'messages':>10}")
+    for name, buffered in (("callback", False), ("buffer", True)):
+        elapsed, callbacks, messages = run(text, buffered=buffered, repeat=args.repeat)
+        print(f"{name:<10} {elapsed * 1000:>10.2f}ms {callbacks:>12} {messages:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Measure per-call overhead of TidyLib functions called through ctypes.
+
+Compares functions looked up on every call without declared types, as
+done by previous versions, to the typed functions bound by the loader.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_ffi
+"""
+
+from __future__ import annotations
+
+import argparse
+import ctypes
+import timeit
+from typing import Any
+
+import tidy.lib
+
+
+class UntypedLoader:
+    """Loader resolving untyped functions on every access."""
+
+    def __init__(self, lib: ctypes.CDLL) -> None:
+        self.lib = lib
+
+    def __getattr__(self, name: str) -> Any:  # noqa: ANN401
+        return getattr(self.lib, f"tidy{name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=200000)
+    args = parser.parse_args()
+
+    typed = tidy.lib._tidy
+    # Separate handle of the library, its functions have no declared types
+    untyped = UntypedLoader(ctypes.CDLL(typed.lib._name))
+    untyped.lib.tidyCreate.restype = ctypes.POINTER(ctypes.c_void_p)
+    option = typed.OptGetIdForName(b"output-encoding")
+    buffer = tidy.lib._TidyBuffer()
+    typed.BufInit(ctypes.byref(buffer))
+
+    print(f"{'function':<18} {'untyped':>10} {'typed':>10}")
+    for name, args_factory in (
+        ("OptGetIdForName", lambda _: (b"output-encoding",)),
+        ("OptGetEncName", lambda cdoc: (cdoc, option)),
+        ("BufClear", lambda _: (ctypes.byref(buffer),)),
+    ):
+        timings = []
+        for loader in (untyped, typed):
+            cdoc = loader.Create()
+            call_args = args_factory(cdoc)
+            # Functions are looked up on the loader as tidy.lib does
+            elapsed = timeit.timeit(
+                f"loader.{name}(*call_args)",
+                globals={"loader": loader, "call_args": call_args},
+                number=args.number,
+            )
+            loader.Release(cdoc)
+            timings.append(elapsed / args.number * 1e9)
+        print(f"{name:<18} {timings[0]:>8.0f}ns {timings[1]:>8.0f}ns")
+    typed.BufFree(ctypes.byref(buffer))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare batched fragment tidying to one document per fragment.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_fragments
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import TYPE_CHECKING
+
+import tidy
+from benchmarks.corpus import fragment
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# Share of fragments with markup TidyLib warns about
+BROKEN_RATIO = 0.1
+
+
+def fragments(count: int, broken: float, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)  # noqa: S311
+    result = []
+    for _ in range(count):
+        text = fragment(rng)
+        if rng.random() < broken:
+            text = text.replace("</b>", "")
+        result.append(text)
+    return result
+
+
+def per_document(texts: list[str]) -> int:
+    size = 0
+    for text in texts:
+        with tidy.parseString(text, show_body_only=1) as doc:
+            size += len(doc.getvalue())
+    return size
+
+
+def pooled(texts: list[str]) -> int:
+    size = 0
+    with tidy.DocumentPool(show_body_only=1, size=1) as pool:
+        for text in texts:
+            with pool.parseString(text) as doc:
+                size += len(doc.getvalue())
+    return size
+
+
+def batched(batch_size: int) -> Callable[[list[str]], int]:
+    def run(texts: list[str]) -> int:
+        return sum(
+            len(result.output)
+            for result in tidy.parse_fragments(texts, batch_size=batch_size)
+        )
+
+    return run
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=5000)
+    args = parser.parse_args()
+
+    modes = {
+        "parseString": per_document,
+        "DocumentPool": pooled,
+        "batch 10": batched(10),
+        "batch 100": batched(100),
+        "batch 1000": batched(1000),
+    }
+    print(f"{'input':<8} {'mode':<14} {'fragments/s':>12}")
+    for label, broken in (("clean", 0.0), ("mixed", BROKEN_RATIO)):
+        texts = fragments(args.count, broken)
+        for name, func in modes.items():
+            start = time.perf_counter()
+            func(texts)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<8} {name:<14} {len(texts) / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
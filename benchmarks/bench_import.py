@@ -0,0 +1,72 @@
+"""
+Measure the cost of importing tidy and of tidying the first document.
+
+Every measurement runs in a fresh interpreter. Run from the repository root::
+
+    python -m benchmarks.bench_import
+
+Use ``--max-import`` to fail when importing takes longer than the given
+number of milliseconds, for example in CI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SCRIPT = """
+import time
+start = time.perf_counter()
+import tidy
+imported = time.perf_counter()
+tidy.parseString("<p>Hello")
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def run(repeat: int, environ: dict[str, str]) -> tuple[float, float]:
+    """Return median import and first document times in milliseconds."""
+    imports = []
+    first_uses = []
+    for _ in range(repeat):
+        output = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", SCRIPT],
+            env={**os.environ, **environ},
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        imported, first_use = output.split()
+        imports.append(float(imported) * 1000)
+        first_uses.append(float(first_use) * 1000)
+    return statistics.median(imports), statistics.median(first_uses)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--max-import", type=float, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = os.path.join(tmpdir, "library")
+        # Populate the library path cache
+        run(1, {"TIDY_LIBRARY_CACHE": cache})
+        print(f"{'library lookup':<16} {'import':>10} {'first use':>10}")
+        for name, environ in (
+            ("search", {"TIDY_LIBRARY_CACHE": ""}),
+            ("cached", {"TIDY_LIBRARY_CACHE": cache}),
+        ):
+            imported, first_use = run(args.repeat, environ)
+            print(f"{name:<16} {imported:>8.2f}ms {first_use:>8.2f}ms")
+
+    if args.max_import is not None and imported > args.max_import:
+        sys.exit(f"Importing took {imported:.2f}ms, limit is {args.max_import}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compare extraction from the document tree to serializing and parsing again.
+
+Links, the title and text are extracted from a tidied page, either through
+:mod:`tidy.tree` or from :meth:`tidy.Document.getvalue` parsed by
+:mod:`html.parser`. Run from the repository root::
+
+    python -m benchmarks.bench_tree
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from html.parser import HTMLParser
+
+import tidy
+from benchmarks.corpus import clean_page
+
+# (links, title, text length)
+EXTRACT_TYPE = tuple[list[str | None], str, int]
+
+
+class Extractor(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.links: list[str | None] = []
+        self.title = ""
+        self.text: list[str] = []
+        self.stack: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag == "a":
+            self.links.append(dict(attrs).get("href"))
+        self.stack.append(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self.stack:
+            del self.stack[self.stack.index(tag) :]
+
+    def handle_data(self, data: str) -> None:
+        if self.stack and self.stack[-1] == "title":
+            self.title += data
+        elif "body" in self.stack:
+            self.text.append(data)
+
+
+def from_tree(doc: tidy.Document) -> EXTRACT_TYPE:
+    assert doc.head is not None
+    assert doc.body is not None
+    return (
+        [link.get("href") for link in doc.iter_elements("a")],
+        doc.head.text(),
+        len(doc.body.text()),
+    )
+
+
+def from_output(doc: tidy.Document) -> EXTRACT_TYPE:
+    parser = Extractor()
+    parser.feed(doc.gettext())
+    parser.close()
+    return parser.links, parser.title, len("".join(parser.text))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    page = clean_page(random.Random(0), args.sections)  # noqa: S311
+    modes = {"tree": from_tree, "getvalue + html.parser": from_output}
+    print(f"{'mode':<24} {'time/doc':>12} {'links':>8}")
+    for name, func in modes.items():
+        elapsed = 0.0
+        for _ in range(args.repeat):
+            with tidy.parseString(page, tidy_mark=0) as doc:
+                start = time.perf_counter()
+                links, _title, _text = func(doc)
+                elapsed += time.perf_counter() - start
+        print(f"{name:<24} {elapsed / args.repeat * 1e3:>10.2f}ms {len(links):>8}")
+
+
+if __name__ == "__main__":
+    main()
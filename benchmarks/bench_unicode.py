@@ -0,0 +1,79 @@
+"""
+Compare tidying Unicode text to encoding and decoding it in Python.
+
+The text mode passes a string to :func:`tidy.parseString` and reads the
+result with :meth:`tidy.Document.gettext`, the bytes mode encodes the input
+and decodes :meth:`tidy.Document.getvalue` instead. Peak memory counts
+Python allocations only, TidyLib memory is the same in both modes. Run from
+the repository root::
+
+    python -m benchmarks.bench_unicode
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import tracemalloc
+from typing import TYPE_CHECKING
+
+import tidy
+from benchmarks.corpus import ACCENTED, KANA, clean_page
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# Sections of a generated page per megabyte of ASCII text
+SECTIONS_PER_MB = 970
+
+
+def text_mode(text: str) -> str:
+    with tidy.parseString(text, tidy_mark=0) as doc:
+        return doc.gettext()
+
+
+def bytes_mode(text: str) -> str:
+    with tidy.parseString(text.encode("utf-8"), tidy_mark=0) as doc:
+        return doc.getvalue().decode("utf-8")
+
+
+def measure(func: Callable[[str], str], text: str, repeat: int) -> tuple[float, int]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    func(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=float, default=4, help="megabytes of text")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sections = int(args.size * SECTIONS_PER_MB)
+    inputs = {
+        "ascii": "",
+        "accented": ACCENTED,
+        "kana": KANA,
+    }
+    modes = {"text": text_mode, "bytes": bytes_mode}
+    print(f"{'input':<10} {'MB':>6} {'mode':<6} {'time':>10} {'peak MB':>9}")
+    for label, extra in inputs.items():
+        text = clean_page(random.Random(0), sections, extra)  # noqa: S311
+        size = len(text.encode("utf-8")) / 1e6
+        for name, func in modes.items():
+            elapsed, peak = measure(func, text, args.repeat)
+            print(
+                f"{label:<10} {size:>6.1f} {name:<6}"
+                f" {elapsed * 1e3:>8.1f}ms {peak / 1e6:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare validation to full tidying when only the report is needed.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_validate
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import TYPE_CHECKING
+
+import tidy
+from benchmarks.bench_errors import warning_heavy
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+def tidy_report(text: str) -> int:
+    with tidy.parseString(text) as doc:
+        doc.getvalue()
+        return len(doc.errors)
+
+
+def validate_report(text: str) -> int:
+    return len(tidy.validate(text).report)
+
+
+def validate_diagnostics(text: str) -> int:
+    return len(tidy.validate(text, diagnostics=True).report)
+
+
+def measure(func: Callable[[str], int], text: str, repeat: int) -> tuple[float, int]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        messages = func(text)
+    return (time.perf_counter() - start) / repeat, messages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    inputs = {
+        "clean": "<html>\n" + "<p>Paragraph with <i>text</i></p>\n" * 2000,
+        "warnings": warning_heavy(500),
+    }
+    modes = {
+        "parseString": tidy_report,
+        "validate": validate_report,
+        "diagnostics": validate_diagnostics,
+    }
+    print(f"{'input':<10} {'mode':<12} {'time/doc':>12} {'messages':>10}")
+    for label, text in inputs.items():
+        for name, func in modes.items():
+            elapsed, messages = measure(func, text, args.repeat)
+            print(f"{label:<10} {name:<12} {elapsed * 1000:>10.2f}ms {messages:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Synthetic documents for benchmarks.
+
+The documents are generated from a seeded random generator, so every run
+tidies the same input.
+"""
+
+from __future__ import annotations
+
+import random
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    import tidy.lib
+
+# fmt: off
+WORDS = (
+    "lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing",
+    "elit", "sed", "do", "eiusmod", "tempor", "incididunt", "ut", "labore",
+    "et", "dolore", "magna", "aliqua",
+)
+# fmt: on
+# Share of words with an extra character appended
+EXTRA_RATIO = 0.2
+ACCENTED = "éèàùçôîëüñ"
+KANA = "あいうえおかきくけこさしすせそ"
+
+
+class Corpus(NamedTuple):
+    """Set of documents tidied with the same options."""
+
+    name: str
+    documents: list[bytes]
+    options: tidy.lib.OPTION_DICT_TYPE
+
+
+def _text(rng: random.Random, words: int, extra: str = "") -> str:
+    result = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        if extra and rng.random() < EXTRA_RATIO:
+            word += rng.choice(extra)
+        result.append(word)
+    return " ".join(result)
+
+
+def fragment(rng: random.Random) -> str:
+    """Generate a short fragment of markup, like a comment."""
+    return f"<p>{_text(rng, 8)} <b>{_text(rng, 3)}</b> {_text(rng, 4)}</p>"
+
+
+def clean_page(rng: random.Random, sections: int, extra: str = "") -> str:
+    """Generate a valid page of headings, paragraphs, lists and tables."""
+    parts = [
+        "<!DOCTYPE html>\n<html>\n<head><title>Page</title></head>\n<body>\n",
+    ]
+    for index in range(sections):
+        parts.append(f"<h2>{_text(rng, 4, extra)}</h2>\n")
+        parts.extend(
+            f'<p>{_text(rng, 30, extra)} <a href="/{index}">{_text(rng, 2)}</a></p>\n'
+            for _ in range(3)
+        )
+        parts.append("<ul>\n")
+        parts.extend(f"<li>{_text(rng, 6, extra)}</li>\n" for _ in range(4))
+        parts.append("</ul>\n<table>\n")
+        parts.extend(
+            f"<tr><td>{_text(rng, 2)}</td><td>{rng.randint(0, 1000)}</td></tr>\n"
+            for _ in range(3)
+        )
+        parts.append("</table>\n")
+    parts.append("</body>\n</html>\n")
+    return "".join(parts)
+
+
+def broken_page(rng: random.Random, sections: int) -> str:
+    """Generate a page of broken and obsolete markup causing many warnings."""
+    parts = ["<html>\n"]
+    for _ in range(sections):
+        parts.extend(
+            (
+                f"<center><font color=red>{_text(rng, 5)}</center>\n",
+                f"<p align=left>{_text(rng, 20)} <b><i>{_text(rng, 3)}</b></i>\n",
+                f"<img src={rng.randint(0, 99)}.png><table><tr><td>{_text(rng, 2)}\n",
+                f"<ul><li>{_text(rng, 4)}<li>{_text(rng, 4)}</table>\n",
+            )
+        )
+    return "".join(parts)
+
+
+def generate(scale: float = 1.0, seed: int = 0) -> list[Corpus]:
+    """
+    Generate the benchmark corpora.
+
+    :param scale: multiplier of the sizes of large pages
+    """
+    rng = random.Random(seed)  # noqa: S311
+    sections = max(int(200 * scale), 1)
+    return [
+        Corpus(
+            "fragment",
+            [fragment(rng).encode() for _ in range(100)],
+            {"show_body_only": 1},
+        ),
+        Corpus("clean_page", [clean_page(rng, sections).encode()], {}),
+        Corpus("broken_page", [broken_page(rng, sections).encode()], {}),
+        Corpus(
+            "latin1_page",
+            [clean_page(rng, sections, ACCENTED).encode("latin-1")],
+            {"input_encoding": "latin1", "output_encoding": "latin1"},
+        ),
+        Corpus(
+            "shiftjis_page",
+            [clean_page(rng, sections, KANA).encode("shift_jis")],
+            {"input_encoding": "shiftjis", "output_encoding": "utf8"},
+        ),
+    ]
@@ -0,0 +1,208 @@
+"""
+Soak test checking that long running tidying does not leak.
+
+Documents are tidied in a loop through all entry points, including failing
+option sets, missing files, exceeded limits and documents left for garbage
+collection instead of being closed. After every interval the numbers from
+:func:`tidy.metrics.live_objects`, Python allocations traced by
+:mod:`tracemalloc` and resident memory of the process are compared to those
+after the first interval, and the run fails when they grow.
+
+TidyLib 5.9 does not free some memory when releasing a document, it is
+freed by the allocator of the native backend. With the ctypes backend only
+documents tracking memory use it, so resident memory grows. Run from the
+repository root::
+
+    python -m benchmarks.soak --documents 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import tidy
+from benchmarks.corpus import broken_page, clean_page, fragment
+from tidy.metrics import live_objects
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    # Scenario is called with the input text, a file and a pool
+    SCENARIO_TYPE = Callable[[str, Path, tidy.DocumentPool], object]
+
+EXPECTED_ERRORS = (tidy.TidyLibError, ValueError)
+
+
+def parse_string(text: str, _path: Path, _pool: tidy.DocumentPool) -> object:
+    with tidy.parseString(text) as doc:
+        return doc.getvalue(), doc.errors
+
+
+def parse_file(_text: str, path: Path, _pool: tidy.DocumentPool) -> object:
+    with tidy.parse(path) as doc:
+        return doc.gettext()
+
+
+def missing_file(_text: str, path: Path, _pool: tidy.DocumentPool) -> object:
+    with tidy.parse(path.with_name("missing.html")) as doc:
+        return doc.errors
+
+
+def unclosed(text: str, _path: Path, _pool: tidy.DocumentPool) -> object:
+    # Released by the garbage collector
+    return str(tidy.parseString(text.encode(), output_xhtml=1))
+
+
+def invalid_option(text: str, _path: Path, _pool: tidy.DocumentPool) -> object:
+    return tidy.parseString(text, no_such_option=1)
+
+
+def invalid_value(text: str, _path: Path, _pool: tidy.DocumentPool) -> object:
+    return tidy.parseString(text, indent="bogus")
+
+
+def pooled(text: str, _path: Path, pool: tidy.DocumentPool) -> object:
+    with pool.parseString(text) as doc:
+        return doc.getvalue()
+
+
+def pooled_invalid(text: str, _path: Path, pool: tidy.DocumentPool) -> object:
+    return pool.parseString(text, wrap="bogus")
+
+
+def diagnostics(text: str, _path: Path, _pool: tidy.DocumentPool) -> object:
+    with tidy.parseString(text, diagnostics=True, max_errors=5) as doc:
+        return doc.diagnostics
+
+
+def memory_limit(text: str, _path: Path, _pool: tidy.DocumentPool) -> object:
+    return tidy.parseString(text, max_memory=1000)
+
+
+def validate(text: str, _path: Path, _pool: tidy.DocumentPool) -> object:
+    return tidy.validate(text)
+
+
+def tree(text: str, _path: Path, _pool: tidy.DocumentPool) -> object:
+    with tidy.parseString(text) as doc:
+        return [link.get("href") for link in doc.iter_elements("a")]
+
+
+def fragments(text: str, _path: Path, _pool: tidy.DocumentPool) -> object:
+    return list(tidy.parse_fragments([text[:200], text[-200:]]))
+
+
+SCENARIOS: tuple[SCENARIO_TYPE, ...] = (
+    parse_string,
+    parse_file,
+    missing_file,
+    unclosed,
+    invalid_option,
+    invalid_value,
+    pooled,
+    pooled_invalid,
+    diagnostics,
+    memory_limit,
+    validate,
+    tree,
+    fragments,
+)
+
+
+def rss() -> int | None:
+    """Return current resident memory of the process in bytes."""
+    try:
+        pages = Path("/proc/self/statm").read_text().split()[1]
+    except OSError:
+        return None
+    return int(pages) * os.sysconf("SC_PAGE_SIZE")
+
+
+def run(
+    documents: int,
+    interval: int,
+    rss_limit: float,
+    python_limit: float,
+) -> list[str]:
+    """Tidy documents and return descriptions of detected growth."""
+    rng = random.Random(0)  # noqa: S311
+    texts = [clean_page(rng, 5), broken_page(rng, 5), fragment(rng)]
+    failures = []
+    baseline = None
+    print(
+        f"{'documents':>10} {'live':>14} {'python MB':>10} {'RSS MB':>8} {'docs/s':>8}"
+    )
+    with tempfile.TemporaryDirectory() as tmpdir, tidy.DocumentPool(size=2) as pool:
+        path = Path(tmpdir) / "page.html"
+        path.write_text(texts[0])
+        tracemalloc.start()
+        start = time.perf_counter()
+        for index in range(documents):
+            scenario = SCENARIOS[index % len(SCENARIOS)]
+            with contextlib.suppress(*EXPECTED_ERRORS):
+                scenario(texts[index % len(texts)], path, pool)
+            if (index + 1) % interval:
+                continue
+            gc.collect()
+            sample = (live_objects(), tracemalloc.get_traced_memory()[0], rss())
+            elapsed = time.perf_counter() - start
+            live, python, resident = sample
+            print(
+                f"{index + 1:>10} {'/'.join(map(str, live)):>14}"
+                f" {python / 1e6:>10.2f} {(resident or 0) / 1e6:>8.1f}"
+                f" {interval / elapsed:>8.0f}"
+            )
+            start = time.perf_counter()
+            if baseline is None:
+                baseline = sample
+                continue
+            # Pools may release recycled handles, so only growth counts
+            if any(now > then for now, then in zip(live, baseline[0], strict=True)):
+                failures.append(f"live objects grew from {baseline[0]} to {live}")
+            if python - baseline[1] > python_limit * 1e6:
+                failures.append(f"Python allocations grew by {python - baseline[1]} B")
+            if (
+                resident is not None
+                and baseline[2] is not None
+                and resident - baseline[2] > rss_limit * 1e6
+            ):
+                failures.append(f"resident memory grew by {resident - baseline[2]} B")
+        tracemalloc.stop()
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=200_000)
+    parser.add_argument("--interval", type=int, default=10_000)
+    parser.add_argument(
+        "--rss-limit", type=float, default=20, help="allowed RSS growth in MB"
+    )
+    parser.add_argument(
+        "--python-limit",
+        type=float,
+        default=1,
+        help="allowed growth of traced Python allocations in MB",
+    )
+    args = parser.parse_args()
+    if args.documents < 2 * args.interval:
+        parser.error("--documents has to cover at least two intervals")
+
+    failures = run(args.documents, args.interval, args.rss_limit, args.python_limit)
+    for failure in dict.fromkeys(failures):
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
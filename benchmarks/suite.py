@@ -0,0 +1,257 @@
+"""
+Benchmark suite measuring throughput, latency and memory of tidying.
+
+Every operation is measured on every corpus from :mod:`benchmarks.corpus`,
+each combination in a fresh interpreter. Run from the repository root::
+
+    python -m benchmarks.suite --output results.json
+
+Results are written as JSON. Pass ``--compare`` with results of an earlier
+run to print throughput changes, the command fails when any case got slower
+than ``--threshold``::
+
+    python -m benchmarks.suite --compare results.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import tidy
+import tidy.lib
+from benchmarks.corpus import Corpus, generate
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    # Measures one document and returns the elapsed seconds
+    OPERATION_TYPE = Callable[[bytes, Path, tidy.lib.OPTION_DICT_TYPE], float]
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+
+def op_options(_data: bytes, _path: Path, options: tidy.lib.OPTION_DICT_TYPE) -> float:
+    start = time.perf_counter()
+    doc = tidy.lib.docfactory.create(config=None, **options)
+    elapsed = time.perf_counter() - start
+    doc.close()
+    return elapsed
+
+
+def op_parse_string(
+    data: bytes, _path: Path, options: tidy.lib.OPTION_DICT_TYPE
+) -> float:
+    start = time.perf_counter()
+    doc = tidy.parseString(data, **options)
+    elapsed = time.perf_counter() - start
+    doc.close()
+    return elapsed
+
+
+def op_parse(_data: bytes, path: Path, options: tidy.lib.OPTION_DICT_TYPE) -> float:
+    start = time.perf_counter()
+    doc = tidy.parse(path, **options)
+    elapsed = time.perf_counter() - start
+    doc.close()
+    return elapsed
+
+
+def op_getvalue(data: bytes, _path: Path, options: tidy.lib.OPTION_DICT_TYPE) -> float:
+    with tidy.parseString(data, **options) as doc:
+        start = time.perf_counter()
+        doc.getvalue()
+        return time.perf_counter() - start
+
+
+def op_errors(data: bytes, _path: Path, options: tidy.lib.OPTION_DICT_TYPE) -> float:
+    with tidy.parseString(data, **options) as doc:
+        start = time.perf_counter()
+        doc.get_errors()
+        return time.perf_counter() - start
+
+
+OPERATIONS: dict[str, OPERATION_TYPE] = {
+    "options": op_options,
+    "parseString": op_parse_string,
+    "parse": op_parse,
+    "getvalue": op_getvalue,
+    "errors": op_errors,
+}
+
+
+def max_rss() -> int | None:
+    """Return peak resident memory of the process in kilobytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_case(corpus: Corpus, name: str, min_time: float) -> dict[str, Any]:
+    """Measure the operation on all documents of the corpus."""
+    operation = OPERATIONS[name]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = []
+        for index, data in enumerate(corpus.documents):
+            path = Path(tmpdir) / f"{index}.html"
+            path.write_bytes(data)
+            paths.append(path)
+        inputs = list(zip(corpus.documents, paths, strict=True))
+
+        # Warm up and trace Python allocations of a single pass
+        tracemalloc.start()
+        for data, path in inputs:
+            operation(data, path, corpus.options)
+        _, python_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        latencies: list[float] = []
+        deadline = time.perf_counter() + min_time
+        while time.perf_counter() < deadline or len(latencies) < 10:  # noqa: PLR2004
+            latencies.extend(
+                operation(data, path, corpus.options) for data, path in inputs
+            )
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "corpus": corpus.name,
+        "operation": name,
+        "documents": len(latencies),
+        "input_bytes": sum(len(data) for data in corpus.documents),
+        "docs_per_sec": len(latencies) / sum(latencies),
+        "mean_us": statistics.fmean(latencies) * 1e6,
+        "p50_us": percentiles[49] * 1e6,
+        "p90_us": percentiles[89] * 1e6,
+        "p99_us": percentiles[98] * 1e6,
+        "python_peak_bytes": python_peak,
+        "max_rss_kb": max_rss(),
+    }
+
+
+def metadata() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],  # noqa: S607
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "tidy": tidy.lib.getTidyVersion(),
+        "backend": tidy.lib.get_backend(),
+    }
+
+
+def compare(
+    results: list[dict[str, Any]], baseline_file: str, threshold: float
+) -> bool:
+    """Print throughput changes against baseline, return whether none regressed."""
+    baseline = {
+        (case["corpus"], case["operation"]): case
+        for case in json.loads(Path(baseline_file).read_text())["results"]
+    }
+    success = True
+    print(f"{'case':<28} {'baseline':>12} {'current':>12} {'change':>8}")
+    for case in results:
+        key = (case["corpus"], case["operation"])
+        if key not in baseline:
+            continue
+        old = baseline[key]["docs_per_sec"]
+        change = case["docs_per_sec"] / old - 1
+        flag = ""
+        if change < -threshold:
+            flag = " slower"
+            success = False
+        print(
+            f"{':'.join(key):<28} {old:>10.1f}/s {case['docs_per_sec']:>10.1f}/s"
+            f" {change:>+7.1%}{flag}"
+        )
+    return success
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--corpus", action="append", help="run only these corpora")
+    parser.add_argument(
+        "--operation",
+        action="append",
+        choices=list(OPERATIONS),
+        help="run only these operations",
+    )
+    parser.add_argument("--scale", type=float, default=1.0, help="size of pages")
+    parser.add_argument(
+        "--min-time", type=float, default=1.0, help="seconds to measure each case"
+    )
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="JSON results to compare with")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="allowed throughput drop"
+    )
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    corpora = {corpus.name: corpus for corpus in generate(args.scale)}
+    if args.case:
+        # Single case run in a child process
+        corpus_name, operation = args.case.split(":")
+        print(json.dumps(run_case(corpora[corpus_name], operation, args.min_time)))
+        return
+
+    results = []
+    for corpus_name in args.corpus or corpora:
+        for operation in args.operation or OPERATIONS:
+            output = subprocess.run(  # noqa: S603
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.suite",
+                    f"--case={corpus_name}:{operation}",
+                    f"--scale={args.scale}",
+                    f"--min-time={args.min_time}",
+                ],
+                env=os.environ,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            case = json.loads(output)
+            results.append(case)
+            print(
+                f"{corpus_name:<14} {operation:<12} {case['docs_per_sec']:>10.1f}/s"
+                f" p50 {case['p50_us']:>9.1f}us p99 {case['p99_us']:>9.1f}us",
+                file=sys.stderr,
+            )
+
+    report = {"metadata": metadata(), "results": results}
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare and not compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -34,23 +34,84 @@ fixed number of choices, you can provide either the numeric or string version
 of the choice; so both tidy.parseString('<HTML>foo</html>', newline=2) and
 tidy.parseString('<HTML>foo</html>', newline='CR') do the same thing.
 
-There are no plans to support other features of TidyLib, such as document-tree
-traversal, since Python has several quality DOM implementations. (The author
-uses Twisted's implementation, twisted.web.microdom).
+Parsing is thread-safe: parse, parseString, TidyConfig and DocumentPool can be
+used from several threads at once and each document collects only its own
+errors. TidyLib runs without holding the GIL, so a thread pool tidies
+documents in parallel. A single Document should not be shared between threads
+while it is being used.
+
+The tidied document tree can be read without serializing and parsing it
+again, see tidy.tree:
+
+>>> [link.get("href") for link in tidy.parseString(
+...     '<a href="/one">One</a> <a href="/two">Two</a>'
+... ).iter_elements("a")]
+['/one', '/two']
+
+It is a read-only view, for modifying documents use one of the DOM
+implementations Python has.
 """
 
-from tidy.error import InvalidOptionError, OptionArgError, TidyLibError
-from tidy.lib import Document, ReportItem, parse, parseString
+import importlib
+from typing import TYPE_CHECKING, Any
+
+from tidy.error import (
+    InvalidOptionError,
+    LimitExceededError,
+    MemoryLimitError,
+    OptionArgError,
+    TidyLibError,
+)
+from tidy.lib import (
+    Diagnostic,
+    Diagnostics,
+    Document,
+    DocumentPool,
+    ReportItem,
+    Severity,
+    TidyConfig,
+    ValidationResult,
+    parse,
+    parseString,
+    validate,
+    validate_file,
+)
+
+if TYPE_CHECKING:
+    from tidy.batch import TidyResult, parse_fragments, parse_many
 
 __all__ = [
+    "Diagnostic",
+    "Diagnostics",
     "Document",
+    "DocumentPool",
     "InvalidOptionError",
+    "LimitExceededError",
+    "MemoryLimitError",
     "OptionArgError",
     "ReportItem",
+    "Severity",
+    "TidyConfig",
     "TidyLibError",
+    "TidyResult",
+    "ValidationResult",
+    "batch",
     "error",
     "lib",
     "parse",
     "parseString",
+    "parse_fragments",
+    "parse_many",
+    "validate",
+    "validate_file",
 ]
 __version__ = "1.0.0"
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    # Batch processing is imported on demand, it pulls in concurrent.futures
+    if name in {"TidyResult", "batch", "parse_fragments", "parse_many"}:
+        batch = importlib.import_module("tidy.batch")
+        return batch if name == "batch" else getattr(batch, name)
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
@@ -0,0 +1,8 @@
+"""Entry point for ``python -m tidy``."""
+
+import sys
+
+from tidy.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,751 @@
+/*
+ * Native backend for uTidylib.
+ *
+ * Runs parsing, cleanup and serialization of a document in single calls
+ * without holding the GIL. The TidyLib functions are not linked, their
+ * addresses are passed from the library loaded by ctypes, see bind().
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <string.h>
+
+/* Layout of TidyBuffer from tidybuffio.h */
+typedef struct {
+    void *allocator;
+    unsigned char *bp;
+    unsigned int size;
+    unsigned int allocated;
+    unsigned int next;
+} TidyBuffer;
+
+typedef void *TidyDoc;
+typedef void *TidyNode;
+
+/* Layout of TidyOutputSink from tidy.h */
+typedef struct {
+    void *sinkData;
+    void (*putByte)(void *, unsigned char);
+} TidyOutputSink;
+
+/* Layout of TidyAllocator from tidy.h */
+typedef struct _TidyAllocator TidyAllocator;
+
+typedef struct {
+    void *(*alloc)(TidyAllocator *, size_t);
+    void *(*realloc)(TidyAllocator *, void *, size_t);
+    void (*free)(TidyAllocator *, void *);
+    void (*panic)(TidyAllocator *, const char *);
+} TidyAllocatorVtbl;
+
+struct _TidyAllocator {
+    const TidyAllocatorVtbl *vtbl;
+};
+
+/*
+ * Requested size stored in front of each block, keeping the alignment,
+ * together with links to the other blocks of the allocator
+ */
+typedef union BlockHeader {
+    struct {
+        union BlockHeader *prev;
+        union BlockHeader *next;
+        size_t size;
+    } block;
+    long double align_float;
+    void *align_pointer;
+} BlockHeader;
+
+/*
+ * Allocator counting bytes, read by _CountingAllocator in lib.py, which
+ * knows only the leading fields
+ */
+typedef struct {
+    TidyAllocator base;
+    size_t current;
+    size_t peak;
+    BlockHeader *blocks;
+} CountingAllocator;
+
+/* Values of TidyNodeType */
+#define TIDY_NODE_TEXT 4
+#define TIDY_NODE_START 5
+#define TIDY_NODE_START_END 7
+
+static void (*tidyBufInit)(TidyBuffer *);
+static void (*tidyBufAttach)(TidyBuffer *, void *, unsigned int);
+static void (*tidyBufFree)(TidyBuffer *);
+static int (*tidyParseBuffer)(TidyDoc, TidyBuffer *);
+static int (*tidyParseFile)(TidyDoc, const char *);
+static int (*tidyCleanAndRepair)(TidyDoc);
+static int (*tidySaveBuffer)(TidyDoc, TidyBuffer *);
+static int (*tidySaveSink)(TidyDoc, TidyOutputSink *);
+static void (*tidyBufAppend)(TidyBuffer *, void *, unsigned int);
+static TidyNode (*tidyGetChild)(TidyNode);
+static TidyNode (*tidyGetNext)(TidyNode);
+static TidyNode (*tidyGetParent)(TidyNode);
+static int (*tidyNodeGetType)(TidyNode);
+static const char *(*tidyNodeGetName)(TidyNode);
+static int (*tidyNodeGetValue)(TidyDoc, TidyNode, TidyBuffer *);
+
+static int bound = 0;
+
+static int
+bind_function(PyObject *functions, const char *name, void **target)
+{
+    PyObject *address = PyDict_GetItemString(functions, name);
+
+    if (address == NULL) {
+        PyErr_Format(PyExc_KeyError, "missing TidyLib function %s", name);
+        return -1;
+    }
+    *target = PyLong_AsVoidPtr(address);
+    if (*target == NULL) {
+        if (!PyErr_Occurred()) {
+            PyErr_Format(PyExc_ValueError, "NULL address of %s", name);
+        }
+        return -1;
+    }
+    return 0;
+}
+
+static PyObject *
+ctidy_bind(PyObject *module, PyObject *functions)
+{
+    if (!PyDict_Check(functions)) {
+        PyErr_SetString(PyExc_TypeError, "expected dict of function addresses");
+        return NULL;
+    }
+    if (bind_function(functions, "BufInit", (void **)&tidyBufInit) < 0 ||
+        bind_function(functions, "BufAttach", (void **)&tidyBufAttach) < 0 ||
+        bind_function(functions, "BufFree", (void **)&tidyBufFree) < 0 ||
+        bind_function(functions, "ParseBuffer", (void **)&tidyParseBuffer) < 0 ||
+        bind_function(functions, "ParseFile", (void **)&tidyParseFile) < 0 ||
+        bind_function(functions, "CleanAndRepair",
+                      (void **)&tidyCleanAndRepair) < 0 ||
+        bind_function(functions, "SaveBuffer", (void **)&tidySaveBuffer) < 0 ||
+        bind_function(functions, "SaveSink", (void **)&tidySaveSink) < 0 ||
+        bind_function(functions, "BufAppend", (void **)&tidyBufAppend) < 0 ||
+        bind_function(functions, "GetChild", (void **)&tidyGetChild) < 0 ||
+        bind_function(functions, "GetNext", (void **)&tidyGetNext) < 0 ||
+        bind_function(functions, "GetParent", (void **)&tidyGetParent) < 0 ||
+        bind_function(functions, "NodeGetType", (void **)&tidyNodeGetType) < 0 ||
+        bind_function(functions, "NodeGetName", (void **)&tidyNodeGetName) < 0 ||
+        bind_function(functions, "NodeGetValue",
+                      (void **)&tidyNodeGetValue) < 0) {
+        bound = 0;
+        return NULL;
+    }
+    bound = 1;
+    Py_RETURN_NONE;
+}
+
+static TidyDoc
+get_doc(PyObject *cdoc)
+{
+    TidyDoc doc;
+
+    if (!bound) {
+        PyErr_SetString(PyExc_RuntimeError, "TidyLib functions are not bound");
+        return NULL;
+    }
+    doc = PyLong_AsVoidPtr(cdoc);
+    if (doc == NULL && !PyErr_Occurred()) {
+        PyErr_SetString(PyExc_ValueError, "Document is closed");
+    }
+    return doc;
+}
+
+static void
+count_block(CountingAllocator *allocator, size_t old_size, size_t new_size)
+{
+    allocator->current = allocator->current - old_size + new_size;
+    if (allocator->current > allocator->peak) {
+        allocator->peak = allocator->current;
+    }
+}
+
+static void
+link_block(CountingAllocator *allocator, BlockHeader *header)
+{
+    header->block.prev = NULL;
+    header->block.next = allocator->blocks;
+    if (allocator->blocks != NULL) {
+        allocator->blocks->block.prev = header;
+    }
+    allocator->blocks = header;
+}
+
+static void
+unlink_block(CountingAllocator *allocator, BlockHeader *header)
+{
+    if (header->block.prev == NULL) {
+        allocator->blocks = header->block.next;
+    } else {
+        header->block.prev->block.next = header->block.next;
+    }
+    if (header->block.next != NULL) {
+        header->block.next->block.prev = header->block.prev;
+    }
+}
+
+static void *
+counting_alloc(TidyAllocator *self, size_t size)
+{
+    BlockHeader *header = PyMem_RawMalloc(sizeof(BlockHeader) + size);
+
+    if (header == NULL) {
+        return NULL;
+    }
+    header->block.size = size;
+    link_block((CountingAllocator *)self, header);
+    count_block((CountingAllocator *)self, 0, size);
+    return header + 1;
+}
+
+static void *
+counting_realloc(TidyAllocator *self, void *block, size_t size)
+{
+    BlockHeader *header, *moved;
+    size_t old_size;
+
+    if (block == NULL) {
+        return counting_alloc(self, size);
+    }
+    header = (BlockHeader *)block - 1;
+    old_size = header->block.size;
+    /* The neighbours point to the old address */
+    unlink_block((CountingAllocator *)self, header);
+    moved = PyMem_RawRealloc(header, sizeof(BlockHeader) + size);
+    if (moved == NULL) {
+        link_block((CountingAllocator *)self, header);
+        return NULL;
+    }
+    moved->block.size = size;
+    link_block((CountingAllocator *)self, moved);
+    count_block((CountingAllocator *)self, old_size, size);
+    return moved + 1;
+}
+
+static void
+counting_free(TidyAllocator *self, void *block)
+{
+    BlockHeader *header;
+
+    if (block == NULL) {
+        return;
+    }
+    header = (BlockHeader *)block - 1;
+    unlink_block((CountingAllocator *)self, header);
+    count_block((CountingAllocator *)self, header->block.size, 0);
+    PyMem_RawFree(header);
+}
+
+static void
+counting_panic(TidyAllocator *self, const char *message)
+{
+    /* Called when an allocation fails, TidyLib can not continue */
+    Py_FatalError(message);
+}
+
+static const TidyAllocatorVtbl counting_vtbl = {
+    counting_alloc,
+    counting_realloc,
+    counting_free,
+    counting_panic,
+};
+
+static PyObject *
+ctidy_create_allocator(PyObject *module, PyObject *unused)
+{
+    CountingAllocator *allocator = PyMem_RawCalloc(1, sizeof(CountingAllocator));
+
+    if (allocator == NULL) {
+        return PyErr_NoMemory();
+    }
+    allocator->base.vtbl = &counting_vtbl;
+    return PyLong_FromVoidPtr(allocator);
+}
+
+static PyObject *
+ctidy_free_allocator(PyObject *module, PyObject *address)
+{
+    CountingAllocator *allocator = PyLong_AsVoidPtr(address);
+    BlockHeader *header;
+
+    if (allocator == NULL) {
+        if (!PyErr_Occurred()) {
+            PyErr_SetString(PyExc_ValueError, "NULL allocator");
+        }
+        return NULL;
+    }
+    /* Blocks TidyLib did not free by tidyRelease are leaked otherwise */
+    while (allocator->blocks != NULL) {
+        header = allocator->blocks;
+        allocator->blocks = header->block.next;
+        PyMem_RawFree(header);
+    }
+    PyMem_RawFree(allocator);
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+ctidy_parse_buffer(PyObject *module, PyObject *args)
+{
+    PyObject *cdoc, *data, *copy = NULL;
+    Py_buffer view;
+    TidyBuffer buffer;
+    TidyDoc doc;
+    int status, clean = 1;
+
+    if (!PyArg_ParseTuple(args, "OO|p:parse_buffer", &cdoc, &data, &clean)) {
+        return NULL;
+    }
+    doc = get_doc(cdoc);
+    if (doc == NULL) {
+        return NULL;
+    }
+    if (PyObject_GetBuffer(data, &view, PyBUF_SIMPLE) < 0) {
+        /* Non-contiguous buffers are copied */
+        if (!PyErr_ExceptionMatches(PyExc_BufferError)) {
+            return NULL;
+        }
+        PyObject *memory;
+
+        PyErr_Clear();
+        memory = PyMemoryView_FromObject(data);
+        if (memory == NULL) {
+            return NULL;
+        }
+        copy = PyObject_CallMethod(memory, "tobytes", NULL);
+        Py_DECREF(memory);
+        if (copy == NULL) {
+            return NULL;
+        }
+        if (PyObject_GetBuffer(copy, &view, PyBUF_SIMPLE) < 0) {
+            Py_DECREF(copy);
+            return NULL;
+        }
+    }
+    if ((size_t)view.len > 0xFFFFFFFFu) {
+        PyBuffer_Release(&view);
+        Py_XDECREF(copy);
+        PyErr_SetString(PyExc_ValueError,
+                        "TidyLib can not process more than 4 GiB of input");
+        return NULL;
+    }
+    Py_BEGIN_ALLOW_THREADS
+    tidyBufInit(&buffer);
+    /* TidyLib only reads the attached memory and does not free it */
+    tidyBufAttach(&buffer, view.buf, (unsigned int)view.len);
+    status = tidyParseBuffer(doc, &buffer);
+    if (status >= 0 && clean) {
+        tidyCleanAndRepair(doc);
+    }
+    Py_END_ALLOW_THREADS
+    PyBuffer_Release(&view);
+    Py_XDECREF(copy);
+    return PyLong_FromLong(status);
+}
+
+static PyObject *
+ctidy_parse_text(PyObject *module, PyObject *args)
+{
+    PyObject *cdoc, *text, *encoded = NULL;
+    const char *data;
+    Py_ssize_t size;
+    TidyBuffer buffer;
+    TidyDoc doc;
+    int status, clean = 1;
+
+    if (!PyArg_ParseTuple(args, "OU|p:parse_text", &cdoc, &text, &clean)) {
+        return NULL;
+    }
+    doc = get_doc(cdoc);
+    if (doc == NULL) {
+        return NULL;
+    }
+    if (PyUnicode_IS_ASCII(text)) {
+        /* ASCII strings are stored as valid UTF-8, no copy is made */
+        data = PyUnicode_AsUTF8AndSize(text, &size);
+    } else {
+        /* Encoded to a temporary copy not cached in the string */
+        encoded = PyUnicode_AsUTF8String(text);
+        if (encoded == NULL) {
+            return NULL;
+        }
+        data = PyBytes_AS_STRING(encoded);
+        size = PyBytes_GET_SIZE(encoded);
+    }
+    if (data == NULL) {
+        return NULL;
+    }
+    if ((size_t)size > 0xFFFFFFFFu) {
+        Py_XDECREF(encoded);
+        PyErr_SetString(PyExc_ValueError,
+                        "TidyLib can not process more than 4 GiB of input");
+        return NULL;
+    }
+    Py_BEGIN_ALLOW_THREADS
+    tidyBufInit(&buffer);
+    /* TidyLib only reads the attached memory and does not free it */
+    tidyBufAttach(&buffer, (void *)data, (unsigned int)size);
+    status = tidyParseBuffer(doc, &buffer);
+    if (status >= 0 && clean) {
+        tidyCleanAndRepair(doc);
+    }
+    Py_END_ALLOW_THREADS
+    Py_XDECREF(encoded);
+    return PyLong_FromLong(status);
+}
+
+static PyObject *
+ctidy_parse_file(PyObject *module, PyObject *args)
+{
+    PyObject *cdoc;
+    const char *filename;
+    TidyDoc doc;
+    int status, clean = 1;
+
+    if (!PyArg_ParseTuple(args, "Oy|p:parse_file", &cdoc, &filename, &clean)) {
+        return NULL;
+    }
+    doc = get_doc(cdoc);
+    if (doc == NULL) {
+        return NULL;
+    }
+    Py_BEGIN_ALLOW_THREADS
+    status = tidyParseFile(doc, filename);
+    if (status >= 0 && clean) {
+        tidyCleanAndRepair(doc);
+    }
+    Py_END_ALLOW_THREADS
+    return PyLong_FromLong(status);
+}
+
+static PyObject *
+ctidy_save_buffer(PyObject *module, PyObject *cdoc)
+{
+    TidyBuffer buffer;
+    TidyDoc doc = get_doc(cdoc);
+    PyObject *result;
+
+    if (doc == NULL) {
+        return NULL;
+    }
+    Py_BEGIN_ALLOW_THREADS
+    tidyBufInit(&buffer);
+    tidySaveBuffer(doc, &buffer);
+    Py_END_ALLOW_THREADS
+    result = PyBytes_FromStringAndSize((const char *)buffer.bp, buffer.size);
+    tidyBufFree(&buffer);
+    return result;
+}
+
+static PyObject *
+ctidy_save_text(PyObject *module, PyObject *cdoc)
+{
+    TidyBuffer buffer;
+    TidyDoc doc = get_doc(cdoc);
+    PyObject *result;
+
+    if (doc == NULL) {
+        return NULL;
+    }
+    Py_BEGIN_ALLOW_THREADS
+    tidyBufInit(&buffer);
+    tidySaveBuffer(doc, &buffer);
+    Py_END_ALLOW_THREADS
+    result = PyUnicode_DecodeUTF8((const char *)buffer.bp, buffer.size, "strict");
+    tidyBufFree(&buffer);
+    return result;
+}
+
+/* Output sink passing output to a Python callable in chunks */
+typedef struct {
+    PyObject *write;
+    PyThreadState *state;
+    unsigned char *chunk;
+    Py_ssize_t size;
+    Py_ssize_t chunk_size;
+    int failed;
+} StreamWriter;
+
+/* Called without the GIL, it is taken only to pass a chunk */
+static void
+stream_flush(StreamWriter *writer)
+{
+    PyObject *result;
+
+    /*
+     * Exceptions can not propagate through TidyLib, the first one is kept
+     * and any further output is dropped
+     */
+    if (writer->size && !writer->failed) {
+        PyEval_RestoreThread(writer->state);
+        result = PyObject_CallFunction(writer->write, "y#", writer->chunk,
+                                       writer->size);
+        if (result == NULL) {
+            writer->failed = 1;
+        }
+        Py_XDECREF(result);
+        writer->state = PyEval_SaveThread();
+    }
+    writer->size = 0;
+}
+
+static void
+stream_put_byte(void *data, unsigned char byte)
+{
+    StreamWriter *writer = data;
+
+    writer->chunk[writer->size++] = byte;
+    if (writer->size >= writer->chunk_size) {
+        stream_flush(writer);
+    }
+}
+
+static PyObject *
+ctidy_save_stream(PyObject *module, PyObject *args)
+{
+    PyObject *cdoc;
+    StreamWriter writer = {NULL, NULL, NULL, 0, 0, 0};
+    TidyOutputSink sink = {&writer, stream_put_byte};
+    TidyDoc doc;
+
+    if (!PyArg_ParseTuple(args, "OOn:save_stream", &cdoc, &writer.write,
+                          &writer.chunk_size)) {
+        return NULL;
+    }
+    if (writer.chunk_size <= 0) {
+        PyErr_SetString(PyExc_ValueError, "chunk size must be positive");
+        return NULL;
+    }
+    doc = get_doc(cdoc);
+    if (doc == NULL) {
+        return NULL;
+    }
+    writer.chunk = PyMem_Malloc(writer.chunk_size);
+    if (writer.chunk == NULL) {
+        return PyErr_NoMemory();
+    }
+    writer.state = PyEval_SaveThread();
+    tidySaveSink(doc, &sink);
+    stream_flush(&writer);
+    PyEval_RestoreThread(writer.state);
+    PyMem_Free(writer.chunk);
+    if (writer.failed) {
+        return NULL;
+    }
+    Py_RETURN_NONE;
+}
+
+static TidyNode
+get_node(PyObject *pointer)
+{
+    TidyNode node;
+
+    if (!bound) {
+        PyErr_SetString(PyExc_RuntimeError, "TidyLib functions are not bound");
+        return NULL;
+    }
+    node = PyLong_AsVoidPtr(pointer);
+    if (node == NULL && !PyErr_Occurred()) {
+        PyErr_SetString(PyExc_ValueError, "NULL node");
+    }
+    return node;
+}
+
+/* Content of script and style elements is not text of the document */
+static int
+is_non_text(TidyNode node)
+{
+    const char *name = tidyNodeGetName(node);
+
+    return name != NULL && (strcmp(name, "script") == 0 || strcmp(name, "style") == 0);
+}
+
+/* Elements separating lines of text, sorted for bsearch, see _BLOCKS in lib.py */
+static const char *const blocks[] = {
+    "address", "article", "aside", "blockquote", "body", "br", "caption",
+    "center", "dd", "details", "dialog", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5",
+    "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section",
+    "summary", "table", "td", "th", "title", "tr", "ul",
+};
+
+static int
+compare_name(const void *name, const void *item)
+{
+    return strcmp((const char *)name, *(const char *const *)item);
+}
+
+static int
+is_block(TidyNode node)
+{
+    const char *name;
+    int type = tidyNodeGetType(node);
+
+    if (type != TIDY_NODE_START && type != TIDY_NODE_START_END) {
+        return 0;
+    }
+    name = tidyNodeGetName(node);
+    return name != NULL &&
+           bsearch(name, blocks, sizeof(blocks) / sizeof(blocks[0]), sizeof(blocks[0]),
+                   compare_name) != NULL;
+}
+
+/* Next node after node in document order within the subtree of top */
+static TidyNode
+next_node(TidyNode top, TidyNode node)
+{
+    TidyNode next = tidyGetChild(node);
+
+    while (next == NULL && node != top) {
+        next = tidyGetNext(node);
+        if (next == NULL) {
+            node = tidyGetParent(node);
+        }
+    }
+    return next;
+}
+
+static PyObject *
+ctidy_elements(PyObject *module, PyObject *args)
+{
+    PyObject *pointer, *result, *item;
+    const char *name = NULL, *node_name;
+    TidyNode top, node;
+    int type;
+
+    if (!PyArg_ParseTuple(args, "O|z:elements", &pointer, &name)) {
+        return NULL;
+    }
+    top = get_node(pointer);
+    if (top == NULL) {
+        return NULL;
+    }
+    result = PyList_New(0);
+    if (result == NULL) {
+        return NULL;
+    }
+    for (node = tidyGetChild(top); node != NULL; node = next_node(top, node)) {
+        type = tidyNodeGetType(node);
+        if (type != TIDY_NODE_START && type != TIDY_NODE_START_END) {
+            continue;
+        }
+        if (name != NULL) {
+            node_name = tidyNodeGetName(node);
+            if (node_name == NULL || strcmp(node_name, name) != 0) {
+                continue;
+            }
+        }
+        item = PyLong_FromVoidPtr(node);
+        if (item == NULL || PyList_Append(result, item) < 0) {
+            Py_XDECREF(item);
+            Py_DECREF(result);
+            return NULL;
+        }
+        Py_DECREF(item);
+    }
+    return result;
+}
+
+static PyObject *
+ctidy_text(PyObject *module, PyObject *args)
+{
+    PyObject *cdoc, *pointer, *result;
+    TidyBuffer output, value;
+    TidyDoc doc;
+    TidyNode top, node, next;
+    int separate = 0;
+
+    if (!PyArg_ParseTuple(args, "OO:text", &cdoc, &pointer)) {
+        return NULL;
+    }
+    doc = get_doc(cdoc);
+    if (doc == NULL) {
+        return NULL;
+    }
+    top = get_node(pointer);
+    if (top == NULL) {
+        return NULL;
+    }
+    Py_BEGIN_ALLOW_THREADS
+    tidyBufInit(&output);
+    tidyBufInit(&value);
+    if (tidyNodeGetType(top) == TIDY_NODE_TEXT) {
+        tidyNodeGetValue(doc, top, &output);
+    }
+    else {
+        /* Same walk as next_node, noting entered and left blocks */
+        for (node = tidyGetChild(top); node != NULL; node = next) {
+            if (tidyNodeGetType(node) == TIDY_NODE_TEXT) {
+                /* The value replaces content of the buffer */
+                if (tidyNodeGetValue(doc, node, &value) && value.size) {
+                    if (separate && output.size) {
+                        tidyBufAppend(&output, (void *)"\n", 1);
+                    }
+                    separate = 0;
+                    tidyBufAppend(&output, value.bp, value.size);
+                }
+            }
+            else if (is_block(node)) {
+                separate = 1;
+            }
+            next = is_non_text(node) ? NULL : tidyGetChild(node);
+            while (next == NULL && node != top) {
+                separate |= is_block(node);
+                next = tidyGetNext(node);
+                if (next == NULL) {
+                    node = tidyGetParent(node);
+                }
+            }
+        }
+    }
+    tidyBufFree(&value);
+    Py_END_ALLOW_THREADS
+    result = PyBytes_FromStringAndSize((const char *)output.bp, output.size);
+    tidyBufFree(&output);
+    return result;
+}
+
+static PyMethodDef ctidy_methods[] = {
+    {"bind", ctidy_bind, METH_O,
+     "Bind TidyLib functions from a dict of their addresses."},
+    {"parse_buffer", ctidy_parse_buffer, METH_VARARGS,
+     "Parse and optionally clean a document from a bytes-like object."},
+    {"parse_text", ctidy_parse_text, METH_VARARGS,
+     "Parse and optionally clean a document from a string as UTF-8."},
+    {"parse_file", ctidy_parse_file, METH_VARARGS,
+     "Parse and optionally clean a document from a file."},
+    {"save_buffer", ctidy_save_buffer, METH_O,
+     "Serialize a document and return the output."},
+    {"save_text", ctidy_save_text, METH_O,
+     "Serialize a document and return the output decoded from UTF-8."},
+    {"save_stream", ctidy_save_stream, METH_VARARGS,
+     "Serialize a document passing the output to a callable in chunks."},
+    {"create_allocator", ctidy_create_allocator, METH_NOARGS,
+     "Return address of a new allocator counting allocated bytes."},
+    {"free_allocator", ctidy_free_allocator, METH_O,
+     "Free an allocator no longer used by any document and its blocks."},
+    {"elements", ctidy_elements, METH_VARARGS,
+     "Return descendant elements of a node, optionally only of the name."},
+    {"text", ctidy_text, METH_VARARGS,
+     "Return text of a node and its descendants except scripts and styles."},
+    {NULL, NULL, 0, NULL},
+};
+
+static struct PyModuleDef ctidy_module = {
+    PyModuleDef_HEAD_INIT,
+    "tidy._ctidy",
+    "Native backend for uTidylib.",
+    -1,
+    ctidy_methods,
+};
+
+PyMODINIT_FUNC
+PyInit__ctidy(void)
+{
+    return PyModule_Create(&ctidy_module);
+}
@@ -0,0 +1,17 @@
+from collections.abc import Callable
+
+from typing_extensions import Buffer
+
+def bind(functions: dict[str, int | None], /) -> None: ...
+def parse_buffer(cdoc: int, data: Buffer, clean: bool = True, /) -> int: ...
+def parse_text(cdoc: int, text: str, clean: bool = True, /) -> int: ...
+def parse_file(cdoc: int, filename: bytes, clean: bool = True, /) -> int: ...
+def save_buffer(cdoc: int, /) -> bytes: ...
+def save_text(cdoc: int, /) -> str: ...
+def save_stream(
+    cdoc: int, write: Callable[[bytes], object], chunk_size: int, /
+) -> None: ...
+def elements(node: int, name: str | None = None, /) -> list[int]: ...
+def text(cdoc: int, node: int, /) -> bytes: ...
+def create_allocator() -> int: ...
+def free_allocator(address: int, /) -> None: ...
@@ -0,0 +1,175 @@
+"""
+Non-blocking tidying for asyncio applications.
+
+TidyLib work is offloaded to a thread pool, so the event loop stays
+responsive while large documents are processed:
+
+>>> import asyncio
+>>> doc = asyncio.run(parse_string("<p>Hello", tidy_mark=0))
+>>> "Hello" in str(doc)
+True
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+from tidy.lib import docfactory
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from typing_extensions import Buffer
+
+    from tidy.lib import FILE_TYPE, OPTION_TYPE, Document, TidyConfig
+
+__all__ = ("AsyncTidy", "parse", "parse_string")
+
+_executor: Executor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> Executor:
+    """Return thread pool shared by all AsyncTidy instances by default."""
+    global _executor  # noqa: PLW0603
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(thread_name_prefix="tidy")
+        return _executor
+
+
+class AsyncTidy:
+    """
+    Tidy documents in an executor with bounded concurrency.
+
+    At most ``max_in_flight`` documents are processed at once, further
+    requests wait for a free slot. When ``max_queued`` requests are already
+    waiting, new ones fail with :exc:`asyncio.QueueFull` instead of piling
+    up. A cancelled request releases its TidyLib document once the
+    executor is done with it.
+
+    The limits are bound to the event loop in which they are first used.
+
+    :param config: a :class:`TidyConfig` for the documents
+    :param executor: executor to run TidyLib in, defaults to a thread pool
+                     shared within the process
+    :param max_in_flight: maximal number of documents processed at once,
+                          defaults to the number of CPUs
+    :param max_queued: maximal number of requests waiting for a slot,
+                       unlimited by default
+    """
+
+    def __init__(
+        self,
+        config: TidyConfig | None = None,
+        *,
+        executor: Executor | None = None,
+        max_in_flight: int | None = None,
+        max_queued: int | None = None,
+    ) -> None:
+        self.config = config
+        self.executor = executor if executor is not None else _get_executor()
+        if max_in_flight is None:
+            max_in_flight = os.cpu_count() or 1
+        self.max_queued = max_queued
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._waiting = 0
+
+    @staticmethod
+    def _process(
+        loader: Callable[[Document, Any], object],
+        doc: Document,
+        arg: Any,  # noqa: ANN401
+    ) -> None:
+        loader(doc, arg)
+        # Serialize in the worker as well, the output is cached
+        doc.getvalue()
+
+    async def _acquire(self) -> None:
+        if (
+            self.max_queued is not None
+            and self._semaphore.locked()
+            and self._waiting >= self.max_queued
+        ):
+            raise asyncio.QueueFull
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+    async def _run(
+        self,
+        loader: Callable[[Document, Any], object],
+        arg: Any,  # noqa: ANN401
+        kwargs: dict[str, OPTION_TYPE],
+    ) -> Document:
+        # Options are validated right away, in the calling coroutine
+        doc = docfactory.create(config=self.config, **kwargs)
+        try:
+            await self._acquire()
+        except BaseException:
+            doc.close()
+            raise
+        work = self.executor.submit(self._process, loader, doc, arg)
+        future = asyncio.wrap_future(work)
+
+        # The slot is held until TidyLib finishes, even for cancelled requests
+        def finish(_: asyncio.Future[None]) -> None:
+            self._semaphore.release()
+
+        future.add_done_callback(finish)
+        try:
+            await asyncio.shield(future)
+        except BaseException:
+            # Drops work which has not started yet, the running one completes
+            work.cancel()
+            future.add_done_callback(lambda _: doc.close())
+            raise
+        return doc
+
+    async def parse(self, filename: FILE_TYPE, **kwargs: OPTION_TYPE) -> Document:
+        """Process file without blocking the event loop, see :func:`tidy.parse`."""
+        return await self._run(docfactory.loadFile, filename, kwargs)
+
+    async def parse_string(self, text: Buffer | str, **kwargs: OPTION_TYPE) -> Document:
+        """
+        Process text without blocking the event loop.
+
+        See :func:`tidy.parseString`.
+        """
+        return await self._run(docfactory.loadString, text, kwargs)
+
+
+# Default instances for the module-level functions, one per event loop
+_instances: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncTidy] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_instance() -> AsyncTidy:
+    loop = asyncio.get_running_loop()
+    try:
+        return _instances[loop]
+    except KeyError:
+        instance = _instances[loop] = AsyncTidy()
+        return instance
+
+
+async def parse(filename: FILE_TYPE, **kwargs: OPTION_TYPE) -> Document:
+    """Process file without blocking the event loop, see :func:`tidy.parse`."""
+    return await _get_instance().parse(filename, **kwargs)
+
+
+async def parse_string(text: Buffer | str, **kwargs: OPTION_TYPE) -> Document:
+    """
+    Process text without blocking the event loop.
+
+    See :func:`tidy.parseString`.
+    """
+    return await _get_instance().parse_string(text, **kwargs)
@@ -0,0 +1,345 @@
+"""Tidying many documents in parallel."""
+
+from __future__ import annotations
+
+import bisect
+import collections
+import functools
+import itertools
+import multiprocessing
+import os
+import re
+import secrets
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import TYPE_CHECKING, NamedTuple, TypeVar
+
+from tidy.lib import DocumentPool, ReportItem, TidyConfig
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+    from typing_extensions import Buffer
+
+    from tidy.lib import OPTION_DICT_TYPE, OPTION_TYPE
+
+    CHUNK_TYPE = list[tuple[int, Buffer | str]]
+    # Result passed between processes, errors as raw report lines
+    RAW_RESULT_TYPE = tuple[int, bytes, list[str]]
+
+__all__ = ("TidyResult", "parse_fragments", "parse_many")
+
+MODES = ("thread", "process")
+
+T = TypeVar("T")
+
+# Workers are started fresh, forking a process with running threads and
+# loaded TidyLib is not safe
+_context = multiprocessing.get_context("spawn")
+
+
+class TidyResult(NamedTuple):
+    """Outcome of tidying one document with :func:`parse_many`."""
+
+    position: int  #: Position of the document in the input
+    output: bytes  #: Tidied document
+    errors: list[ReportItem]  #: Errors reported while tidying
+
+
+def _tidy_chunk(pool: DocumentPool, chunk: CHUNK_TYPE) -> list[TidyResult]:
+    result = []
+    for position, text in chunk:
+        with pool.parseString(text) as doc:
+            result.append(TidyResult(position, doc.getvalue(), doc.errors))
+    return result
+
+
+# Pool of the current worker process, set up by _init_process
+_process_pool: DocumentPool | None = None
+
+
+def _init_process(filename: str | None, options: OPTION_DICT_TYPE) -> None:
+    global _process_pool  # noqa: PLW0603
+    if filename is None:
+        config = TidyConfig(**options)
+    else:
+        config = TidyConfig.from_file(filename, **options)
+    _process_pool = DocumentPool(config, size=1)
+
+
+def _tidy_process_chunk(chunk: CHUNK_TYPE) -> list[RAW_RESULT_TYPE]:
+    if _process_pool is None:
+        raise RuntimeError("Worker process was not initialized")
+    return [
+        (position, output, [error.err for error in errors])
+        for position, output, errors in _tidy_chunk(_process_pool, chunk)
+    ]
+
+
+def _chunks(items: Iterable[Buffer | str], size: int) -> Iterator[CHUNK_TYPE]:
+    iterator = enumerate(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def _submit_all(
+    executor: Executor,
+    func: Callable[[CHUNK_TYPE], list[T]],
+    chunks: Iterator[CHUNK_TYPE],
+    window: int,
+    *,
+    ordered: bool,
+) -> Iterator[T]:
+    """Run chunks with at most ``window`` of them submitted at once."""
+    pending: collections.deque[Future[list[T]]] = collections.deque(
+        executor.submit(func, chunk) for chunk in itertools.islice(chunks, window)
+    )
+    while pending:
+        if ordered:
+            done = [pending.popleft()]
+        else:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            done = [future for future in pending if future in finished]
+            for future in done:
+                pending.remove(future)
+        for future in done:
+            yield from future.result()
+            for chunk in itertools.islice(chunks, 1):
+                pending.append(executor.submit(func, chunk))
+
+
+def parse_many(  # noqa: PLR0913
+    items: Iterable[Buffer | str],
+    workers: int | None = None,
+    mode: str = "thread",
+    *,
+    ordered: bool = True,
+    chunksize: int = 1,
+    config: TidyConfig | None = None,
+    **kwargs: OPTION_TYPE,
+) -> Iterator[TidyResult]:
+    """
+    Tidy many documents in parallel.
+
+    All documents share one configuration and every worker reuses its
+    TidyLib handles. Input is consumed lazily, only a few chunks per worker
+    are submitted at once. Results carry the text report only, the
+    ``diagnostics`` and ``max_errors`` options are not supported.
+
+    >>> results = parse_many(["<p>one", "<p>two"], workers=2, tidy_mark=0)
+    >>> [result.position for result in results]
+    [0, 1]
+
+    :param items: documents to tidy, see :func:`parseString`
+    :param workers: number of worker threads or processes, defaults to
+                    the number of CPUs
+    :param mode: ``"thread"`` to tidy in threads of this process, TidyLib
+                 runs without the GIL, or ``"process"`` to tidy in worker
+                 processes, only output and error messages are transferred
+                 back and items which are not strings are copied as bytes
+    :param ordered: yield results in input order, otherwise as completed
+    :param chunksize: number of documents sent to a worker in one task,
+                      larger values reduce the overhead in process mode
+    :param config: a :class:`TidyConfig` for the documents
+    :param kwargs: named options to build the configuration from when
+                   no config is given.
+    :return: iterator of :class:`TidyResult`
+    """
+    if mode not in MODES:
+        msg = f"Unsupported mode: {mode!r}"
+        raise ValueError(msg)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if config is None:
+        config = TidyConfig(**kwargs)
+    # Results carry only the text report
+    for name in ("diagnostics", "max_errors"):
+        if config.options.get(name):
+            msg = f"The {name} option is not supported by parse_many"
+            raise ValueError(msg)
+    chunks = _chunks(items, chunksize)
+    window = workers * 2
+    if mode == "thread":
+        with (
+            DocumentPool(config, size=workers) as pool,
+            ThreadPoolExecutor(workers) as executor,
+        ):
+            yield from _submit_all(
+                executor,
+                functools.partial(_tidy_chunk, pool),
+                chunks,
+                window,
+                ordered=ordered,
+            )
+    else:
+        # Views such as memoryview or mmap can not be pickled
+        chunks = (
+            [
+                (position, text if isinstance(text, (str, bytes)) else bytes(text))
+                for position, text in chunk
+            ]
+            for chunk in chunks
+        )
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=_context,
+            initializer=_init_process,
+            initargs=(config.filename, config.options),
+        ) as executor:
+            for position, output, errors in _submit_all(
+                executor, _tidy_process_chunk, chunks, window, ordered=ordered
+            ):
+                yield TidyResult(position, output, [ReportItem(err) for err in errors])
+
+
+def _count_lines(text: str) -> int:
+    """Return number of lines as counted by TidyLib, which accepts CR too."""
+    return text.count("\n") + text.count("\r") - text.count("\r\n") + 1
+
+
+def _trim(output: bytes) -> bytes:
+    """Collapse trailing newlines, TidyLib adds a blank line after blocks."""
+    body = output.rstrip(b"\r\n")
+    if not body:
+        return b""
+    tail = output[len(body) :]
+    return body + (b"\r\n" if tail.startswith(b"\r\n") else tail[:1])
+
+
+def _tidy_fragments(
+    pool: DocumentPool,
+    fragments: list[str],
+    options: OPTION_DICT_TYPE,
+    nonce: str,
+) -> list[tuple[bytes, list[ReportItem]]]:
+    """Tidy fragments in one document, returning output and errors of each."""
+    parts = []
+    starts = []
+    line = 1
+    for index, fragment in enumerate(fragments):
+        starts.append(line)
+        line += _count_lines(fragment) + 1
+        parts.append(f'{fragment}\n<hr id="utidylib-{nonce}-{index}">\n')
+    with pool.parseString("".join(parts), **options) as doc:
+        output = doc.getvalue()
+        errors = doc.errors
+
+    # Fragment isolated from its neighbours, only markers at the start of
+    # their own line at the top level delimit its output
+    markers = list(
+        re.finditer(
+            rb'<hr\s+id="utidylib-' + nonce.encode() + rb'-(\d+)"\s*/?>(\r?\n)?',
+            output,
+            re.IGNORECASE,
+        )
+    )
+    # TidyLib writes no output for documents with errors, the pool does not
+    # reuse their handle, so the fragments are tidied again on a clean one
+    if [int(marker.group(1)) for marker in markers] != list(range(len(fragments))):
+        return [_tidy_fragment(pool, fragment, options) for fragment in fragments]
+    isolated = [
+        marker.group(2) is not None
+        and (marker.start() == 0 or output[marker.start() - 1] in b"\r\n")
+        for marker in markers
+    ]
+
+    # Map messages back to fragments, anything above info level might
+    # come from markup spilling over to the following fragment
+    messages: list[list[ReportItem]] = [[] for _ in fragments]
+    warned = [False] * len(fragments)
+    for item in errors:
+        if item.line is None:
+            return [_tidy_fragment(pool, fragment, options) for fragment in fragments]
+        index = bisect.bisect_right(starts, item.line) - 1
+        line = item.line - starts[index] + 1
+        if item.severity != "I" or line > _count_lines(fragments[index]):
+            warned[index] = True
+        messages[index].append(
+            ReportItem(
+                f"line {line} column {item.col} - {item.full_severity} {item.message}"
+            )
+        )
+
+    # Info messages could be misplaced by warnings elsewhere
+    trusted = not any(warned)
+    result = []
+    start = 0
+    for index, fragment in enumerate(fragments):
+        marker = markers[index]
+        piece = output[start : marker.start()]
+        start = marker.end()
+        if (
+            warned[index]
+            or not isolated[index]
+            or (index and (warned[index - 1] or not isolated[index - 1]))
+            or (messages[index] and not trusted)
+        ):
+            result.append(_tidy_fragment(pool, fragment, options))
+        else:
+            result.append((_trim(piece), messages[index]))
+    return result
+
+
+def _tidy_fragment(
+    pool: DocumentPool, fragment: str, options: OPTION_DICT_TYPE
+) -> tuple[bytes, list[ReportItem]]:
+    with pool.parseString(fragment, **options) as doc:
+        return _trim(doc.getvalue()), doc.errors
+
+
+def parse_fragments(
+    fragments: Iterable[str],
+    *,
+    batch_size: int = 100,
+    config: TidyConfig | None = None,
+    **kwargs: OPTION_TYPE,
+) -> Iterator[TidyResult]:
+    r"""
+    Tidy many small fragments of HTML, such as comments.
+
+    Fragments are tidied with ``show_body_only`` in batches of one TidyLib
+    document each, separated by marker elements, which saves the fixed cost
+    of processing a document for each of them. Line numbers of messages are
+    mapped back to the fragments. A fragment is tidied on its own when
+    TidyLib warns about it or about the one preceding it, as its markup
+    might have been mixed with its neighbours.
+
+    >>> results = parse_fragments(["<p>one", "two <b>three"], tidy_mark=0)
+    >>> [(result.output, len(result.errors)) for result in results]
+    [(b'<p>one</p>\n', 0), (b'two <b>three</b>\n', 1)]
+
+    The output of each fragment ends with a single newline, trailing blank
+    lines are removed.
+
+    :param fragments: text of the fragments
+    :param batch_size: maximal number of fragments tidied in one document
+    :param config: a :class:`TidyConfig` for the fragments
+    :param kwargs: named options to build the configuration from when
+                   no config is given.
+    :return: iterator of :class:`TidyResult` in input order
+    """
+    # Options applied on top of the configuration
+    options: OPTION_DICT_TYPE = {}
+    if config is None:
+        config = TidyConfig(**(kwargs | {"show_body_only": 1}))
+    else:
+        options = kwargs | {"show_body_only": 1}
+    for name in ("diagnostics", "max_errors"):
+        if (config.options | options).get(name):
+            msg = f"The {name} option is not supported for fragments"
+            raise ValueError(msg)
+    # Markers unique to this call can not clash with the input
+    nonce = secrets.token_hex(4)
+    iterator = iter(fragments)
+    position = 0
+    with DocumentPool(config, size=1) as pool:
+        while batch := list(itertools.islice(iterator, batch_size)):
+            for output, errors in _tidy_fragments(pool, batch, options, nonce):
+                yield TidyResult(position, output, errors)
+                position += 1
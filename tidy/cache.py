@@ -0,0 +1,300 @@
+"""
+Caching of tidy results for repeated inputs.
+
+Results are addressed by a hash of the input, the options and the TidyLib
+version, so identical templates and fragments are tidied only once:
+
+>>> cache = TidyCache(MemoryStore(max_entries=100))
+>>> first = cache.parseString("<p>Hello", tidy_mark=0)
+>>> second = cache.parseString("<p>Hello", tidy_mark=0)
+>>> str(first) == str(second), cache.store.hits, cache.store.misses
+(True, 1, 1)
+"""
+
+from __future__ import annotations
+
+import collections
+import hashlib
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from tidy.lib import (
+    Document,
+    ReportItem,
+    _tracks_memory,
+    docfactory,
+    getTidyVersion,
+)
+
+if TYPE_CHECKING:
+    from typing_extensions import Buffer
+
+    from tidy.lib import FILE_TYPE, OPTION_DICT_TYPE, OPTION_TYPE, TidyConfig
+
+    # Output and raw report lines of a tidied document
+    ENTRY_TYPE = tuple[bytes, str]
+
+__all__ = ("CacheStore", "MemoryStore", "SQLiteStore", "TidyCache")
+
+
+class CacheStore(ABC):
+    """
+    Storage of tidy results bounded in number of entries and size.
+
+    Least recently used entries are evicted when any of the bounds is
+    exceeded. Lookups and evictions are counted.
+
+    :param max_entries: maximal number of stored results
+    :param max_bytes: maximal total size of stored output and reports
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 << 20) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0  #: Number of lookups which found a result
+        self.misses = 0  #: Number of lookups which found nothing
+        self.evictions = 0  #: Number of results dropped to fit the bounds
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> ENTRY_TYPE | None:
+        """Return stored result and mark it as recently used."""
+        with self._lock:
+            entry = self._get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def set(self, key: bytes, entry: ENTRY_TYPE) -> None:
+        """Store result, evicting the least recently used ones if needed."""
+        size = len(entry[0]) + len(entry[1])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self.evictions += self._set(key, entry, size)
+
+    @abstractmethod
+    def _get(self, key: bytes) -> ENTRY_TYPE | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _set(self, key: bytes, entry: ENTRY_TYPE, size: int) -> int:
+        """Store entry and return number of evicted ones."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryStore(CacheStore):
+    """In-memory cache storage, see :class:`CacheStore`."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 << 20) -> None:
+        super().__init__(max_entries, max_bytes)
+        self._entries: collections.OrderedDict[bytes, ENTRY_TYPE] = (
+            collections.OrderedDict()
+        )
+        self.size = 0  #: Total size of stored results
+
+    def _get(self, key: bytes) -> ENTRY_TYPE | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _set(self, key: bytes, entry: ENTRY_TYPE, size: int) -> int:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous[0]) + len(previous[1])
+        self._entries[key] = entry
+        self.size += size
+        evicted = 0
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            _, (output, report) = self._entries.popitem(last=False)
+            self.size -= len(output) + len(report)
+            evicted += 1
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteStore(CacheStore):
+    """
+    On-disk cache storage in a SQLite database, see :class:`CacheStore`.
+
+    The database can be shared by several processes, the counters are
+    kept per instance.
+
+    :param filename: the database file, created when missing
+    """
+
+    def __init__(
+        self,
+        filename: str | os.PathLike[str],
+        max_entries: int = 1024,
+        max_bytes: int = 64 << 20,
+    ) -> None:
+        super().__init__(max_entries, max_bytes)
+        self._connection = sqlite3.connect(
+            filename, check_same_thread=False, isolation_level=None
+        )
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key BLOB PRIMARY KEY,
+                output BLOB NOT NULL,
+                report TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                used INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS results_used ON results (used);
+            """
+        )
+
+    def _tick(self) -> int:
+        """Return a value ordering uses of entries."""
+        row = self._connection.execute("SELECT MAX(used) FROM results").fetchone()
+        return (row[0] or 0) + 1
+
+    def _get(self, key: bytes) -> ENTRY_TYPE | None:
+        with self._connection:
+            row = self._connection.execute(
+                "SELECT output, report FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE results SET used = ? WHERE key = ?", (self._tick(), key)
+            )
+        return row[0], row[1]
+
+    def _set(self, key: bytes, entry: ENTRY_TYPE, size: int) -> int:
+        evicted = 0
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, entry[0], entry[1], size, self._tick()),
+            )
+            count, total = self._connection.execute(
+                "SELECT COUNT(*), SUM(size) FROM results"
+            ).fetchone()
+            cursor = self._connection.execute(
+                "SELECT key, size FROM results ORDER BY used"
+            )
+            for old_key, old_size in cursor:
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                count -= 1
+                total -= old_size
+                evicted += 1
+                self._connection.execute(
+                    "DELETE FROM results WHERE key = ?", (old_key,)
+                )
+        return evicted
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database."""
+        self._connection.close()
+
+
+class TidyCache:
+    """
+    Tidy documents, reusing results of identical inputs.
+
+    The cache key covers the input bytes, the options and the TidyLib
+    version. Options are compared by their name and value, so equivalent
+    spellings of a value, like ``1`` and ``"yes"``, are cached separately.
+
+    Results found in the cache are returned as detached documents, see
+    :meth:`Document.detached`. Only the output and the report are stored,
+    documents with ``diagnostics``, ``max_errors`` or memory tracking
+    options are always tidied.
+
+    :param store: storage for the results, defaults to :class:`MemoryStore`
+    :param config: a :class:`TidyConfig` for the documents
+    """
+
+    def __init__(
+        self, store: CacheStore | None = None, config: TidyConfig | None = None
+    ) -> None:
+        self.store = store if store is not None else MemoryStore()
+        self.config = config
+        self._version = getTidyVersion()
+        self._config_file = b""
+        if config is not None and config.filename is not None:
+            self._config_file = Path(config.filename).read_bytes()
+
+    def _options(self, kwargs: OPTION_DICT_TYPE) -> OPTION_DICT_TYPE:
+        """Return complete options the document will be tidied with."""
+        if self.config is not None:
+            return {**self.config.options, **kwargs}
+        options = dict(kwargs)
+        docfactory._set_encodings(options)  # noqa: SLF001
+        return options
+
+    def _key(self, data: Buffer, options: OPTION_DICT_TYPE) -> bytes:
+        digest = hashlib.sha256(self._version.encode())
+        digest.update(hashlib.sha256(self._config_file).digest())
+        for name, value in sorted(
+            (name.replace("-", "_"), int(value) if isinstance(value, bool) else value)
+            for name, value in options.items()
+        ):
+            digest.update(f"\0{name}={value}".encode())
+        digest.update(b"\0\0")
+        digest.update(data)
+        return digest.digest()
+
+    def parseString(  # noqa: N802
+        self, text: Buffer | str, **kwargs: OPTION_TYPE
+    ) -> Document:
+        """Process text or return cached result, see :func:`tidy.parseString`."""
+        options = self._options(kwargs)
+        if (
+            options.get("diagnostics")
+            or options.get("max_errors") is not None
+            or _tracks_memory(options)
+        ):
+            # Results not kept by the cache
+            doc = docfactory.create(config=self.config, **kwargs)
+            docfactory.loadString(doc, text)
+            return doc
+        if isinstance(text, str):
+            input_encoding = options["input_encoding"]
+            assert isinstance(input_encoding, str)
+            text = text.encode(input_encoding)
+        key = self._key(text, options)
+        entry = self.store.get(key)
+        if entry is not None:
+            output, report = entry
+            return Document.detached(
+                output, [ReportItem(line) for line in report.splitlines()], options
+            )
+        doc = docfactory.create(config=self.config, **kwargs)
+        docfactory.loadBuffer(doc, text)
+        output = doc.getvalue()
+        self.store.set(key, (output, "\n".join(error.err for error in doc.errors)))
+        return doc
+
+    def parse(self, filename: FILE_TYPE, **kwargs: OPTION_TYPE) -> Document:
+        """Process file or return cached result, see :func:`tidy.parse`."""
+        if isinstance(filename, (str, os.PathLike)):
+            try:
+                data = Path(filename).read_bytes()
+            except OSError:
+                # TidyLib reports files it can not read
+                if self.config is not None:
+                    return self.config.parse(filename, **kwargs)
+                return docfactory.parse(filename, **kwargs)
+        else:
+            data = filename.read()
+        return self.parseString(data, **kwargs)
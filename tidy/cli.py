@@ -0,0 +1,273 @@
+"""
+Command-line interface tidying files and directory trees.
+
+Run as ``python -m tidy`` or ``utidy``::
+
+    utidy --output-dir build/ -o indent=auto -o tidy-mark=no pages/
+    utidy --in-place --config tidy.conf --jobs 4 pages/
+
+Files are tidied in parallel by :func:`tidy.parse_many`, with options
+validated by :class:`tidy.TidyConfig` before any file is processed. Files
+which did not change since the previous run with the same options are
+skipped, see ``--state``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from tidy.batch import parse_many
+from tidy.error import TidyLibError
+from tidy.lib import TidyConfig, getTidyVersion
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+
+    from tidy.lib import OPTION_DICT_TYPE
+
+    # Modification time in nanoseconds, size and SHA-256 of a file
+    STAMP_TYPE = tuple[int, int, str]
+
+__all__ = ("main",)
+
+STATE_FILE = ".utidylib-state.json"
+
+
+class Job(NamedTuple):
+    """File to tidy."""
+
+    source: Path
+    target: Path
+
+
+def find_files(
+    paths: Iterable[Path], patterns: Sequence[str]
+) -> Iterator[tuple[Path, Path]]:
+    """Yield files to tidy together with the path they were found from."""
+    for path in paths:
+        if path.is_dir():
+            for pattern in patterns:
+                for found in sorted(path.rglob(pattern)):
+                    if found.is_file():
+                        yield found, path
+        else:
+            yield path, path.parent
+
+
+def parse_option(value: str) -> tuple[str, str]:
+    """Parse ``name=value`` option from the command-line."""
+    name, separator, option = value.partition("=")
+    if not separator or not name:
+        msg = f"expected NAME=VALUE, got {value!r}"
+        raise argparse.ArgumentTypeError(msg)
+    return name.strip().replace("-", "_"), option.strip()
+
+
+def options_digest(config: TidyConfig) -> str:
+    """Return digest of everything affecting the output besides the input."""
+    digest = hashlib.sha256(getTidyVersion().encode())
+    if config.filename is not None:
+        digest.update(Path(config.filename).read_bytes())
+    digest.update(json.dumps(config.options, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class State:
+    """
+    Stamps of files tidied by previous runs.
+
+    A file is unchanged when its modification time and size match the
+    stamp, or when only the modification time differs and the content
+    hash matches.
+    """
+
+    def __init__(self, filename: Path | None, digest: str) -> None:
+        self.filename = filename
+        self.digest = digest
+        self.stamps: dict[str, STAMP_TYPE] = {}
+        if filename is not None and filename.exists():
+            data = json.loads(filename.read_text())
+            # Stamps of other options are useless
+            if data.get("options") == self.digest:
+                self.stamps = {
+                    name: (stamp[0], stamp[1], stamp[2])
+                    for name, stamp in data["files"].items()
+                }
+
+    def unchanged(self, path: Path) -> bool:
+        stamp = self.stamps.get(str(path))
+        if stamp is None:
+            return False
+        stat = path.stat()
+        if (stat.st_mtime_ns, stat.st_size) == stamp[:2]:
+            return True
+        if stat.st_size != stamp[1]:
+            return False
+        return hashlib.sha256(path.read_bytes()).hexdigest() == stamp[2]
+
+    def update(self, path: Path, content: bytes) -> None:
+        stat = path.stat()
+        self.stamps[str(path)] = (
+            stat.st_mtime_ns,
+            stat.st_size,
+            hashlib.sha256(content).hexdigest(),
+        )
+
+    def save(self) -> None:
+        if self.filename is None:
+            return
+        self.filename.write_text(
+            json.dumps({"options": self.digest, "files": self.stamps}, indent=1)
+        )
+
+
+def report(message: str) -> None:
+    sys.stderr.write(f"{message}\n")
+
+
+def write_file(path: Path, content: bytes) -> None:
+    """Replace the file content atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.utidylib")
+    temporary.write_bytes(content)
+    temporary.replace(path)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="utidy",
+        description="Tidy HTML files and directory trees.",
+    )
+    parser.add_argument("paths", nargs="+", type=Path, help="files or directories")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument(
+        "-i", "--in-place", action="store_true", help="overwrite the files"
+    )
+    target.add_argument(
+        "-d", "--output-dir", type=Path, help="write tidied files to this directory"
+    )
+    parser.add_argument("-c", "--config", help="Tidy configuration file")
+    parser.add_argument(
+        "-o",
+        "--option",
+        action="append",
+        default=[],
+        type=parse_option,
+        metavar="NAME=VALUE",
+        help="Tidy option, can be repeated",
+    )
+    parser.add_argument(
+        "-p",
+        "--pattern",
+        action="append",
+        help="file name pattern in directories, defaults to *.html and *.htm",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes, defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "--state",
+        type=Path,
+        help=f"file remembering tidied files, defaults to {STATE_FILE} in the "
+        "output directory or the current directory",
+    )
+    parser.add_argument(
+        "-f", "--force", action="store_true", help="tidy also unchanged files"
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="print reports of the files"
+    )
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:  # noqa: C901, PLR0912, PLR0915
+    """Run the command-line interface and return the exit code."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be positive")
+
+    options: OPTION_DICT_TYPE = dict(args.option)
+    try:
+        if args.config is None:
+            config = TidyConfig(**options)
+        else:
+            config = TidyConfig.from_file(args.config, **options)
+    except TidyLibError as error:
+        parser.error(str(error))
+
+    state_file = args.state
+    if state_file is None:
+        state_file = (args.output_dir or Path()) / STATE_FILE
+    state = State(state_file, options_digest(config))
+
+    jobs = []
+    skipped = 0
+    for source, root in find_files(args.paths, args.pattern or ["*.html", "*.htm"]):
+        target = source if args.in_place else args.output_dir / source.relative_to(root)
+        if not args.force and target.exists() and state.unchanged(source):
+            skipped += 1
+            continue
+        jobs.append(Job(source, target))
+
+    failed: set[int] = set()
+    total_bytes = 0
+
+    def read_all() -> Iterator[bytes]:
+        nonlocal total_bytes
+        for position, job in enumerate(jobs):
+            try:
+                data = job.source.read_bytes()
+            except OSError as error:
+                report(f"{job.source}: {error}")
+                failed.add(position)
+                data = b""
+            total_bytes += len(data)
+            yield data
+
+    start = time.perf_counter()
+    mode = "process" if args.jobs > 1 else "thread"
+    for result in parse_many(read_all(), args.jobs, mode, config=config):
+        if result.position in failed:
+            continue
+        job = jobs[result.position]
+        errors = [item for item in result.errors if item.severity == "E"]
+        for item in result.errors if args.verbose else errors:
+            report(f"{job.source}: {item}")
+        # TidyLib writes no output for documents with errors, keep the file
+        # and do not remember it, so that it is tidied again
+        if errors or not result.output:
+            report(f"{job.source}: not written, TidyLib reported errors")
+            failed.add(result.position)
+            continue
+        try:
+            write_file(job.target, result.output)
+        except OSError as error:
+            report(f"{job.target}: {error}")
+            failed.add(result.position)
+            continue
+        if args.in_place:
+            state.update(job.source, result.output)
+        else:
+            state.update(job.source, job.source.read_bytes())
+    elapsed = time.perf_counter() - start
+    state.save()
+
+    tidied = len(jobs) - len(failed)
+    rate = tidied / elapsed if elapsed else 0.0
+    report(
+        f"Tidied {tidied} files ({total_bytes / 1e6:.1f} MB) in {elapsed:.2f}s,"
+        f" {rate:.1f} files/s, skipped {skipped} unchanged, failed {len(failed)}"
+    )
+    return 1 if failed else 0
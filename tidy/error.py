@@ -2,7 +2,13 @@
 
 from __future__ import annotations
 
-__all__ = ("InvalidOptionError", "OptionArgError", "TidyLibError")
+__all__ = (
+    "InvalidOptionError",
+    "LimitExceededError",
+    "MemoryLimitError",
+    "OptionArgError",
+    "TidyLibError",
+)
 
 
 class TidyLibError(Exception):
@@ -18,3 +24,11 @@ class InvalidOptionError(TidyLibError):
 
 class OptionArgError(TidyLibError):
     """Exception for invalid parameter."""
+
+
+class LimitExceededError(TidyLibError):
+    """Exception for input exceeding a limit given in the options."""
+
+
+class MemoryLimitError(LimitExceededError):
+    """Exception for TidyLib using more memory than allowed by the options."""
@@ -1,26 +1,51 @@
 from __future__ import annotations
 
+import array
+import contextlib
+import contextvars
 import ctypes
+import enum
+import functools
 import io
+import mmap
 import os
 import os.path
+import sys
+import threading
+import time
 import weakref
 from abc import ABC, abstractmethod
-from collections.abc import Callable, Mapping
-from errno import ENOMEM
+from collections.abc import Callable, Mapping, Sequence
+from pathlib import Path
 from typing import (
     TYPE_CHECKING,
     Any,
     BinaryIO,
     ClassVar,
+    NamedTuple,
     TypeVar,
+    overload,
 )
 
-from tidy.error import InvalidOptionError, OptionArgError
+from tidy.error import (
+    InvalidOptionError,
+    LimitExceededError,
+    MemoryLimitError,
+    OptionArgError,
+    TidyLibError,
+)
 
 if TYPE_CHECKING:
-    OPTION_TYPE = str | int | bool | None
+    from collections.abc import Iterable, Iterator
+
+    from typing_extensions import Buffer, Self
+
+    from tidy.metrics import DocumentMetrics, Stats
+    from tidy.tree import Node
+
+    OPTION_TYPE = str | int | float | bool | None
     OPTION_DICT_TYPE = dict[str, OPTION_TYPE]
+    FILE_TYPE = str | os.PathLike[str] | BinaryIO
 
 LIBNAMES = (
     # MacOS Homebrew (ARM) - try first for CI compatibility
@@ -64,48 +89,308 @@ LIBNAMES = (
 )
 
 
+def _platform_libnames(libnames: tuple[str, ...]) -> tuple[str, ...]:
+    """Filter library names which can be loaded on this platform."""
+    if sys.platform == "darwin":
+        return tuple(name for name in libnames if name.endswith(".dylib"))
+    if sys.platform in {"win32", "cygwin"}:
+        return tuple(
+            name
+            for name in libnames
+            if ".so" not in name and not name.endswith(".dylib")
+        )
+    return tuple(name for name in libnames if ".so" in name)
+
+
+#: Library names tried on the current platform
+PLATFORM_LIBNAMES = _platform_libnames(LIBNAMES)
+
+
+def _cache_path() -> Path | None:
+    """Return path of the file remembering the loaded library."""
+    filename = os.environ.get("TIDY_LIBRARY_CACHE")
+    if filename is not None:
+        return Path(filename) if filename else None
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", "~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", "~/.cache")
+    return Path(base).expanduser() / "utidylib" / "library"
+
+
+_DOC = ctypes.c_void_p
+_POINTER = ctypes.c_void_p
+_STRING = ctypes.c_char_p
+
+# Bool tidyMessageCallback(TidyMessage tmessage)
+_MessageCallback = ctypes.CFUNCTYPE(ctypes.c_int, _POINTER)
+
+#: Result and argument types of used TidyLib functions
+PROTOTYPES: dict[str, tuple[type | None, tuple[type, ...]]] = {
+    # Documents
+    "Create": (_DOC, ()),
+    "CreateWithAllocator": (_DOC, (_POINTER,)),
+    "Release": (None, (_DOC,)),
+    "LibraryVersion": (_STRING, ()),
+    # Configuration
+    "OptParseValue": (ctypes.c_int, (_DOC, _STRING, _STRING)),
+    "OptCopyConfig": (ctypes.c_int, (_DOC, _DOC)),
+    "OptGetIdForName": (ctypes.c_int, (_STRING,)),
+    "OptGetEncName": (_STRING, (_DOC, ctypes.c_int)),
+    "OptGetBool": (ctypes.c_int, (_DOC, ctypes.c_int)),
+    "LoadConfig": (ctypes.c_int, (_DOC, _STRING)),
+    # Processing
+    "ParseFile": (ctypes.c_int, (_DOC, _STRING)),
+    "ParseBuffer": (ctypes.c_int, (_DOC, _POINTER)),
+    "CleanAndRepair": (ctypes.c_int, (_DOC,)),
+    "RunDiagnostics": (ctypes.c_int, (_DOC,)),
+    "SaveBuffer": (ctypes.c_int, (_DOC, _POINTER)),
+    "SaveFile": (ctypes.c_int, (_DOC, _STRING)),
+    "SaveSink": (ctypes.c_int, (_DOC, _POINTER)),
+    # Error reporting
+    "SetErrorSink": (ctypes.c_int, (_DOC, _POINTER)),
+    "SetErrorBuffer": (ctypes.c_int, (_DOC, _POINTER)),
+    "ErrorCount": (ctypes.c_uint, (_DOC,)),
+    "WarningCount": (ctypes.c_uint, (_DOC,)),
+    "AccessWarningCount": (ctypes.c_uint, (_DOC,)),
+    "ConfigErrorCount": (ctypes.c_uint, (_DOC,)),
+    "SetMessageCallback": (ctypes.c_int, (_DOC, _MessageCallback)),
+    "GetMessageDoc": (_DOC, (_POINTER,)),
+    "GetMessageCode": (ctypes.c_uint, (_POINTER,)),
+    "GetMessageLevel": (ctypes.c_int, (_POINTER,)),
+    "GetMessageLine": (ctypes.c_int, (_POINTER,)),
+    "GetMessageColumn": (ctypes.c_int, (_POINTER,)),
+    "GetMessageIsMuted": (ctypes.c_int, (_POINTER,)),
+    "ErrorCodeAsKey": (_STRING, (ctypes.c_uint,)),
+    # Document tree
+    "GetRoot": (_POINTER, (_DOC,)),
+    "GetHtml": (_POINTER, (_DOC,)),
+    "GetHead": (_POINTER, (_DOC,)),
+    "GetBody": (_POINTER, (_DOC,)),
+    "GetParent": (_POINTER, (_POINTER,)),
+    "GetChild": (_POINTER, (_POINTER,)),
+    "GetNext": (_POINTER, (_POINTER,)),
+    "GetPrev": (_POINTER, (_POINTER,)),
+    "NodeGetType": (ctypes.c_int, (_POINTER,)),
+    "NodeGetName": (_STRING, (_POINTER,)),
+    "NodeGetValue": (ctypes.c_int, (_DOC, _POINTER, _POINTER)),
+    "NodeLine": (ctypes.c_uint, (_POINTER,)),
+    "NodeColumn": (ctypes.c_uint, (_POINTER,)),
+    "AttrFirst": (_POINTER, (_POINTER,)),
+    "AttrNext": (_POINTER, (_POINTER,)),
+    "AttrName": (_STRING, (_POINTER,)),
+    "AttrValue": (_STRING, (_POINTER,)),
+    # Buffers
+    "BufInit": (None, (_POINTER,)),
+    "BufAttach": (None, (_POINTER, _POINTER, ctypes.c_uint)),
+    "BufAppend": (None, (_POINTER, _POINTER, ctypes.c_uint)),
+    "BufClear": (None, (_POINTER,)),
+    "BufFree": (None, (_POINTER,)),
+}
+
+
+#: TidyLib functions used by diagnostics and the max_errors limit
+MESSAGE_FUNCTIONS = (
+    "SetMessageCallback",
+    "GetMessageDoc",
+    "GetMessageCode",
+    "GetMessageLevel",
+    "GetMessageLine",
+    "GetMessageColumn",
+    "GetMessageIsMuted",
+    "ErrorCodeAsKey",
+)
+
+#: TidyLib functions missing in older libraries, only features using them fail
+OPTIONAL_FUNCTIONS = frozenset(("CreateWithAllocator", *MESSAGE_FUNCTIONS))
+
+#: Names of available backends
+BACKENDS = ("native", "ctypes")
+
+#: TidyLib functions called by the native backend
+NATIVE_FUNCTIONS = (
+    "BufInit",
+    "BufAttach",
+    "BufFree",
+    "ParseBuffer",
+    "ParseFile",
+    "CleanAndRepair",
+    "SaveBuffer",
+    "SaveSink",
+    "BufAppend",
+    "GetChild",
+    "GetNext",
+    "GetParent",
+    "NodeGetType",
+    "NodeGetName",
+    "NodeGetValue",
+)
+
+
 class Loader:
     """
     ctypes.CDLL wrapper.
 
     I am a trivial wrapper that eliminates the need for tidy.tidyFoo,
-    so you can just access tidy.Foo.
+    so you can just access tidy.Foo. Functions listed in
+    :data:`PROTOTYPES` get their types declared and are bound as
+    attributes once the library is loaded. Libraries lacking some of
+    :data:`OPTIONAL_FUNCTIONS` are loaded as well, see :meth:`require`.
+
+    The library is searched for at the path given by the
+    ``TIDY_LIBRARY_FULL_PATH`` environment variable, then at the path which
+    was loaded last time, then by :func:`ctypes.util.find_library` and
+    finally among :data:`PLATFORM_LIBNAMES`. The path of the loaded library
+    is remembered in a cache file, set ``TIDY_LIBRARY_CACHE`` to change its
+    location or to an empty string to disable it.
+
+    The backend processing documents is selected by the ``TIDY_BACKEND``
+    environment variable, see :func:`set_backend`.
+
+    :param libnames: library names to try instead of the default search
+    :param lazy: load the library on first use instead of right away
     """
 
-    def __init__(self, libnames: tuple[str, ...] | None = None) -> None:
-        self.lib: ctypes.CDLL
-        self.libnames: tuple[str, ...] = libnames or LIBNAMES
-
-        # Add package directory to search path
-        os.environ["PATH"] = "".join(
-            (os.path.dirname(__file__), os.pathsep, os.environ["PATH"]),
-        )
+    def __init__(
+        self, libnames: tuple[str, ...] | None = None, *, lazy: bool = False
+    ) -> None:
+        self._libnames = libnames
+        self._cached: str | None = None
+        self._lock = threading.Lock()
+        if not lazy:
+            self.load()
 
+    def _candidates(self) -> Iterator[str]:
         # Add full path to a library
         lib_path = os.environ.get("TIDY_LIBRARY_FULL_PATH")
         if lib_path:
-            self.libnames = (lib_path, *self.libnames)
-
-        # Try loading library
-        for libname in self.libnames:
+            yield lib_path
+        if self._libnames is not None:
+            yield from self._libnames
+            return
+        cache = _cache_path()
+        if cache is not None:
+            with contextlib.suppress(OSError):
+                self._cached = cache.read_text(encoding="utf-8")
+            if self._cached:
+                yield self._cached
+        # Imported here as it is slow to import and rarely needed
+        import ctypes.util  # noqa: PLC0415
+
+        found = ctypes.util.find_library("tidy")
+        if found:
+            yield found
+        yield from PLATFORM_LIBNAMES
+
+    def _store(self, libname: str) -> None:
+        """Remember loaded library for next processes."""
+        cache = _cache_path()
+        if (
+            cache is None
+            or self._libnames is not None
+            or libname in {self._cached, os.environ.get("TIDY_LIBRARY_FULL_PATH")}
+        ):
+            return
+        with contextlib.suppress(OSError):
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            cache.write_text(libname, encoding="utf-8")
+
+    def load(self) -> None:
+        """Load the library unless it is already loaded."""
+        with self._lock:
+            if "lib" in self.__dict__:
+                return
+
+            if sys.platform == "win32":
+                # Add package directory to search path
+                os.environ["PATH"] = "".join(
+                    (os.path.dirname(__file__), os.pathsep, os.environ["PATH"]),
+                )
+
+            # Try loading library
+            tried = []
+            for libname in self._candidates():
+                tried.append(libname)
+                try:
+                    lib = ctypes.CDLL(libname)
+                    break
+                except OSError:
+                    continue
+            else:
+                # Fail in case we could not load it
+                raise OSError(
+                    "Couldn't find libtidy, please make sure it is installed."
+                )
+
+            missing = set()
+            for name, (restype, argtypes) in PROTOTYPES.items():
+                try:
+                    function = getattr(lib, f"tidy{name}")
+                except AttributeError:
+                    if name not in OPTIONAL_FUNCTIONS:
+                        raise
+                    missing.add(name)
+                    continue
+                function.restype = restype
+                function.argtypes = argtypes
+                setattr(self, name, function)
+            #: Optional functions the library does not provide
+            self.missing = frozenset(missing)
+            self._select_backend(os.environ.get("TIDY_BACKEND", "auto"))
+            self.libnames: tuple[str, ...] = tuple(tried)  #: Library names tried
+            self.lib: ctypes.CDLL = lib
+            self._store(libname)
+
+    def _select_backend(self, name: str) -> None:
+        if name not in {"auto", *BACKENDS}:
+            msg = f"Unsupported backend: {name!r}"
+            raise ValueError(msg)
+        if name != "ctypes":
             try:
-                self.lib = ctypes.CDLL(libname)
-                break
-            except OSError:
-                continue
-        else:
-            # Fail in case we could not load it
-            raise OSError("Couldn't find libtidy, please make sure it is installed.")
+                from tidy import _ctidy  # noqa: PLC0415
+            except ImportError:
+                if name == "native":
+                    raise
+            else:
+                _ctidy.bind(
+                    {
+                        function: ctypes.cast(
+                            self.__dict__[function], ctypes.c_void_p
+                        ).value
+                        for function in NATIVE_FUNCTIONS
+                    }
+                )
+                self.backend: Any = _ctidy
+                self.backend_name = "native"
+                return
+        self.backend = _CtypesBackend
+        self.backend_name = "ctypes"
+
+    def require(self, feature: str, *names: str) -> None:
+        """
+        Raise :exc:`TidyLibError` when the library lacks any of the functions.
 
-        # Adjust some types
-        self.Create.restype = ctypes.POINTER(ctypes.c_void_p)
-        self.LibraryVersion.restype = ctypes.c_char_p
+        :param feature: description of what needs the functions
+        :param names: names of the functions without the ``tidy`` prefix
+        """
+        missing = self.missing.intersection(names)
+        if missing:
+            version = self.LibraryVersion().decode()
+            msg = (
+                f"{feature} is not supported by TidyLib {version},"
+                f" it lacks {', '.join(sorted(f'tidy{name}' for name in missing))}"
+            )
+            raise TidyLibError(msg)
 
     def __getattr__(self, name: str) -> Any:  # noqa: ANN401
+        if "lib" not in self.__dict__:
+            self.load()
+            if name in self.__dict__:
+                return self.__dict__[name]
         return getattr(self.lib, f"tidy{name}")
 
 
-_tidy = Loader()
+_tidy = Loader(lazy=True)
 
 
 _putByteFunction = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int, ctypes.c_char)
@@ -123,19 +408,476 @@ class _OutputSink(ctypes.Structure):
     _fields_ = (("sinkData", ctypes.c_int), ("putByte", _putByteFunction))
 
 
-class _Sink:
+_writeByteFunction = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_ubyte)
+
+
+class _StreamOutputSink(ctypes.Structure):
+    _fields_ = (("sinkData", ctypes.c_void_p), ("putByte", _writeByteFunction))
+
+
+class _StreamWriter:
+    """Output sink passing document output to a callable in chunks."""
+
+    def __init__(self, write: Callable[[bytes], object], chunk_size: int) -> None:
+        self.write = write
+        self.chunk_size = chunk_size
+        self.chunk = bytearray()
+        self.error: BaseException | None = None
+        self.struct = _StreamOutputSink()
+        self.struct.putByte = _writeByteFunction(self.putByte)
+
+    def putByte(self, _: int, byte: int) -> None:
+        self.chunk.append(byte)
+        if len(self.chunk) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        # Exceptions can not propagate through TidyLib, keep the first one
+        # and ignore any further output
+        if self.chunk and self.error is None:
+            try:
+                self.write(bytes(self.chunk))
+            except BaseException as error:  # noqa: BLE001
+                self.error = error
+        self.chunk = bytearray()
+
+
+class _TidyBuffer(ctypes.Structure):
+    _fields_ = (
+        ("allocator", ctypes.c_void_p),
+        ("bp", ctypes.c_void_p),
+        ("size", ctypes.c_uint),
+        ("allocated", ctypes.c_uint),
+        ("next", ctypes.c_uint),
+    )
+
+
+# TidyBuffer uses unsigned int for sizes
+_MAX_BUFFER = 2**32 - 1
+
+
+class _PyBuffer(ctypes.Structure):
+    _fields_ = (
+        ("buf", ctypes.c_void_p),
+        ("obj", ctypes.c_void_p),
+        ("len", ctypes.c_ssize_t),
+        ("itemsize", ctypes.c_ssize_t),
+        ("readonly", ctypes.c_int),
+        ("ndim", ctypes.c_int),
+        ("format", ctypes.c_char_p),
+        ("shape", ctypes.c_void_p),
+        ("strides", ctypes.c_void_p),
+        ("suboffsets", ctypes.c_void_p),
+        ("internal", ctypes.c_void_p),
+    )
+
+
+@contextlib.contextmanager
+def _input_buffer(data: Buffer) -> Iterator[_TidyBuffer]:
+    """
+    Wrap a bytes-like object in a TidyBuffer without copying it.
+
+    The buffer is exported through the buffer protocol, so any contiguous
+    object works, including read-only ones such as bytes or mmap.
+    """
+    view = _PyBuffer()
+    try:
+        ctypes.pythonapi.PyObject_GetBuffer(
+            ctypes.py_object(data), ctypes.byref(view), 0
+        )
+    except BufferError:
+        # Not contiguous, needs a copy
+        data = memoryview(data).tobytes()
+        ctypes.pythonapi.PyObject_GetBuffer(
+            ctypes.py_object(data), ctypes.byref(view), 0
+        )
+    try:
+        if view.len > _MAX_BUFFER:
+            raise ValueError("TidyLib can not process more than 4 GiB of input")
+        buffer = _TidyBuffer()
+        _tidy.BufInit(ctypes.byref(buffer))
+        # TidyLib only reads the attached memory and does not free it
+        _tidy.BufAttach(ctypes.byref(buffer), view.buf, view.len)
+        yield buffer
+    finally:
+        ctypes.pythonapi.PyBuffer_Release(ctypes.byref(view))
+
+
+class _CountingAllocator(ctypes.Structure):
+    """TidyAllocator counting allocated bytes, CountingAllocator in _ctidy.c."""
+
+    _fields_ = (
+        ("vtbl", ctypes.c_void_p),
+        ("current", ctypes.c_size_t),
+        ("peak", ctypes.c_size_t),
+    )
+
+
+_allocFunction = ctypes.CFUNCTYPE(_POINTER, _POINTER, ctypes.c_size_t)
+_reallocFunction = ctypes.CFUNCTYPE(_POINTER, _POINTER, _POINTER, ctypes.c_size_t)
+_freeFunction = ctypes.CFUNCTYPE(None, _POINTER, _POINTER)
+_panicFunction = ctypes.CFUNCTYPE(None, _POINTER, _STRING)
+
+
+class _AllocatorVtbl(ctypes.Structure):
+    _fields_ = (
+        ("alloc", _allocFunction),
+        ("realloc", _reallocFunction),
+        ("free", _freeFunction),
+        ("panic", _panicFunction),
+    )
+
+
+# Requested size stored in front of each block, keeping the alignment
+_BLOCK_HEADER = 16
+
+
+def _raw_memory(name: str, restype: type | None, *argtypes: type) -> Any:  # noqa: ANN401
+    function = getattr(ctypes.pythonapi, name)
+    function.restype = restype
+    function.argtypes = argtypes
+    return function
+
+
+_raw_malloc = _raw_memory("PyMem_RawMalloc", _POINTER, ctypes.c_size_t)
+_raw_realloc = _raw_memory("PyMem_RawRealloc", _POINTER, _POINTER, ctypes.c_size_t)
+_raw_free = _raw_memory("PyMem_RawFree", None, _POINTER)
+
+
+def _count_block(allocator: int, old_size: int, new_size: int) -> None:
+    counts = _CountingAllocator.from_address(allocator)
+    counts.current = counts.current - old_size + new_size
+    counts.peak = max(counts.peak, counts.current)
+
+
+@_allocFunction
+def _counting_alloc(allocator: int, size: int) -> int | None:
+    header = _raw_malloc(_BLOCK_HEADER + size)
+    if header is None:
+        return None
+    ctypes.c_size_t.from_address(header).value = size
+    _blocks[allocator].add(header)
+    _count_block(allocator, 0, size)
+    return header + _BLOCK_HEADER
+
+
+@_reallocFunction
+def _counting_realloc(allocator: int, block: int | None, size: int) -> int | None:
+    if block is None:
+        return _counting_alloc(allocator, size)
+    old_size = ctypes.c_size_t.from_address(block - _BLOCK_HEADER).value
+    header = _raw_realloc(block - _BLOCK_HEADER, _BLOCK_HEADER + size)
+    if header is None:
+        return None
+    blocks = _blocks[allocator]
+    blocks.discard(block - _BLOCK_HEADER)
+    blocks.add(header)
+    ctypes.c_size_t.from_address(header).value = size
+    _count_block(allocator, old_size, size)
+    return header + _BLOCK_HEADER
+
+
+@_freeFunction
+def _counting_free(allocator: int, block: int | None) -> None:
+    if block is None:
+        return
+    _count_block(
+        allocator, ctypes.c_size_t.from_address(block - _BLOCK_HEADER).value, 0
+    )
+    _blocks[allocator].discard(block - _BLOCK_HEADER)
+    _raw_free(block - _BLOCK_HEADER)
+
+
+@_panicFunction
+def _counting_panic(_allocator: int, message: bytes) -> None:
+    # Called when an allocation fails, TidyLib can not continue
+    ctypes.pythonapi.Py_FatalError(message)
+
+
+_counting_vtbl = _AllocatorVtbl(
+    _counting_alloc, _counting_realloc, _counting_free, _counting_panic
+)
+# Allocators of the ctypes backend by their address, kept alive while used
+_allocators: dict[int, _CountingAllocator] = {}
+# Addresses of blocks allocated by the allocators
+_blocks: dict[int, set[int]] = {}
+
+
+# Values of TidyNodeType, see tidy.tree.NodeType
+_NODE_TEXT = 4
+_NODE_ELEMENTS = (5, 7)
+# Elements whose content is not text of the document
+_NON_TEXT = (b"script", b"style")
+# Elements separating lines of text, kept in sync with blocks in _ctidy.c
+_BLOCKS = frozenset(
+    b"address article aside blockquote body br caption center dd details dialog"
+    b" div dl dt fieldset figcaption figure footer form h1 h2 h3 h4 h5 h6 header"
+    b" hr li main nav ol p pre section summary table td th title tr ul".split()
+)
+
+
+def _descendants(top: int) -> Iterator[int]:
+    """Yield descendants of the node in document order."""
+    # Called for every node, avoid attribute lookups
+    get_child = _tidy.GetChild
+    get_next = _tidy.GetNext
+    get_parent = _tidy.GetParent
+    node = get_child(top)
+    while node is not None:
+        yield node
+        child = get_child(node)
+        if child is not None:
+            node = child
+            continue
+        # Find the next sibling of the node or of its ancestors
+        while node != top:
+            sibling = get_next(node)
+            if sibling is not None:
+                node = sibling
+                break
+            node = get_parent(node)
+        else:
+            return
+
+
+def _is_block(node: int) -> bool:
+    return (
+        _tidy.NodeGetType(node) in _NODE_ELEMENTS and _tidy.NodeGetName(node) in _BLOCKS
+    )
+
+
+def _text_parts(
+    cdoc: Any,  # noqa: ANN401
+    top: int,
+    reference: Any,  # noqa: ANN401
+    buffer: _TidyBuffer,
+) -> Iterator[bytes]:
+    """Yield text of descendants of the node, separating blocks by newlines."""
+    get_type = _tidy.NodeGetType
+    get_value = _tidy.NodeGetValue
+    get_child = _tidy.GetChild
+    get_next = _tidy.GetNext
+    get_parent = _tidy.GetParent
+    get_name = _tidy.NodeGetName
+    separate = written = False
+    # Same walk as _descendants, noting entered and left blocks
+    node = get_child(top)
+    while node is not None:
+        if get_type(node) == _NODE_TEXT:
+            # The value replaces content of the buffer
+            if get_value(cdoc, node, reference) and buffer.size:
+                if separate and written:
+                    yield b"\n"
+                separate = False
+                written = True
+                yield ctypes.string_at(buffer.bp, buffer.size)
+        elif _is_block(node):
+            separate = True
+        following = None if get_name(node) in _NON_TEXT else get_child(node)
+        while following is None and node != top:
+            separate = separate or _is_block(node)
+            following = get_next(node)
+            if following is None:
+                node = get_parent(node)
+        node = following
+
+
+class _CtypesBackend:
+    """Backend calling TidyLib through ctypes only."""
+
+    @staticmethod
+    def parse_buffer(cdoc: Any, data: Buffer, clean: bool = True) -> int:  # noqa: ANN401, FBT001, FBT002
+        with _input_buffer(data) as buffer:
+            status = _tidy.ParseBuffer(cdoc, ctypes.byref(buffer))
+            if status >= 0 and clean:
+                _tidy.CleanAndRepair(cdoc)
+        return status
+
+    @staticmethod
+    def parse_text(cdoc: Any, text: str, clean: bool = True) -> int:  # noqa: ANN401, FBT001, FBT002
+        return _CtypesBackend.parse_buffer(cdoc, text.encode("utf-8"), clean)
+
+    @staticmethod
+    def parse_file(cdoc: Any, filename: bytes, clean: bool = True) -> int:  # noqa: ANN401, FBT001, FBT002
+        status = _tidy.ParseFile(cdoc, filename)
+        if status >= 0 and clean:
+            _tidy.CleanAndRepair(cdoc)
+        return status
+
+    @staticmethod
+    def save_buffer(cdoc: Any) -> bytes:  # noqa: ANN401
+        buffer = _TidyBuffer()
+        _tidy.BufInit(ctypes.byref(buffer))
+        try:
+            _tidy.SaveBuffer(cdoc, ctypes.byref(buffer))
+            return ctypes.string_at(buffer.bp, buffer.size)
+        finally:
+            _tidy.BufFree(ctypes.byref(buffer))
+
+    @staticmethod
+    def save_text(cdoc: Any) -> str:  # noqa: ANN401
+        return _CtypesBackend.save_buffer(cdoc).decode("utf-8")
+
+    @staticmethod
+    def save_stream(
+        cdoc: Any,  # noqa: ANN401
+        write: Callable[[bytes], object],
+        chunk_size: int,
+    ) -> None:
+        if chunk_size <= 0:
+            msg = "chunk size must be positive"
+            raise ValueError(msg)
+        writer = _StreamWriter(write, chunk_size)
+        _tidy.SaveSink(cdoc, ctypes.byref(writer.struct))
+        writer.flush()
+        if writer.error is not None:
+            raise writer.error
+
+    @staticmethod
+    def create_allocator() -> int:
+        allocator = _CountingAllocator(ctypes.addressof(_counting_vtbl))
+        address = ctypes.addressof(allocator)
+        _allocators[address] = allocator
+        _blocks[address] = set()
+        return address
+
+    @staticmethod
+    def free_allocator(address: int) -> None:
+        del _allocators[address]
+        # Blocks TidyLib did not free by tidyRelease are leaked otherwise
+        for header in _blocks.pop(address):
+            _raw_free(header)
+
+    @staticmethod
+    def elements(node: int, name: str | None = None) -> list[int]:
+        get_type = _tidy.NodeGetType
+        if name is None:
+            return [
+                pointer
+                for pointer in _descendants(node)
+                if get_type(pointer) in _NODE_ELEMENTS
+            ]
+        # Only elements have a name
+        get_name = _tidy.NodeGetName
+        encoded = name.encode("utf-8")
+        return [
+            pointer
+            for pointer in _descendants(node)
+            if get_name(pointer) == encoded and get_type(pointer) in _NODE_ELEMENTS
+        ]
+
+    @staticmethod
+    def text(cdoc: Any, node: int) -> bytes:  # noqa: ANN401
+        buffer = _TidyBuffer()
+        reference = ctypes.byref(buffer)
+        get_type = _tidy.NodeGetType
+        get_value = _tidy.NodeGetValue
+        _tidy.BufInit(reference)
+        try:
+            if get_type(node) == _NODE_TEXT:
+                get_value(cdoc, node, reference)
+                return ctypes.string_at(buffer.bp, buffer.size)
+            return b"".join(_text_parts(cdoc, node, reference, buffer))
+        finally:
+            _tidy.BufFree(reference)
+
+
+def set_backend(name: str = "auto") -> str:
+    """
+    Select backend used for parsing and serializing documents.
+
+    The ``native`` backend is an optional C extension, which processes a
+    document in a single call. The ``ctypes`` backend is always available.
+    The default ``auto`` selects the native backend when it was built.
+
+    :param name: ``auto``, ``native`` or ``ctypes``
+    :return: name of the selected backend
+    """
+    _tidy.load()
+    _tidy._select_backend(name)  # noqa: SLF001
+    return _tidy.backend_name
+
+
+def get_backend() -> str:
+    """Return name of the backend in use, see :func:`set_backend`."""
+    return _tidy.backend_name
+
+
+class _ErrorSink(ABC):
+    """Destination for the error report of a single document."""
+
+    def __init__(self, handle: int) -> None:
+        self.handle = handle
+
+    @abstractmethod
+    def attach(self, cdoc: Any) -> None:  # noqa: ANN401
+        """Direct error output of the TidyLib document to this sink."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def getvalue(self, offset: int = 0) -> bytes:
+        """Return the report collected so far, starting at offset."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Discard the collected report."""
+        raise NotImplementedError
+
+
+class _Sink(_ErrorSink):
+    """Error sink receiving diagnostics byte by byte through :func:`putByte`."""
+
     def __init__(self, handle: int) -> None:
+        super().__init__(handle)
         self._data = io.BytesIO()
         self.struct = _OutputSink()
         self.struct.putByte = putByte
-        self.handle = handle
+        self.struct.sinkData = handle
+
+    def attach(self, cdoc: Any) -> None:  # noqa: ANN401
+        _tidy.SetErrorSink(cdoc, ctypes.byref(self.struct))
 
     def putByte(self, byte: bytes) -> None:
         self._data.write(byte)
 
-    def getvalue(self) -> bytes:
+    def getvalue(self, offset: int = 0) -> bytes:
+        if offset:
+            return self._data.getbuffer()[offset:].tobytes()
         return self._data.getvalue()
 
+    def clear(self) -> None:
+        self._data = io.BytesIO()
+
+
+class _BufferSink(_ErrorSink):
+    """
+    Error sink backed by a native TidyBuffer.
+
+    TidyLib appends the report to the buffer itself, so no Python code runs
+    while the document is processed and the text is copied out in one go.
+    """
+
+    def __init__(self, handle: int) -> None:
+        super().__init__(handle)
+        self.buffer = _TidyBuffer()
+        _tidy.BufInit(ctypes.byref(self.buffer))
+
+    def attach(self, cdoc: Any) -> None:  # noqa: ANN401
+        _tidy.SetErrorBuffer(cdoc, ctypes.byref(self.buffer))
+
+    def getvalue(self, offset: int = 0) -> bytes:
+        if offset >= self.buffer.size:
+            return b""
+        return ctypes.string_at(self.buffer.bp + offset, self.buffer.size - offset)
+
+    def clear(self) -> None:
+        _tidy.BufClear(ctypes.byref(self.buffer))
+
+    def __del__(self) -> None:
+        # The document writing into the buffer is released before the sink
+        _tidy.BufFree(ctypes.byref(self.buffer))
+
 
 class ReportItem:
     """Error report item as returned by tidy."""
@@ -187,6 +929,167 @@ class ReportItem:
         return "{}('{}')".format(self.__class__.__name__, str(self).replace("'", "\\'"))
 
 
+class Severity(enum.IntEnum):
+    """Severity of a diagnostic, values of TidyLib ``TidyReportLevel``."""
+
+    INFO = 350
+    WARNING = 351
+    CONFIG = 352
+    ACCESS = 353
+    ERROR = 354
+    BAD_DOCUMENT = 355
+    FATAL = 356
+    DIALOGUE_SUMMARY = 357
+    DIALOGUE_INFO = 358
+    DIALOGUE_FOOTNOTE = 359
+
+
+@functools.cache
+def _message_key(code: int) -> str:
+    key = _tidy.ErrorCodeAsKey(code)
+    assert isinstance(key, bytes)
+    return key.decode("utf-8")
+
+
+class Diagnostic(NamedTuple):
+    """Diagnostic as reported by TidyLib, see :class:`Diagnostics`."""
+
+    code: int  #: TidyLib message code
+    level: int  #: Severity of the message, see :class:`Severity`
+    line: int  #: Line where the message was fired, 0 if not applicable
+    column: int  #: Column where the message was fired, 0 if not applicable
+
+    @property
+    def severity(self) -> Severity:
+        return Severity(self.level)
+
+    @property
+    def key(self) -> str:
+        """Stable name of the message code, for example ``MISSING_DOCTYPE``."""
+        return _message_key(self.code)
+
+
+class Diagnostics(Sequence[Diagnostic]):
+    """
+    Compact collection of diagnostics of a document.
+
+    Filled from the TidyLib message callback, so no report text is
+    produced or parsed. The values are kept in typed arrays, items are
+    created as :class:`Diagnostic` on access only.
+    """
+
+    __slots__ = ("codes", "columns", "levels", "lines")
+
+    def __init__(self) -> None:
+        self.codes = array.array("I")
+        self.levels = array.array("H")
+        self.lines = array.array("i")
+        self.columns = array.array("i")
+
+    def append(self, code: int, level: int, line: int, column: int) -> None:
+        self.codes.append(code)
+        self.levels.append(level)
+        self.lines.append(line)
+        self.columns.append(column)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @overload
+    def __getitem__(self, index: int) -> Diagnostic: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Diagnostic]: ...
+
+    def __getitem__(self, index: int | slice) -> Diagnostic | list[Diagnostic]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return Diagnostic(
+            self.codes[index],
+            self.levels[index],
+            self.lines[index],
+            self.columns[index],
+        )
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} of {len(self)} items>"
+
+    def filter(
+        self,
+        severity: Iterable[int] | int | None = None,
+        code: Iterable[int] | int | None = None,
+    ) -> Diagnostics:
+        """
+        Return diagnostics matching all given conditions.
+
+        :param severity: a :class:`Severity` or several of them
+        :param code: a TidyLib message code or several of them
+        """
+        levels = {severity} if isinstance(severity, int) else severity
+        codes = {code} if isinstance(code, int) else code
+        result = Diagnostics()
+        for i, (item_code, item_level) in enumerate(
+            zip(self.codes, self.levels, strict=True)
+        ):
+            if (levels is None or item_level in levels) and (
+                codes is None or item_code in codes
+            ):
+                result.append(item_code, item_level, self.lines[i], self.columns[i])
+        return result
+
+
+class ValidationResult(NamedTuple):
+    """Result of :func:`validate` and :func:`validate_file`."""
+
+    error_count: int  #: Number of errors
+    warning_count: int  #: Number of warnings
+    access_count: int  #: Number of accessibility warnings
+    config_count: int  #: Number of configuration errors
+    #: Reported messages, :class:`Diagnostics` when requested by the options
+    report: list[ReportItem] | Diagnostics
+
+
+class _Messages:
+    """Handling of messages of a document, see _message_callback."""
+
+    __slots__ = ("count", "diagnostics", "limit")
+
+    def __init__(self, diagnostics: Diagnostics | None, limit: int) -> None:
+        self.diagnostics = diagnostics
+        self.limit = limit
+        self.count = 0  # Number of messages reported by TidyLib
+
+    @property
+    def dropped(self) -> int:
+        return max(self.count - self.limit, 0)
+
+
+# Message handling of documents by their TidyLib document
+_messages: dict[int, _Messages] = {}
+
+
+@_MessageCallback
+def _message_callback(message: int) -> int:
+    messages = _messages.get(_tidy.GetMessageDoc(message))
+    if messages is None:
+        # Not handled, keep it in the text report
+        return 1
+    if _tidy.GetMessageIsMuted(message):
+        return 0
+    messages.count += 1
+    if messages.count > messages.limit:
+        return 0
+    diagnostics = messages.diagnostics
+    if diagnostics is None:
+        return 1
+    # Inlined Diagnostics.append, this runs for every message
+    diagnostics.codes.append(_tidy.GetMessageCode(message))
+    diagnostics.levels.append(_tidy.GetMessageLevel(message))
+    diagnostics.lines.append(_tidy.GetMessageLine(message))
+    diagnostics.columns.append(_tidy.GetMessageColumn(message))
+    return 0
+
+
 K = TypeVar("K")
 V = TypeVar("V")
 
@@ -197,50 +1100,315 @@ class FactoryDict(ABC, dict, Mapping[K, V]):
 
     I am a dict with a create method and no __setitem__.  This allows
     me to control my own keys.
+
+    Registration and removal are serialized by a reentrant lock, so items
+    can be created and dropped from several threads, including from weakref
+    callbacks triggered by garbage collection while the lock is held.
     """
 
+    def __init__(self) -> None:
+        super().__init__()
+        self._lock = threading.RLock()
+
     @abstractmethod
     def create(self) -> V:
         """Generate a new item."""
         raise NotImplementedError
 
     def _setitem(self, name: K, value: V) -> None:
-        dict.__setitem__(self, name, value)
+        with self._lock:
+            dict.__setitem__(self, name, value)
+
+    def discard(self, name: K) -> V | None:
+        """Remove and return an item, ignoring unknown keys."""
+        with self._lock:
+            return dict.pop(self, name, None)
 
     def __setitem__(self, _: K, __: V) -> None:
         raise TypeError("Use create() to get a new object")
 
 
-class SinkFactory(FactoryDict[int, _Sink]):
-    """Mapping for lookup of sinks by handle."""
+class SinkFactory(FactoryDict[int, _ErrorSink]):
+    """
+    Mapping for lookup of sinks by handle.
+
+    :param buffered: Collect errors in a native TidyBuffer instead of
+                     calling back into Python for every byte.
+    """
 
-    def __init__(self) -> None:
+    def __init__(self, *, buffered: bool = True) -> None:
         super().__init__()
         self.lastsink: int = 0
-
-    def create(self) -> _Sink:
-        sink = _Sink(self.lastsink)
-        sink.struct.sinkData = self.lastsink
-        FactoryDict._setitem(self, self.lastsink, sink)  # noqa: SLF001
-        self.lastsink = self.lastsink + 1
+        self.buffered: bool = buffered
+
+    def create(self) -> _ErrorSink:
+        sink_class = _BufferSink if self.buffered else _Sink
+        with self._lock:
+            sink = sink_class(self.lastsink)
+            FactoryDict._setitem(self, self.lastsink, sink)  # noqa: SLF001
+            self.lastsink = self.lastsink + 1
         return sink
 
 
 sinkfactory = SinkFactory()
 
+#: Number of documents a pooled handle is used for before it is released
+HANDLE_USES = 1000
+
+
+class _Handle:
+    """TidyLib document together with its error sink."""
+
+    def __init__(self, *, track_memory: bool = False) -> None:
+        #: Address of the counting allocator when memory is tracked
+        self.allocator: int | None = None
+        #: Address of the allocator of the TidyLib document, if any
+        self.owned_allocator: int | None = None
+        #: Number of documents which used the handle
+        self.uses = 0
+        if track_memory:
+            _tidy.require("Memory tracking", "CreateWithAllocator")
+        # TidyLib 5.9 does not free some blocks on tidyRelease, the counting
+        # allocator frees them with its own. It is cheap in the native
+        # backend, the ctypes one is used only when tracking memory.
+        if track_memory or (
+            _tidy.backend_name == "native"
+            and "CreateWithAllocator" not in _tidy.missing
+        ):
+            # The allocator is freed by the backend which created it
+            self.backend = _tidy.backend
+            self.owned_allocator = self.backend.create_allocator()
+            self.cdoc = _tidy.CreateWithAllocator(self.owned_allocator)
+            if track_memory:
+                self.allocator = self.owned_allocator
+        else:
+            self.cdoc = _tidy.Create()
+        self.errsink = sinkfactory.create()
+        self.errsink.attach(self.cdoc)
+
+    def release(self) -> None:
+        cdoc, self.cdoc = self.cdoc, None
+        if cdoc is None:
+            return
+        _tidy.Release(cdoc)
+        if self.owned_allocator is not None:
+            self.backend.free_allocator(self.owned_allocator)
+            self.allocator = self.owned_allocator = None
+        sinkfactory.discard(self.errsink.handle)
+
+
+#: Collector of measurements in the current context, see tidy.metrics
+_stats: contextvars.ContextVar[Stats | None] = contextvars.ContextVar(
+    "tidy_stats", default=None
+)
+
+#: Options handled by the Python side of a document, see parseString
+DOCUMENT_OPTIONS = (
+    "diagnostics",
+    "max_errors",
+    "max_input_size",
+    "max_memory",
+    "track_memory",
+)
+
+
+def _pop_document_options(options: OPTION_DICT_TYPE) -> OPTION_DICT_TYPE:
+    return {name: options.pop(name) for name in DOCUMENT_OPTIONS if name in options}
+
+
+def _is_utf8(encoding: OPTION_TYPE) -> bool:
+    """Return whether TidyLib encoding name is UTF-8."""
+    return isinstance(encoding, str) and encoding.lower() == "utf8"
+
+
+def _tracks_memory(options: OPTION_DICT_TYPE) -> bool:
+    """Return whether the options need a handle with counting allocator."""
+    return bool(options.get("track_memory")) or options.get("max_memory") is not None
+
 
 class Document:
-    """Document object as returned by :func:`parseString` or :func:`parse`."""
+    """
+    Document object as returned by :func:`parseString` or :func:`parse`.
+
+    The TidyLib resources are released once the document is garbage
+    collected, use :meth:`close` or the document as a context manager to
+    release them deterministically.
+
+    Distinct documents can be created and processed from several threads
+    at once, TidyLib runs without holding the GIL. A single document must
+    not be used from more threads concurrently.
+    """
 
-    def __init__(self, options: OPTION_DICT_TYPE) -> None:
-        self.cdoc = _tidy.Create()
+    cdoc: Any = None
+    #: Structured diagnostics, when enabled, see :func:`parseString`
+    diagnostics: Diagnostics | None = None
+    #: Maximal size of input in bytes, see :func:`parseString`
+    max_input_size: int | None = None
+    #: Maximal memory used by TidyLib in bytes, see :func:`parseString`
+    max_memory: int | None = None
+    _allocator: int | None = None
+    # Memory counters of a closed document
+    _memory: tuple[int, int] | None = None
+    #: Measurements of the document, when collected, see :mod:`tidy.metrics`
+    metrics: DocumentMetrics | None = None
+    _messages: _Messages | None = None
+    # Report of a closed document, parsed on first access
+    _unparsed = b""
+
+    def __init__(
+        self,
+        options: OPTION_DICT_TYPE,
+        config: TidyConfig | None = None,
+        handle: _Handle | None = None,
+        release: Callable[[], None] | None = None,
+    ) -> None:
+        if handle is None:
+            handle = _Handle(
+                track_memory=_tracks_memory(options)
+                or (config is not None and _tracks_memory(config.options))
+            )
+        self.cdoc = handle.cdoc
+        self.errsink = handle.errsink
+        self._allocator = handle.allocator
         self.options = options
-        self.errsink = sinkfactory.create()
-        _tidy.SetErrorSink(self.cdoc, ctypes.byref(self.errsink.struct))
-        self._set_options()
+        self._errors: list[ReportItem] = []
+        self._errors_parsed = 0
+        self._output: bytes | None = None
+        self._text: str | None = None
+        self._release = release or handle.release
+        # Not TidyLib options, see parseString
+        extra = _pop_document_options(options)
+        stats = _stats.get()
+        if stats is not None:
+            self.metrics = stats.document()
+            start = time.perf_counter()
+        try:
+            if config is not None:
+                _tidy.OptCopyConfig(self.cdoc, config.template.cdoc)
+                self.options = {**config.options, **options}
+                extra = _pop_document_options(self.options) | extra
+            self._set_options(options)
+            # Enabled after the options, their errors are read from the report
+            self._set_limits(**extra)
+        except BaseException:
+            self.close()
+            raise
+        if self.metrics is not None:
+            self.metrics.add("options", time.perf_counter() - start)
+
+    @classmethod
+    def detached(
+        cls,
+        output: bytes,
+        errors: list[ReportItem],
+        options: OPTION_DICT_TYPE,
+    ) -> Self:
+        """
+        Create a closed document holding already tidied output.
+
+        Used to hand out results which were tidied elsewhere, such as
+        in another process or earlier, without any TidyLib resources.
+
+        :param output: the tidied document
+        :param errors: errors reported while tidying
+        :param options: options the document was tidied with
+        """
+        doc = cls.__new__(cls)
+        doc.options = options
+        doc._set_result(output, errors)  # noqa: SLF001
+        return doc
+
+    def _set_result(self, output: bytes, errors: list[ReportItem]) -> None:
+        self._output = output
+        self._text = None
+        self._errors = errors
+        self._errors_parsed = 0
+        self._unparsed = b""
+
+    def _set_messages(self, messages: _Messages) -> None:
+        self._messages = messages
+        self.diagnostics = messages.diagnostics
+
+    def _set_limits(
+        self,
+        *,
+        diagnostics: OPTION_TYPE = False,
+        max_errors: OPTION_TYPE = None,
+        max_input_size: OPTION_TYPE = None,
+        max_memory: OPTION_TYPE = None,
+        track_memory: OPTION_TYPE = False,
+    ) -> None:
+        if max_input_size is not None:
+            self.max_input_size = int(max_input_size)
+        if max_memory is not None or track_memory:
+            # Such documents get a handle of their own, see DocumentPool.create
+            assert self._allocator is not None
+            if max_memory is not None:
+                self.max_memory = int(max_memory)
+        if not diagnostics and max_errors is None:
+            return
+        _tidy.require("Diagnostics and max_errors", *MESSAGE_FUNCTIONS)
+        messages = _messages[self.cdoc] = _Messages(
+            Diagnostics() if diagnostics else None,
+            sys.maxsize if max_errors is None else int(max_errors),
+        )
+        self._set_messages(messages)
+        _tidy.SetMessageCallback(self.cdoc, _message_callback)
+
+    @property
+    def dropped_errors(self) -> int:
+        """Number of messages not recorded because of the ``max_errors`` limit."""
+        return 0 if self._messages is None else self._messages.dropped
+
+    @property
+    def memory_used(self) -> int | None:
+        """
+        Bytes allocated by TidyLib for the document, when tracked.
+
+        See the ``track_memory`` option of :func:`parseString`.
+        """
+        if self._allocator is None:
+            return None if self._memory is None else self._memory[0]
+        return _CountingAllocator.from_address(self._allocator).current
+
+    @property
+    def memory_peak(self) -> int | None:
+        """
+        Most bytes allocated by TidyLib for the document at once, when tracked.
+
+        See the ``track_memory`` option of :func:`parseString`.
+        """
+        if self._allocator is None:
+            return None if self._memory is None else self._memory[1]
+        return _CountingAllocator.from_address(self._allocator).peak
+
+    def _check_memory(self) -> None:
+        if self.max_memory is None or self._allocator is None:
+            return
+        peak = _CountingAllocator.from_address(self._allocator).peak
+        if peak > self.max_memory:
+            msg = (
+                f"TidyLib used {peak} bytes, exceeding limit of {self.max_memory} bytes"
+            )
+            raise MemoryLimitError(msg)
 
-    def _set_options(self) -> None:
-        for key, value in self.options.items():
+    @property
+    def _plain(self) -> bool:
+        """Whether the input can be loaded without measuring or checking it."""
+        return (
+            self.max_input_size is None
+            and self.metrics is None
+            and self.max_memory is None
+        )
+
+    def _check_input_size(self, size: int) -> None:
+        if self.max_input_size is not None and size > self.max_input_size:
+            msg = f"Input of {size} bytes exceeds limit of {self.max_input_size} bytes"
+            raise LimitExceededError(msg)
+
+    def _set_options(self, options: OPTION_DICT_TYPE) -> None:
+        for key, value in options.items():
+            start = len(self._parse_errors())
             # this will flush out most argument type errors...
             if value is None:
                 value = ""  # noqa: PLW2901
@@ -252,54 +1420,263 @@ class Document:
                 key.replace("_", "-").encode("utf-8"),
                 str(value).encode("utf-8"),
             )
-            if self.errors:
-                for error_prefix, error_exception in ERROR_MAP.items():
-                    if self.errors[-1].message.startswith(error_prefix):
-                        raise error_exception(self.errors[-1].message)
+            self._check_option_errors(start)
+
+    def _check_option_errors(self, start: int) -> None:
+        """Raise exception for option errors reported after start."""
+        for error in self._parse_errors()[start:]:
+            for error_prefix, error_exception in ERROR_MAP.items():
+                if error.message.startswith(error_prefix):
+                    raise error_exception(error.message)
+
+    def _load_config(self, filename: str) -> None:
+        start = len(self._parse_errors())
+        if _tidy.LoadConfig(self.cdoc, filename.encode("utf-8")) < 0:
+            raise TidyLibError(self._parse_errors()[-1].message)
+        self._check_option_errors(start)
+
+    def _diagnose(self, status: int) -> ValidationResult:
+        """Run TidyLib diagnostics and collect the report."""
+        report = self.diagnostics if self.diagnostics is not None else self.get_errors()
+        count = len(report)
+        # There is no document to diagnose when loading it failed
+        if status >= 0:
+            _tidy.RunDiagnostics(self.cdoc)
+        # Diagnostics only add dialogue, such as the detected markup
+        # version and summary of the counts, it is not part of the report
+        if isinstance(report, Diagnostics):
+            for values in (report.codes, report.levels, report.lines, report.columns):
+                del values[count:]
+        return ValidationResult(
+            _tidy.ErrorCount(self.cdoc),
+            _tidy.WarningCount(self.cdoc),
+            _tidy.AccessWarningCount(self.cdoc),
+            _tidy.ConfigErrorCount(self.cdoc),
+            report,
+        )
+
+    def _get_encoding(self, name: str) -> str:
+        option_id = _tidy.OptGetIdForName(name.replace("_", "-").encode("utf-8"))
+        encoding = _tidy.OptGetEncName(self.cdoc, option_id)
+        assert isinstance(encoding, bytes)
+        return encoding.decode("utf-8")
+
+    def _get_bool(self, name: str) -> bool:
+        option_id = _tidy.OptGetIdForName(name.replace("_", "-").encode("utf-8"))
+        return bool(_tidy.OptGetBool(self.cdoc, option_id))
+
+    def close(self) -> None:
+        """
+        Release TidyLib resources held by the document.
+
+        The error report stays available, the output only if it was
+        retrieved before closing.
+        """
+        if self.cdoc is None:
+            return
+        self._unparsed = self.errsink.getvalue(self._errors_parsed)
+        if self._messages is not None:
+            _messages.pop(self.cdoc, None)
+            _tidy.SetMessageCallback(self.cdoc, _MessageCallback())
+        if self._allocator is not None:
+            self._memory = (self.memory_used or 0, self.memory_peak or 0)
+            self._allocator = None
+        self.cdoc = None
+        self._release()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
 
     def __del__(self) -> None:
-        del sinkfactory[self.errsink.handle]
+        self.close()
 
-    def write(self, stream: BinaryIO) -> None:
+    def write(self, stream: BinaryIO, chunk_size: int | None = None) -> None:
         """
+        Write document to the stream.
+
         :param stream: Writable file like object.
+        :param chunk_size: Pass output to the stream in chunks of this size
+                           as TidyLib produces it, instead of building it in
+                           memory first. This bounds memory usage. The
+                           native backend calls back into Python once per
+                           chunk, the ctypes one for every output byte.
+        """
+        if chunk_size is None:
+            stream.write(self.getvalue())
+        elif self._output is not None or self._text is not None:
+            view = self.getbuffer()
+            stream.writelines(
+                view[start : start + chunk_size]
+                for start in range(0, len(view), chunk_size)
+            )
+        else:
+            if self.cdoc is None:
+                raise ValueError("Document is closed")
+            _tidy.backend.save_stream(self.cdoc, stream.write, chunk_size)
 
-        Writes document to the stream.
+    def save(self, filename: str) -> None:
         """
-        stream.write(self.getvalue())
+        Write document to the file.
 
-    def get_errors(self) -> list[ReportItem]:
-        """Return list of errors as a list of :class:`ReportItem`."""
+        TidyLib writes the file directly, unless the output was retrieved
+        already.
+
+        :param filename: Name of the file to write.
+        """
+        if self.cdoc is None or self._output is not None or self._text is not None:
+            Path(filename).write_bytes(self.getvalue())
+            return
+        result = _tidy.SaveFile(self.cdoc, filename.encode("utf-8"))
+        if result < 0:
+            raise OSError(-result, os.strerror(-result), filename)
+
+    @staticmethod
+    def _parse_report(data: bytes) -> list[ReportItem]:
         ret = []
-        for line in self.errsink.getvalue().decode("utf-8").splitlines():
+        for line in data.decode("utf-8").splitlines():
             line = line.strip()  # noqa: PLW2901
             if line:
                 ret.append(ReportItem(line))
         return ret
 
+    def _parse_errors(self) -> list[ReportItem]:
+        """
+        Parse report lines appended since the last call.
+
+        Only complete lines are consumed, the cached list is returned
+        without copying.
+        """
+        if self.cdoc is None:
+            if self._unparsed:
+                self._errors.extend(self._parse_report(self._unparsed))
+                self._unparsed = b""
+            return self._errors
+        data = self.errsink.getvalue(self._errors_parsed)
+        end = data.rfind(b"\n") + 1
+        if end:
+            start = time.perf_counter()
+            self._errors.extend(self._parse_report(data[:end]))
+            self._errors_parsed += end
+            if self.metrics is not None:
+                self.metrics.add("errors", time.perf_counter() - start)
+        return self._errors
+
+    def get_errors(self) -> list[ReportItem]:
+        """Return list of errors as a list of :class:`ReportItem`."""
+        ret = list(self._parse_errors())
+        if self.cdoc is None:
+            return ret
+        # Unterminated last line is parsed, but not cached
+        pending = self.errsink.getvalue(self._errors_parsed)
+        if pending:
+            ret.extend(self._parse_report(pending))
+        return ret
+
     @property
     def errors(self) -> list[ReportItem]:
         return self.get_errors()
 
     def getvalue(self) -> bytes:
-        """Raw string as returned by tidy."""
-        stlen = ctypes.c_int(8192)
-        string_buffer = ctypes.create_string_buffer(stlen.value)
-        result = _tidy.SaveString(self.cdoc, string_buffer, ctypes.byref(stlen))
-        if result == -ENOMEM:  # buffer too small
-            string_buffer = ctypes.create_string_buffer(stlen.value)
-            _tidy.SaveString(self.cdoc, string_buffer, ctypes.byref(stlen))
-        return string_buffer.value
+        """
+        Raw string as returned by tidy.
 
-    def gettext(self) -> str:
-        """Unicode text for output returned by tidy."""
+        The document is serialized on first access only.
+        """
+        if self._output is None:
+            if self._text is not None:
+                # Serialized already by gettext
+                self._output = self._text.encode(self._output_encoding)
+                return self._output
+            if self.cdoc is None:
+                raise ValueError("Document is closed")
+            if self.metrics is None:
+                self._output = _tidy.backend.save_buffer(self.cdoc)
+                self._check_memory()
+            else:
+                start = time.perf_counter()
+                self._output = _tidy.backend.save_buffer(self.cdoc)
+                self.metrics.add("save", time.perf_counter() - start)
+                self.metrics.add_sizes(output_size=len(self._output))
+                self._check_memory()
+        return self._output
+
+    def getbuffer(self) -> memoryview:
+        """Read-only view of :meth:`getvalue` without copying it."""
+        return memoryview(self.getvalue())
+
+    @property
+    def _output_encoding(self) -> str:
         output_encoding = self.options["output_encoding"]
         assert isinstance(output_encoding, str)
-        return self.getvalue().decode(output_encoding)
+        return output_encoding
+
+    def gettext(self) -> str:
+        """
+        Unicode text for output returned by tidy.
+
+        The text is decoded on first access only. UTF-8 output not
+        retrieved by :meth:`getvalue` yet is decoded directly from the
+        TidyLib buffer, without creating the bytes first.
+        """
+        if self._text is None:
+            if (
+                self._output is None
+                and self.cdoc is not None
+                and self.metrics is None
+                and _is_utf8(self.options["output_encoding"])
+            ):
+                self._text = _tidy.backend.save_text(self.cdoc)
+                self._check_memory()
+            else:
+                self._text = self.getvalue().decode(self._output_encoding)
+        return self._text
 
     def __str__(self) -> str:
         return self.gettext()
 
+    def _node(self, getter: Callable[[Any], int | None]) -> Node | None:
+        if self.cdoc is None:
+            raise ValueError("Document is closed")
+        # Imported here as the tree is rarely needed
+        from tidy.tree import Node  # noqa: PLC0415
+
+        pointer = getter(self.cdoc)
+        return None if pointer is None else Node(self, pointer)
+
+    @property
+    def root(self) -> Node | None:
+        """Root node of the document tree, see :mod:`tidy.tree`."""
+        return self._node(_tidy.GetRoot)
+
+    @property
+    def html(self) -> Node | None:
+        """The ``html`` element, see :mod:`tidy.tree`."""
+        return self._node(_tidy.GetHtml)
+
+    @property
+    def head(self) -> Node | None:
+        """The ``head`` element, see :mod:`tidy.tree`."""
+        return self._node(_tidy.GetHead)
+
+    @property
+    def body(self) -> Node | None:
+        """The ``body`` element, see :mod:`tidy.tree`."""
+        return self._node(_tidy.GetBody)
+
+    def iter_elements(self, tag: str | None = None) -> Iterator[Node]:
+        """
+        Iterate over elements of the document in document order.
+
+        :param tag: yield only elements with this name
+        """
+        root = self.root
+        if root is None:
+            return iter(())
+        return root.iter_elements(tag)
+
 
 ERROR_MAP = {
     "missing or malformed argument for option: ": OptionArgError,
@@ -307,35 +1684,121 @@ ERROR_MAP = {
 }
 
 
-class DocumentFactory(FactoryDict[weakref.ReferenceType, Document]):
+class DocumentFactory(FactoryDict[weakref.ReferenceType, Any]):
+    def loadFile(
+        self, doc: Document, filename: FILE_TYPE, *, clean: bool = True
+    ) -> int:
+        if isinstance(filename, (str, os.PathLike)):
+            name = os.fspath(filename).encode("utf-8")
+            if doc._plain:  # noqa: SLF001
+                return _tidy.backend.parse_file(doc.cdoc, name, clean)
+            size = 0
+            with contextlib.suppress(OSError):
+                size = Path(filename).stat().st_size
+            doc._check_input_size(size)  # noqa: SLF001
+            return self._parse_measured(
+                doc, _tidy.backend.parse_file, name, size, clean
+            )
+        try:
+            mapped = mmap.mmap(filename.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            # Not a regular file or empty file which can not be mapped, at
+            # most one byte over the limit is read
+            size = -1 if doc.max_input_size is None else doc.max_input_size + 1
+            return self.loadBuffer(doc, filename.read(size), clean=clean)
+        # Slice released explicitly, frames of a raised exception keep it
+        # alive and the mapping could not be closed otherwise
+        with mapped, memoryview(mapped) as view, view[filename.tell() :] as data:
+            return self.loadBuffer(doc, data, clean=clean)
+
+    def loadBuffer(self, doc: Document, data: Buffer, *, clean: bool = True) -> int:
+        if doc._plain:  # noqa: SLF001
+            return _tidy.backend.parse_buffer(doc.cdoc, data, clean)
+        with memoryview(data) as view:
+            size = view.nbytes
+        doc._check_input_size(size)  # noqa: SLF001
+        return self._parse_measured(doc, _tidy.backend.parse_buffer, data, size, clean)
+
     @staticmethod
-    def load(
+    def _parse_measured(
         doc: Document,
-        arg: bytes,
-        loader: Callable[[Document, bytes], int],
-    ) -> None:
-        status = loader(doc.cdoc, arg)
-        if status >= 0:
+        parse: Callable[[Any, Any, bool], int],
+        source: Buffer | str,
+        size: int,
+        clean: bool,  # noqa: FBT001
+    ) -> int:
+        """Parse document recording metrics and checking memory use."""
+        metrics = doc.metrics
+        if metrics is None and doc.max_memory is None:
+            return parse(doc.cdoc, source, clean)
+        if metrics is not None:
+            metrics.add_sizes(input_size=size)
+        start = time.perf_counter()
+        status = parse(doc.cdoc, source, False)  # noqa: FBT003
+        if metrics is not None:
+            metrics.add("parse", time.perf_counter() - start)
+        doc._check_memory()  # noqa: SLF001
+        if status >= 0 and clean:
+            start = time.perf_counter()
             _tidy.CleanAndRepair(doc.cdoc)
+            if metrics is not None:
+                metrics.add("clean", time.perf_counter() - start)
+            doc._check_memory()  # noqa: SLF001
+        if metrics is None:
+            return status
+        metrics.set_messages(
+            _tidy.ErrorCount(doc.cdoc)
+            + _tidy.WarningCount(doc.cdoc)
+            + _tidy.AccessWarningCount(doc.cdoc)
+            + _tidy.ConfigErrorCount(doc.cdoc)
+        )
+        return status
 
-    def loadFile(self, doc: Document, filename: str) -> None:
-        self.load(doc, filename.encode("utf-8"), _tidy.ParseFile)
-
-    def loadString(self, doc: Document, text: bytes) -> None:
-        self.load(doc, text, _tidy.ParseString)
+    def loadString(
+        self, doc: Document, text: Buffer | str, *, clean: bool = True
+    ) -> int:
+        if isinstance(text, str):
+            input_encoding = doc.options["input_encoding"]
+            assert isinstance(input_encoding, str)
+            if _is_utf8(input_encoding):
+                # Passed without encoding it in Python first, the size of
+                # non-ASCII text is known only once encoded
+                if doc._plain:  # noqa: SLF001
+                    return _tidy.backend.parse_text(doc.cdoc, text, clean)
+                if text.isascii():
+                    doc._check_input_size(len(text))  # noqa: SLF001
+                    return self._parse_measured(
+                        doc, _tidy.backend.parse_text, text, len(text), clean
+                    )
+            text = text.encode(input_encoding)
+        return self.loadBuffer(doc, text, clean=clean)
 
-    def create(self, **kwargs: OPTION_TYPE) -> Document:
+    @staticmethod
+    def _set_encodings(kwargs: OPTION_DICT_TYPE) -> None:
         enc = kwargs.get("char_encoding", "utf8")
         if "output_encoding" not in kwargs:
             kwargs["output_encoding"] = enc
         if "input_encoding" not in kwargs:
             kwargs["input_encoding"] = enc
-        doc = Document(kwargs)
+
+    def create(
+        self,
+        *,
+        config: TidyConfig | None = None,
+        **kwargs: OPTION_TYPE,
+    ) -> Document:
+        if config is None or "char_encoding" in kwargs:
+            self._set_encodings(kwargs)
+        handle = _Handle(
+            track_memory=_tracks_memory(kwargs)
+            or (config is not None and _tracks_memory(config.options))
+        )
+        doc = Document(kwargs, config, handle)
         ref = weakref.ref(doc, self.releaseDoc)
-        FactoryDict._setitem(self, ref, doc.cdoc)  # noqa: SLF001
+        FactoryDict._setitem(self, ref, handle)  # noqa: SLF001
         return doc
 
-    def parse(self, filename: str, **kwargs: OPTION_TYPE) -> Document:
+    def parse(self, filename: FILE_TYPE, **kwargs: OPTION_TYPE) -> Document:
         """
         Open and process filename as an HTML file.
 
@@ -343,44 +1806,298 @@ class DocumentFactory(FactoryDict[weakref.ReferenceType, Document]):
 
         :param kwargs: named options to pass to TidyLib for processing the
                        input file.
-        :param filename: the name of a file to process
+        :param filename: the name of a file to process or a binary file
+                         object, regular files are memory mapped
         :return: a :class:`Document` object
 
         """
-        doc = self.create(**kwargs)
+        timeout = kwargs.pop("timeout", None)
+        if timeout is not None:
+            if isinstance(filename, (str, os.PathLike)):
+                return self._run_worker("file", os.fspath(filename), kwargs, timeout)
+            size = kwargs.get("max_input_size")
+            data = filename.read(-1 if size is None else int(size) + 1)
+            return self._run_worker("string", data, kwargs, timeout)
+        doc = self.create(config=None, **kwargs)
         self.loadFile(doc, filename)
         return doc
 
-    def parseString(self, text: bytes | str, **kwargs: OPTION_TYPE) -> Document:
+    def parseString(self, text: Buffer | str, **kwargs: OPTION_TYPE) -> Document:
         """
         Use text as an HTML file.
 
         Returning a processed document object.
 
+        Besides TidyLib options, the following keywords are accepted:
+
+        ``diagnostics=True``
+            Collect the messages as :attr:`Document.diagnostics` from the
+            TidyLib message callback, instead of parsing the text report into
+            :attr:`Document.errors`, which stays empty.
+        ``max_errors``
+            Record at most this many messages, the rest is counted in
+            :attr:`Document.dropped_errors`.
+        ``max_input_size``
+            Raise :exc:`LimitExceededError` for input larger than this
+            number of bytes.
+        ``track_memory=True``
+            Create the document with an allocator counting memory used by
+            TidyLib, see :attr:`Document.memory_used` and
+            :attr:`Document.memory_peak`. The counting is cheap with the
+            native backend, the ctypes one calls back into Python for every
+            allocation.
+        ``max_memory``
+            Track memory and raise :exc:`MemoryLimitError` once TidyLib
+            used more than this number of bytes. TidyLib can not recover
+            from failed allocations, so the limit is checked after parsing,
+            cleaning and serializing the document.
+        ``timeout``
+            Raise :exc:`LimitExceededError` when tidying takes longer than
+            this number of seconds. The document is tidied in a worker
+            process, which is killed on timeout, and returned as a
+            :meth:`Document.detached` one. Only supported by :func:`parse`
+            and :func:`parseString`.
+
         :param kwargs: named options to pass to TidyLib for processing the
                        input file.
-        :param text: the string to parse
+        :param text: the string to parse, bytes-like objects such as
+                     bytearray, memoryview or mmap are passed to TidyLib
+                     without copying
         :return: a :class:`Document` object
 
         """
-        doc = self.create(**kwargs)
-        if isinstance(text, str):
-            input_encoding = doc.options["input_encoding"]
-            assert isinstance(input_encoding, str)
-            text = text.encode(input_encoding)
+        timeout = kwargs.pop("timeout", None)
+        if timeout is not None:
+            if not isinstance(text, (str, bytes)):
+                text = memoryview(text).tobytes()
+            return self._run_worker("string", text, kwargs, timeout)
+        doc = self.create(config=None, **kwargs)
         self.loadString(doc, text)
         return doc
 
+    def _run_worker(
+        self,
+        kind: str,
+        source: str | bytes,
+        kwargs: OPTION_DICT_TYPE,
+        timeout: OPTION_TYPE,
+    ) -> Document:
+        from tidy import worker  # noqa: PLC0415
+
+        assert timeout is not None
+        self._set_encodings(kwargs)
+        return worker.run(kind, source, kwargs, float(timeout))
+
+    def validate(self, text: Buffer | str, **kwargs: OPTION_TYPE) -> ValidationResult:
+        """
+        Check text as an HTML file without producing output.
+
+        The document is only parsed and diagnosed, it is neither cleaned
+        nor serialized, which is considerably faster when just the report
+        is needed. Messages TidyLib emits while cleaning, such as about
+        elements removed from HTML5, are not reported.
+
+        :param kwargs: named options to pass to TidyLib, see :func:`parseString`
+        :param text: the string to check, see :func:`parseString`
+        :return: a :class:`ValidationResult`
+        """
+        with self.create(config=None, **kwargs) as doc:
+            status = self.loadString(doc, text, clean=False)
+            return doc._diagnose(status)  # noqa: SLF001
+
+    def validate_file(
+        self, filename: FILE_TYPE, **kwargs: OPTION_TYPE
+    ) -> ValidationResult:
+        """
+        Check filename as an HTML file without producing output.
+
+        :param kwargs: named options to pass to TidyLib, see :func:`parse`
+        :param filename: the file to check, see :func:`parse`
+        :return: a :class:`ValidationResult`
+        """
+        with self.create(config=None, **kwargs) as doc:
+            status = self.loadFile(doc, filename, clean=False)
+            return doc._diagnose(status)  # noqa: SLF001
+
     def releaseDoc(self, ref: weakref.ReferenceType) -> None:
-        _tidy.Release(self[ref])
+        # Drop the dead reference, it would otherwise slow down lookups of
+        # new documents allocated at the same address
+        handle = self.discard(ref)
+        if handle is not None:
+            handle.release()
 
 
 docfactory = DocumentFactory()
 parse = docfactory.parse
 parseString = docfactory.parseString
+validate = docfactory.validate
+validate_file = docfactory.validate_file
+
+
+class TidyConfig:
+    """
+    Reusable set of Tidy options.
+
+    The options are validated and encoded once, by configuring a template
+    document, and copied to every new document with a single
+    ``tidyOptCopyConfig`` call instead of being parsed one by one.
+
+    >>> config = TidyConfig(output_xhtml=1, tidy_mark=0)
+    >>> str(config.parseString("<p>Hello")).startswith("<!DOCTYPE html")
+    True
+
+    :param kwargs: named options to pass to TidyLib, see :func:`parse`.
+    """
+
+    filename: str | None = None  #: Configuration file the options were loaded from
+
+    def __init__(self, **kwargs: OPTION_TYPE) -> None:
+        self._configure(kwargs)
+
+    @classmethod
+    def from_file(cls, filename: str, **kwargs: OPTION_TYPE) -> TidyConfig:
+        """
+        Load options from a Tidy configuration file.
+
+        :param filename: the name of the configuration file
+        :param kwargs: named options overriding those loaded from the file
+        """
+        config = cls.__new__(cls)
+        config.filename = filename
+        config._configure(kwargs)  # noqa: SLF001
+        return config
+
+    def _configure(self, kwargs: OPTION_DICT_TYPE) -> None:
+        if self.filename is None or "char_encoding" in kwargs:
+            docfactory._set_encodings(kwargs)  # noqa: SLF001
+        self.template = docfactory.create()
+        if self.filename is not None:
+            self.template._load_config(self.filename)  # noqa: SLF001
+        # Applied by the configured documents, see parseString
+        extra = _pop_document_options(kwargs)
+        self.template._set_options(kwargs)  # noqa: SLF001
+        # Remember encodings for decoding output of configured documents
+        self.options: OPTION_DICT_TYPE = {
+            name: self.template._get_encoding(name)  # noqa: SLF001
+            for name in ("input_encoding", "output_encoding")
+        }
+        self.options.update(kwargs)
+        self.options.update(extra)
+
+    def parse(self, filename: FILE_TYPE, **kwargs: OPTION_TYPE) -> Document:
+        """Process file using this configuration, see :func:`parse`."""
+        doc = docfactory.create(config=self, **kwargs)
+        docfactory.loadFile(doc, filename)
+        return doc
+
+    def parseString(self, text: Buffer | str, **kwargs: OPTION_TYPE) -> Document:
+        """Process text using this configuration, see :func:`parseString`."""
+        doc = docfactory.create(config=self, **kwargs)
+        docfactory.loadString(doc, text)
+        return doc
 
 
 def getTidyVersion() -> str:
-    version = _tidy.lib.tidyLibraryVersion()
+    version = _tidy.LibraryVersion()
     assert isinstance(version, bytes)
     return version.decode()
+
+
+class DocumentPool:
+    """
+    Bounded pool of reusable TidyLib documents sharing one configuration.
+
+    Documents returned by the pool hand their TidyLib handle back on
+    :meth:`Document.close`, so they are best used as context managers:
+
+    >>> pool = DocumentPool(tidy_mark=0)
+    >>> with pool.parseString("<p>Hello") as doc:
+    ...     "Hello" in str(doc)
+    True
+
+    Up to ``size`` idle handles are kept for reuse, any extra handles
+    needed under load are released when returned. Handles are also released
+    after :data:`HANDLE_USES` documents, TidyLib frees some memory allocated
+    while parsing only then. Documents tracking memory, see the
+    ``track_memory`` option of :func:`parseString`, always get a new handle.
+
+    :param config: a :class:`TidyConfig` for the pooled documents
+    :param size: maximal number of idle handles kept in the pool
+    :param kwargs: named options to build the configuration from when
+                   no config is given.
+    """
+
+    def __init__(
+        self,
+        config: TidyConfig | None = None,
+        size: int = 8,
+        **kwargs: OPTION_TYPE,
+    ) -> None:
+        self._idle: list[_Handle] = []
+        # Reentrant, garbage collected documents return their handle
+        self._lock = threading.RLock()
+        self.size = size
+        self.config = config if config is not None else TidyConfig(**kwargs)
+
+    def _acquire(self) -> _Handle:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return _Handle()
+
+    def _put(self, handle: _Handle) -> None:
+        handle.errsink.clear()
+        handle.uses += 1
+        # Memory TidyLib leaks while parsing is freed only on release. Error
+        # counts are not reset by parsing and TidyLib writes no output once
+        # a document reported an error, such handles are useless.
+        reusable = handle.uses < HANDLE_USES and _tidy.ErrorCount(handle.cdoc) == 0
+        with self._lock:
+            if reusable and len(self._idle) < self.size:
+                self._idle.append(handle)
+                return
+        handle.release()
+
+    def create(self, **kwargs: OPTION_TYPE) -> Document:
+        """Return an empty document configured by the pool."""
+        if "char_encoding" in kwargs:
+            DocumentFactory._set_encodings(kwargs)  # noqa: SLF001
+        if _tracks_memory(kwargs) or _tracks_memory(self.config.options):
+            # Memory still held by the tree of a previous document would be
+            # counted on a reused handle
+            return Document(kwargs, self.config, _Handle(track_memory=True))
+        handle = self._acquire()
+        return Document(
+            kwargs, self.config, handle, functools.partial(self._put, handle)
+        )
+
+    def parse(self, filename: FILE_TYPE, **kwargs: OPTION_TYPE) -> Document:
+        """Process file using a pooled document, see :func:`parse`."""
+        doc = self.create(**kwargs)
+        docfactory.loadFile(doc, filename)
+        return doc
+
+    def parseString(self, text: Buffer | str, **kwargs: OPTION_TYPE) -> Document:
+        """Process text using a pooled document, see :func:`parseString`."""
+        doc = self.create(**kwargs)
+        docfactory.loadString(doc, text)
+        return doc
+
+    def close(self) -> None:
+        """Release all idle handles."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for handle in idle:
+            handle.release()
+
+    def __len__(self) -> int:
+        return len(self._idle)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        self.close()
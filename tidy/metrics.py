@@ -0,0 +1,203 @@
+"""
+Instrumentation of tidying.
+
+Documents created while a :class:`Stats` collector is active in the current
+context record durations of processing phases and sizes, both per document
+as :attr:`tidy.Document.metrics` and aggregated in the collector:
+
+>>> import tidy
+>>> with collect() as stats:
+...     doc = tidy.parseString("<p>Hello", tidy_mark=0)
+...     output = doc.getvalue()
+>>> stats.documents, stats.input_bytes, stats.output_bytes == len(output)
+(1, 8, True)
+>>> sorted(doc.metrics.durations)
+['clean', 'options', 'parse', 'save']
+
+The phases are:
+
+``options``
+    Applying options to the TidyLib document.
+``parse``
+    Parsing input.
+``clean``
+    Cleaning and repairing the parsed document.
+``save``
+    Serializing the output.
+``errors``
+    Parsing the text report into :class:`tidy.ReportItem` objects.
+
+Collecting is disabled by default and costs a context variable lookup per
+phase then. The collector is scoped by :mod:`contextvars`, so it applies to
+the current thread or asyncio task and those started from it with a copy of
+the context. Documents keep reporting to the collector active when they
+were created.
+
+Numbers of live documents and TidyLib handles are always available from
+:func:`live_objects`, long running processes can watch them for leaks.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import threading
+from typing import TYPE_CHECKING, NamedTuple
+
+from tidy.lib import _messages, _stats, docfactory, sinkfactory
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+__all__ = ("DocumentMetrics", "LiveObjects", "Stats", "collect", "live_objects")
+
+PHASES = ("options", "parse", "clean", "save", "errors")
+
+
+class DocumentMetrics:
+    """Measurements of a single document, see :attr:`tidy.Document.metrics`."""
+
+    __slots__ = ("durations", "input_size", "messages", "output_size", "stats")
+
+    def __init__(self, stats: Stats) -> None:
+        self.stats = stats
+        #: Seconds spent in phases by their name
+        self.durations: dict[str, float] = {}
+        self.input_size = 0  #: Bytes of input passed to TidyLib
+        self.output_size = 0  #: Bytes of serialized output
+        self.messages = 0  #: Errors and warnings counted by TidyLib
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.durations[phase] = self.durations.get(phase, 0.0) + seconds
+        self.stats._add(phase, seconds)  # noqa: SLF001
+
+    def add_sizes(self, input_size: int = 0, output_size: int = 0) -> None:
+        self.input_size += input_size
+        self.output_size += output_size
+        self.stats._add_sizes(input_size, output_size)  # noqa: SLF001
+
+    def set_messages(self, messages: int) -> None:
+        self.stats._add_messages(messages - self.messages)  # noqa: SLF001
+        self.messages = messages
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__} durations={self.durations}"
+            f" input_size={self.input_size} output_size={self.output_size}"
+            f" messages={self.messages}>"
+        )
+
+
+class Stats:
+    """
+    Aggregated measurements of documents, see :func:`collect`.
+
+    The counters are updated from any thread processing the documents.
+
+    :param keep_documents: keep metrics of every document in
+                           :attr:`document_metrics`
+    """
+
+    def __init__(self, *, keep_documents: bool = False) -> None:
+        self.documents = 0  #: Number of created documents
+        #: Total seconds spent in phases by their name
+        self.durations: dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        #: Number of times the phases were run
+        self.calls: dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.input_bytes = 0  #: Bytes of input passed to TidyLib
+        self.output_bytes = 0  #: Bytes of serialized output
+        self.messages = 0  #: Errors and warnings counted by TidyLib
+        #: Metrics of the documents when kept
+        self.document_metrics: list[DocumentMetrics] | None = (
+            [] if keep_documents else None
+        )
+        self._lock = threading.Lock()
+
+    def document(self) -> DocumentMetrics:
+        """Start measuring a new document."""
+        metrics = DocumentMetrics(self)
+        with self._lock:
+            self.documents += 1
+            if self.document_metrics is not None:
+                self.document_metrics.append(metrics)
+        return metrics
+
+    def _add(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.durations[phase] = self.durations.get(phase, 0.0) + seconds
+            self.calls[phase] = self.calls.get(phase, 0) + 1
+
+    def _add_sizes(self, input_size: int, output_size: int) -> None:
+        with self._lock:
+            self.input_bytes += input_size
+            self.output_bytes += output_size
+
+    def _add_messages(self, messages: int) -> None:
+        with self._lock:
+            self.messages += messages
+
+    def as_dict(self, prefix: str = "tidy.") -> dict[str, float]:
+        """
+        Return the counters as flat mapping for exporting to metrics systems.
+
+        >>> Stats().as_dict()["tidy.parse.seconds"]
+        0.0
+        """
+        with self._lock:
+            result: dict[str, float] = {
+                f"{prefix}documents": self.documents,
+                f"{prefix}input.bytes": self.input_bytes,
+                f"{prefix}output.bytes": self.output_bytes,
+                f"{prefix}messages": self.messages,
+            }
+            for phase, seconds in self.durations.items():
+                result[f"{prefix}{phase}.seconds"] = seconds
+                result[f"{prefix}{phase}.calls"] = self.calls[phase]
+        return result
+
+
+@contextlib.contextmanager
+def collect(stats: Stats | None = None) -> Iterator[Stats]:
+    """
+    Collect measurements of documents created in the block.
+
+    :param stats: the collector to use, a new one by default
+    """
+    if stats is None:
+        stats = Stats()
+    token = _stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _stats.reset(token)
+
+
+class LiveObjects(NamedTuple):
+    """Numbers of objects alive in the process, see :func:`live_objects`."""
+
+    #: Documents created by :func:`tidy.parse` and similar functions, open
+    #: or closed, which were not garbage collected yet
+    documents: int
+    #: TidyLib documents with their error sinks, including idle pooled ones
+    #: and those of :class:`tidy.TidyConfig` objects
+    handles: int
+    #: Open documents collecting :attr:`tidy.Document.diagnostics`
+    diagnostics: int
+
+
+def live_objects() -> LiveObjects:
+    """
+    Return numbers of documents and TidyLib handles alive in the process.
+
+    They stay bounded in a process tidying documents in a loop, growing
+    with the number of processed documents points to a leak.
+
+    >>> import tidy
+    >>> before = live_objects()
+    >>> doc = tidy.parseString("<p>Hello")
+    >>> live_objects().documents - before.documents
+    1
+    >>> del doc
+    >>> live_objects() == before
+    True
+    """
+    return LiveObjects(len(docfactory), len(sinkfactory), len(_messages))
@@ -1,12 +1,29 @@
 from __future__ import annotations
 
+import asyncio
+import ctypes
 import io
+import mmap
 import os
 import pathlib
+import tempfile
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+from unittest import mock
 
 import tidy
+import tidy.aio
+import tidy.cache
+import tidy.cli
 import tidy.lib
+import tidy.metrics
+import tidy.tree
+import tidy.worker
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
 
 DATA_STORAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_data")
 
@@ -106,22 +123,851 @@ class TidyTestCase(unittest.TestCase):
         doc = tidy.parseString(f"<html><body>{text}</body></html>")
         self.assertIn(text, str(doc))
 
+    def test_buffers(self) -> None:
+        data = self.input2.encode("utf-8")
+        expected = tidy.parseString(data).getvalue()
+        for buffer in (
+            bytearray(data),
+            memoryview(data),
+            memoryview(b"xx" + data + b"xx")[2:-2],
+            memoryview(bytearray(data)),
+        ):
+            self.assertEqual(tidy.parseString(buffer).getvalue(), expected)
+        # Non-contiguous buffer
+        doc = tidy.parseString(memoryview(b"<<pp>>xx")[::2])
+        self.assertIn("<p>x</p>", str(doc))
+
+    def test_file_objects(self) -> None:
+        path = pathlib.Path(self.test_file)
+        expected = tidy.parse(self.test_file).getvalue()
+        self.assertEqual(tidy.parse(path).getvalue(), expected)
+        with path.open("rb") as handle:
+            self.assertEqual(tidy.parse(handle).getvalue(), expected)
+            handle.seek(0)
+            handle.readline()
+            self.assertEqual(tidy.parse(handle).errors[0].col, 5)
+        with (
+            path.open("rb") as handle,
+            mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped,
+        ):
+            self.assertEqual(tidy.parseString(mapped).getvalue(), expected)
+        stream = io.BytesIO(path.read_bytes())
+        self.assertEqual(tidy.parse(stream).getvalue(), expected)
+        with tempfile.TemporaryFile() as empty:
+            self.assertIn("</html>", str(tidy.parse(empty)))
+
     def test_unicode(self) -> None:
         doc = tidy.parseString("<html><body>zkouška</body></html>")
         self.assertIn("zkouška", doc.gettext())
 
+    def test_unicode_text(self) -> None:
+        text = "<p>zkouška ěščř 日本語"
+        doc = tidy.parseString(text, tidy_mark=0)
+        output = doc.gettext()
+        self.assertIn("zkouška ěščř 日本語", output)
+        # Decoded once, also without serializing again
+        self.assertIs(doc.gettext(), output)
+        expected = tidy.parseString(text.encode(), tidy_mark=0).getvalue()
+        doc.close()
+        self.assertEqual(doc.getvalue(), expected)
+        # Size limits apply to encoded input
+        size = len(text.encode())
+        self.assertIn("日本語", str(tidy.parseString(text, max_input_size=size)))
+        with self.assertRaises(tidy.LimitExceededError):
+            tidy.parseString(text, max_input_size=size - 1)
+        with self.assertRaises(tidy.LimitExceededError):
+            tidy.parseString("<p>ascii", max_input_size=5)
+        doc = tidy.parseString("<p>café", output_encoding="latin1")
+        self.assertIn("café", doc.gettext())
+        self.assertIn(b"caf\xe9", doc.getvalue())
+
     def test_write(self) -> None:
         doc = tidy.parseString(self.input1)
         handle = io.BytesIO()
         doc.write(handle)
         self.assertEqual(doc.getvalue(), handle.getvalue())
 
+    def test_write_chunks(self) -> None:
+        chunks: list[int] = []
+
+        class Stream(io.BytesIO):
+            def write(self, data: bytes) -> int:  # type: ignore[override]
+                chunks.append(len(data))
+                return super().write(data)
+
+            def writelines(self, lines: Iterable[bytes]) -> None:  # type: ignore[override]
+                for line in lines:
+                    self.write(line)
+
+        for doc in self.default_docs():
+            # Streamed from TidyLib and then from cached output
+            for _ in range(2):
+                chunks.clear()
+                stream = Stream()
+                doc.write(stream, chunk_size=100)
+                self.assertEqual(stream.getvalue(), doc.getvalue())
+                size = len(doc.getvalue())
+                self.assertEqual(
+                    chunks, [100] * (size // 100) + [size % 100] * bool(size % 100)
+                )
+
+    def test_write_error(self) -> None:
+        class Stream(io.BytesIO):
+            def write(self, _: bytes) -> int:  # type: ignore[override]
+                raise OSError("broken pipe")
+
+        doc = tidy.parseString(self.input2)
+        with self.assertRaisesRegex(OSError, "broken pipe"):
+            doc.write(Stream(), chunk_size=10)
+
+    def test_save(self) -> None:
+        doc = tidy.parseString(self.input2)
+        with tempfile.TemporaryDirectory() as tempdir:
+            filename = os.path.join(tempdir, "output.html")
+            doc.save(filename)
+            self.assertEqual(pathlib.Path(filename).read_bytes(), doc.getvalue())
+            with self.assertRaises(FileNotFoundError):
+                doc.save(os.path.join(tempdir, "missing", "output.html"))
+
     def test_errors(self) -> None:
         doc = tidy.parseString(self.input1)
         for error in doc.errors:
             self.assertTrue(str(error).startswith("line"))
             self.assertTrue(repr(error).startswith("ReportItem"))
 
+    def test_diagnostics(self) -> None:
+        errors = tidy.parseString(self.input2).errors
+        with tidy.parseString(self.input2, diagnostics=True) as doc:
+            self.assertEqual(doc.errors, [])
+        diagnostics = doc.diagnostics
+        assert diagnostics is not None
+        self.assertEqual(
+            [(item.line, item.column) for item in diagnostics],
+            [(error.line, error.col) for error in errors],
+        )
+        self.assertEqual(diagnostics[0].key, "MISSING_DOCTYPE")
+        self.assertEqual(diagnostics[-1].severity, tidy.Severity.WARNING)
+        self.assertEqual(len(diagnostics[1:3]), 2)
+        warnings = diagnostics.filter(severity=tidy.Severity.WARNING)
+        self.assertEqual(len(warnings), len(errors))
+        self.assertFalse(diagnostics.filter(severity=[tidy.Severity.ERROR]))
+        missing = diagnostics.filter(code=diagnostics[0].code)
+        self.assertEqual(list(missing), [diagnostics[0]])
+        self.assertIsNone(tidy.parseString(self.input2).diagnostics)
+        config = tidy.TidyConfig(diagnostics=True)
+        self.assertEqual(len(config.parseString(self.input2).diagnostics or ()), 3)
+        self.assertIsNone(
+            config.parseString(self.input2, diagnostics=False).diagnostics
+        )
+
+    def test_diagnostics_pool(self) -> None:
+        with tidy.DocumentPool(size=1) as pool:
+            with pool.parseString(self.input2, diagnostics=True) as doc:
+                self.assertTrue(doc.diagnostics)
+            # The reused handle reports text again
+            with pool.parseString(self.input2) as doc:
+                self.assertEqual(len(doc.errors), 3)
+        self.assertEqual(tidy.lib._messages, {})  # noqa: SLF001
+
+    def test_limits(self) -> None:
+        doc = tidy.parseString(self.input2, max_errors=2)
+        self.assertEqual(len(doc.errors), 2)
+        self.assertEqual(doc.dropped_errors, 1)
+        doc = tidy.parseString(self.input2, diagnostics=True, max_errors=1)
+        self.assertEqual(len(doc.diagnostics or ()), 1)
+        self.assertEqual(doc.dropped_errors, 2)
+        self.assertEqual(tidy.parseString(self.input2).dropped_errors, 0)
+        size = len(self.input2)
+        self.assertIn(
+            "</html>", str(tidy.parseString(self.input2, max_input_size=size))
+        )
+        with self.assertRaisesRegex(tidy.LimitExceededError, "exceeds limit"):
+            tidy.parseString(self.input2, max_input_size=size - 1)
+        with self.assertRaises(tidy.LimitExceededError):
+            tidy.parse(self.test_file, max_input_size=10)
+        with self.assertRaises(tidy.LimitExceededError):
+            tidy.parse(io.BytesIO(self.input2.encode()), max_input_size=10)
+        # Real files are memory mapped
+        with (
+            open(self.test_file, "rb") as handle,  # noqa: PTH123
+            self.assertRaises(tidy.LimitExceededError),
+        ):
+            tidy.parse(handle, max_input_size=10)
+        config = tidy.TidyConfig(max_errors=1)
+        self.assertEqual(len(config.parseString(self.input2).errors), 1)
+
+    def test_memory(self) -> None:
+        doc = tidy.parseString(self.input2)
+        self.assertIsNone(doc.memory_used)
+        self.assertIsNone(doc.memory_peak)
+        with tidy.parseString(self.input2, track_memory=True) as doc:
+            used = doc.memory_used
+            self.assertGreater(used or 0, 0)
+            self.assertGreaterEqual(doc.memory_peak or 0, used or 0)
+        # Values are kept after releasing the document
+        self.assertEqual(doc.memory_used, used)
+        self.assertGreaterEqual(doc.memory_peak or 0, used or 0)
+        with self.assertRaisesRegex(tidy.MemoryLimitError, "exceeding limit"):
+            tidy.parseString(self.input2, max_memory=100)
+        with self.assertRaises(tidy.LimitExceededError):
+            tidy.parse(self.test_file, max_memory=100)
+        with (
+            open(self.test_file, "rb") as handle,  # noqa: PTH123
+            self.assertRaises(tidy.MemoryLimitError),
+        ):
+            tidy.parse(handle, max_memory=100)
+        self.assertIn("</html>", str(tidy.parseString(self.input2, max_memory=10**9)))
+        small = tidy.parseString("<p>small", track_memory=True).memory_peak or 0
+        big = "<p>" + "word " * 400_000
+        with tidy.DocumentPool(track_memory=True, size=1) as pool:
+            with pool.parseString(big) as doc:
+                self.assertGreater(doc.memory_peak or 0, 2_000_000)
+            # Memory of the previous document is not counted
+            with pool.parseString("<p>small", max_memory=small * 2) as doc:
+                self.assertEqual(doc.memory_peak, small)
+            self.assertEqual(len(pool), 0)
+        with tidy.DocumentPool(size=1) as pool:
+            with pool.parseString(big):
+                pass
+            with self.assertRaises(tidy.MemoryLimitError):
+                pool.parseString(big, max_memory=100)
+            with pool.parseString("<p>small", max_memory=small * 2) as doc:
+                self.assertEqual(doc.memory_peak, small)
+            self.assertEqual(len(pool), 1)
+
+    def test_timeout(self) -> None:
+        expected = tidy.parseString(self.input2, max_errors=2)
+        doc = tidy.parseString(self.input2, max_errors=2, timeout=60)
+        self.assertEqual(doc.getvalue(), expected.getvalue())
+        self.assertEqual(str(doc.errors), str(expected.errors))
+        self.assertEqual(doc.dropped_errors, 1)
+        doc = tidy.parse(self.test_file, diagnostics=True, timeout=60)
+        self.assertEqual(doc.gettext(), tidy.parse(self.test_file).gettext())
+        self.assertTrue(doc.diagnostics)
+        with self.assertRaises(tidy.InvalidOptionError):
+            tidy.parseString(self.input2, foo=1, timeout=60)
+        with self.assertRaisesRegex(tidy.LimitExceededError, "longer than"):
+            tidy.parseString(self.input2 * 1000, timeout=0.001)
+        # The killed worker is replaced
+        self.assertIn("</html>", str(tidy.parseString(self.input2, timeout=60)))
+        # Starting a worker does not count to the limit
+        for _ in range(3):
+            tidy.worker.shutdown()
+            self.assertIn("hi", str(tidy.parseString("<p>hi", timeout=0.05)))
+
+    def test_metrics(self) -> None:
+        self.assertIsNone(tidy.parseString(self.input2).metrics)
+        with tidy.metrics.collect(tidy.metrics.Stats(keep_documents=True)) as stats:
+            doc = tidy.parseString(self.input2)
+            output = doc.getvalue()
+            errors = doc.errors
+            with pathlib.Path(self.test_file).open("rb") as handle:
+                tidy.parse(handle).getvalue()
+        # Only documents created in the block are measured
+        self.assertIsNone(tidy.parseString(self.input2).metrics)
+        self.assertEqual(stats.documents, 2)
+        metrics = doc.metrics
+        assert metrics is not None
+        self.assertEqual(stats.document_metrics, [metrics, mock.ANY])
+        self.assertEqual(
+            sorted(metrics.durations), ["clean", "errors", "options", "parse", "save"]
+        )
+        self.assertEqual(metrics.input_size, len(self.input2))
+        self.assertEqual(metrics.output_size, len(output))
+        self.assertEqual(metrics.messages, len(errors))
+        exported = stats.as_dict(prefix="")
+        self.assertEqual(exported["documents"], 2)
+        self.assertEqual(exported["save.calls"], 2)
+        self.assertEqual(
+            exported["input.bytes"],
+            len(self.input2) + pathlib.Path(self.test_file).stat().st_size,
+        )
+        self.assertGreater(exported["parse.seconds"], 0)
+
+    def test_validate(self) -> None:
+        result = tidy.validate(self.input2)
+        self.assertEqual(result.error_count, 0)
+        self.assertEqual(result.warning_count, 3)
+        errors = [str(error) for error in tidy.parseString(self.input2).errors]
+        self.assertEqual([str(item) for item in result.report], errors)
+        result = tidy.validate(self.input2, diagnostics=True)
+        self.assertIsInstance(result.report, tidy.Diagnostics)
+        self.assertEqual(result.warning_count, 3)
+        self.assertEqual(len(result.report), 3)
+        result = tidy.validate(b"<foo>x", diagnostics=True)
+        self.assertEqual(result.error_count, 1)
+        self.assertEqual(
+            {item.severity for item in result.report},
+            {tidy.Severity.INFO, tidy.Severity.WARNING, tidy.Severity.ERROR},
+        )
+        result = tidy.validate_file(self.test_file)
+        self.assertEqual(result.report[0].line, 1)
+        with pathlib.Path(self.test_file).open("rb") as handle:
+            self.assertEqual(tidy.validate_file(handle)[:4], result[:4])
+        result = tidy.validate_file(os.path.join(DATA_STORAGE, "missing.html"))
+        self.assertIn("missing.html", str(result.report[0]))
+
+    def test_error_sink_modes(self) -> None:
+        buffered = [str(error) for error in tidy.parseString(self.input2).errors]
+        tidy.lib.sinkfactory.buffered = False
+        try:
+            unbuffered = [str(error) for error in tidy.parseString(self.input2).errors]
+        finally:
+            tidy.lib.sinkfactory.buffered = True
+        self.assertTrue(buffered)
+        self.assertEqual(buffered, unbuffered)
+
+    def test_threads(self) -> None:
+        def tidy_one(index: int) -> tuple[bytes, list[str]]:
+            text = "<html>\n" + f"<p align=center>{index}</p>\n" * (index % 10)
+            with tidy.parseString(text, tidy_mark=0) as doc:
+                return doc.getvalue(), [str(error) for error in doc.errors]
+
+        indexes = range(2000)
+        expected = [tidy_one(index) for index in indexes]
+        for buffered in (True, False):
+            tidy.lib.sinkfactory.buffered = buffered
+            try:
+                with ThreadPoolExecutor(8) as executor:
+                    results = list(executor.map(tidy_one, indexes))
+            finally:
+                tidy.lib.sinkfactory.buffered = True
+            self.assertEqual(results, expected)
+        self.assertEqual(len(tidy.lib.docfactory), 0)
+        self.assertEqual(len(tidy.lib.sinkfactory), 0)
+
+    def test_parse_many(self) -> None:
+        texts: list[str | bytes | memoryview] = [
+            self.input1,
+            # TidyLib writes no output for documents with errors
+            "<body><foo>bad</foo>",
+            self.input2.encode(),
+            memoryview(self.input2.encode()),
+            "<p>" * 10,
+            self.input1,
+        ]
+        expected = []
+        for text in texts:
+            doc = tidy.parseString(text, show_warnings=0)
+            expected.append((doc.getvalue(), [str(error) for error in doc.errors]))
+        for mode in ("thread", "process"):
+            for ordered in (True, False):
+                results = list(
+                    tidy.parse_many(texts, 2, mode, ordered=ordered, show_warnings=0)
+                )
+                if not ordered:
+                    results.sort()
+                self.assertEqual(
+                    [result.position for result in results], list(range(len(texts)))
+                )
+                self.assertEqual(
+                    [
+                        (result.output, [str(error) for error in result.errors])
+                        for result in results
+                    ],
+                    expected,
+                )
+        with self.assertRaises(ValueError):
+            list(tidy.parse_many(texts, mode="fiber"))
+        with self.assertRaises(ValueError):
+            list(tidy.parse_many(texts, diagnostics=True))
+        with self.assertRaises(ValueError):
+            list(tidy.parse_many(texts, config=tidy.TidyConfig(max_errors=1)))
+
+    def test_parse_fragments_errors(self) -> None:
+        fragments = ["<p>one", "<foo>x", "<p>two", "<p>three", "<p>four"]
+        results = list(tidy.parse_fragments(fragments, batch_size=2))
+        self.assertEqual(
+            [result.output for result in results],
+            [
+                b"<p>one</p>\n",
+                b"",
+                b"<p>two</p>\n",
+                b"<p>three</p>\n",
+                b"<p>four</p>\n",
+            ],
+        )
+        self.assertIn("Error", str(results[1].errors[0]))
+        self.assertEqual(results[0].errors, [])
+
+    def test_parse_fragments(self) -> None:
+        fragments = [
+            "<p>one <b>two</b>",
+            "text\nmore text",
+            "<ul><li>a<li>b</ul>",
+            "<b>unclosed",
+            "<p>" + "word " * 30,
+            "",
+            "<li>misplaced",
+            "<td>cell",
+            '<hr id="utidylib-0">',
+        ]
+        config = tidy.TidyConfig(indent="auto")
+        for results in (
+            tidy.parse_fragments(fragments, batch_size=4, indent="auto"),
+            tidy.parse_fragments(fragments, config=config),
+        ):
+            for fragment, result in zip(fragments, results, strict=True):
+                doc = tidy.parseString(fragment, show_body_only=1, indent="auto")
+                self.assertEqual(
+                    result.output,
+                    doc.getvalue().rstrip(b"\n") + b"\n" if fragment else b"",
+                )
+                self.assertEqual(
+                    [str(error) for error in result.errors],
+                    [str(error) for error in doc.errors],
+                )
+        # Line numbers are relative to the fragment
+        mapped = list(tidy.parse_fragments(["one", "<ul><li>a<li>b</ul>"]))
+        self.assertEqual(
+            [str(error) for error in mapped[1].errors],
+            ["line 1 col 5 - Info: missing optional end tag </li>"],
+        )
+        # Worded as TidyLib reports messages
+        self.assertEqual(
+            [error.err for error in mapped[1].errors],
+            ["line 1 column 5 - Info: missing optional end tag </li>"],
+        )
+        with self.assertRaises(ValueError):
+            list(tidy.parse_fragments(["<p>x"], diagnostics=True))
+
+    def test_aio(self) -> None:
+        async def run() -> tuple[tidy.Document, tidy.Document, tidy.Document]:
+            return await asyncio.gather(
+                tidy.aio.parse_string(self.input1),
+                tidy.aio.parse_string(self.input2.encode(), indent=1),
+                tidy.aio.parse(self.test_file, char_encoding="ascii"),
+            )
+
+        expected = (
+            tidy.parseString(self.input1),
+            tidy.parseString(self.input2.encode(), indent=1),
+            tidy.parse(self.test_file, char_encoding="ascii"),
+        )
+        for doc, other in zip(asyncio.run(run()), expected, strict=True):
+            self.assertEqual(str(doc), str(other))
+            self.assertEqual(
+                [str(error) for error in doc.errors],
+                [str(error) for error in other.errors],
+            )
+        with self.assertRaises(tidy.InvalidOptionError):
+            asyncio.run(tidy.aio.parse_string(self.input1, fooey=True))
+
+    def test_aio_limits(self) -> None:
+        blocker = threading.Event()
+        with ThreadPoolExecutor(1) as executor:
+            executor.submit(blocker.wait)
+            tidier = tidy.aio.AsyncTidy(
+                executor=executor, max_in_flight=1, max_queued=1
+            )
+
+            async def run() -> tidy.Document:
+                cancelled = asyncio.create_task(tidier.parse_string(self.input2))
+                waiting = asyncio.create_task(tidier.parse_string(self.input1))
+                await asyncio.sleep(0)
+                with self.assertRaises(asyncio.QueueFull):
+                    await tidier.parse_string(self.input1)
+                # Cancelling the queued work frees the slot and its document
+                cancelled.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await cancelled
+                blocker.set()
+                return await waiting
+
+            doc = asyncio.run(run())
+        self.assertEqual(str(doc), str(tidy.parseString(self.input1)))
+        self.assertEqual(len(tidy.lib.docfactory), 1)
+
+    def test_cache(self) -> None:
+        store = tidy.cache.MemoryStore(max_entries=2)
+        cache = tidy.cache.TidyCache(store)
+        doc = cache.parseString(self.input2, indent=1)
+        cached = cache.parseString(self.input2.encode(), indent=True)
+        self.assertIsNone(cached.cdoc)
+        self.assertEqual(cached.getvalue(), doc.getvalue())
+        self.assertEqual(str(cached), str(doc))
+        self.assertEqual(
+            [str(error) for error in cached.errors],
+            [str(error) for error in doc.errors],
+        )
+        cache.parseString(self.input2)
+        cache.parse(self.test_file, char_encoding="ascii")
+        self.assertEqual((store.hits, store.misses, store.evictions), (1, 3, 1))
+        self.assertEqual(len(store), 2)
+        self.assertEqual(
+            str(cache.parse(self.test_file, char_encoding="ascii")),
+            str(tidy.parse(self.test_file, char_encoding="ascii")),
+        )
+        self.assertEqual(store.hits, 2)
+        missing = os.path.join(DATA_STORAGE, "missing.html")
+        self.assertEqual(
+            [str(error) for error in cache.parse(missing).errors],
+            [str(error) for error in tidy.parse(missing).errors],
+        )
+        for options in ({"diagnostics": True}, {"max_errors": 1}):
+            expected = tidy.parseString(self.input2, **options)
+            for _ in range(2):
+                doc = cache.parseString(self.input2, **options)
+                self.assertEqual(
+                    list(doc.diagnostics or ()), list(expected.diagnostics or ())
+                )
+                self.assertEqual(doc.dropped_errors, expected.dropped_errors)
+                self.assertEqual(len(doc.errors), len(expected.errors))
+        self.assertEqual(store.hits, 2)
+
+    def test_cache_sqlite(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "cache.sqlite")
+            config = tidy.TidyConfig(tidy_mark=0)
+            store = tidy.cache.SQLiteStore(filename, 2, 1000)
+            cache = tidy.cache.TidyCache(store, config)
+            expected = str(cache.parseString(self.input1))
+            store.close()
+            store = tidy.cache.SQLiteStore(filename, 2, 1000)
+            cache = tidy.cache.TidyCache(store, config)
+            doc = cache.parseString(self.input1)
+            self.assertIsNone(doc.cdoc)
+            self.assertEqual(str(doc), expected)
+            self.assertEqual((store.hits, store.misses), (1, 0))
+            output = os.path.join(tmpdir, "output.html")
+            doc.save(output)
+            self.assertEqual(pathlib.Path(output).read_text(), expected)
+            # Too large to be cached at all, evicts nothing
+            cache.parseString(self.input2)
+            cache.parseString("<p>Hello")
+            cache.parseString("<p>World")
+            self.assertEqual(store.evictions, 1)
+            self.assertEqual(len(store), 2)
+            store.close()
+
+    def test_errors_cached(self) -> None:
+        doc = tidy.parseString(self.input2, show_errors=6, indent=1)
+        report = doc.errsink.getvalue().decode("utf-8")
+        expected = [str(tidy.ReportItem(line)) for line in report.splitlines()]
+        errors = doc.errors
+        self.assertEqual([str(error) for error in errors], expected)
+        errors.clear()
+        self.assertEqual([str(error) for error in doc.errors], expected)
+        self.assertIs(doc.errors[0], doc.errors[0])
+
+    def test_config(self) -> None:
+        options: tidy.lib.OPTION_DICT_TYPE = {
+            "add_xml_decl": 1,
+            "newline": "CR",
+            "output_xhtml": True,
+            "output_encoding": "latin1",
+        }
+        config = tidy.TidyConfig(**options)
+        for _ in range(2):
+            doc = config.parseString(self.input1)
+            self.assertEqual(
+                doc.getvalue(), tidy.parseString(self.input1, **options).getvalue()
+            )
+            self.assertEqual(doc.options["output_encoding"], "latin1")
+        doc = config.parse(self.test_file, alt_text="foo")
+        self.assertIn('alt="foo"', doc.gettext())
+        self.assertIn("é", doc.gettext())
+
+    def test_config_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            filename = os.path.join(tempdir, "tidy.conf")
+            pathlib.Path(filename).write_text(
+                "output-xhtml: yes\ntidy-mark: no\nchar-encoding: latin1\n"
+            )
+            config = tidy.TidyConfig.from_file(filename)
+            marked = tidy.TidyConfig.from_file(filename, tidy_mark=True)
+        self.assertEqual(config.filename, filename)
+        self.assertEqual(config.options["output_encoding"], "latin1")
+        self.assertEqual(config.options["input_encoding"], "latin1")
+        doc = config.parseString("<p>\xe9</p>".encode("latin1"))
+        self.assertIn("xmlns", str(doc))
+        self.assertIn("<p>é</p>", str(doc))
+        self.assertNotIn("generator", str(doc))
+        self.assertIn("generator", str(marked.parseString("<p>x</p>")))
+
+    def test_config_bad_options(self) -> None:
+        with self.assertRaises(tidy.InvalidOptionError):
+            tidy.TidyConfig(foo=1)
+        with self.assertRaises(tidy.OptionArgError):
+            tidy.TidyConfig(indent="---")
+        config = tidy.TidyConfig(indent=1)
+        with self.assertRaises(tidy.InvalidOptionError):
+            config.parseString(self.input1, foo=1)
+        with self.assertRaisesRegex(tidy.TidyLibError, "missing.conf"):
+            tidy.TidyConfig.from_file(os.path.join(DATA_STORAGE, "missing.conf"))
+        with tempfile.TemporaryDirectory() as tempdir:
+            filename = os.path.join(tempdir, "tidy.conf")
+            pathlib.Path(filename).write_text("foo: 1\nindent: ---\n")
+            with self.assertRaises(tidy.InvalidOptionError):
+                tidy.TidyConfig.from_file(filename)
+
+    def test_cli(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            source = pathlib.Path(tempdir) / "src"
+            output = pathlib.Path(tempdir) / "out"
+            (source / "sub").mkdir(parents=True)
+            (source / "sub" / "page.html").write_text(self.input1)
+            (source / "notes.txt").write_text("not tidied")
+            args = ["-d", str(output), "-o", "tidy-mark=no", "-j", "1", str(source)]
+            stderr = io.StringIO()
+            with mock.patch("sys.stderr", stderr):
+                self.assertEqual(tidy.cli.main(args), 0)
+                # Unchanged input is skipped
+                self.assertEqual(tidy.cli.main(args), 0)
+                # Different options invalidate the state
+                self.assertEqual(tidy.cli.main([*args, "-o", "indent=yes"]), 0)
+            self.assertEqual(
+                (output / "sub" / "page.html").read_bytes(),
+                tidy.parseString(self.input1, tidy_mark=0, indent=1).getvalue(),
+            )
+            self.assertFalse((output / "notes.txt").exists())
+            summaries = stderr.getvalue().splitlines()
+            self.assertIn("Tidied 1 files", summaries[0])
+            self.assertIn("Tidied 0 files", summaries[1])
+            self.assertIn("skipped 1 unchanged", summaries[1])
+            self.assertIn("Tidied 1 files", summaries[2])
+
+            page = source / "sub" / "page.html"
+            broken = source / "broken.html"
+            broken.write_text("<body><foo>bad</foo>")
+            other = source / "other.html"
+            other.write_text(self.input2)
+            state = str(pathlib.Path(tempdir) / "state.json")
+            args = ["-i", "--state", state, "-j", "1", str(source)]
+            stderr = io.StringIO()
+            with mock.patch("sys.stderr", stderr):
+                self.assertEqual(tidy.cli.main(args), 1)
+                # The failed file is not skipped as unchanged
+                self.assertEqual(tidy.cli.main(args), 1)
+            self.assertIn(b"<!DOCTYPE html>", page.read_bytes())
+            self.assertIn(b"<!DOCTYPE html>", other.read_bytes())
+            self.assertEqual(broken.read_text(), "<body><foo>bad</foo>")
+            summaries = [
+                line for line in stderr.getvalue().splitlines() if "Tidied" in line
+            ]
+            self.assertIn("Tidied 2 files", summaries[0])
+            self.assertIn("failed 1", summaries[0])
+            self.assertIn("skipped 2 unchanged, failed 1", summaries[1])
+            self.assertIn("broken.html: not written", stderr.getvalue())
+
+        with (
+            mock.patch("sys.stderr", io.StringIO()),
+            self.assertRaises(SystemExit),
+        ):
+            tidy.cli.main(["-i", "-o", "foo=1", "page.html"])
+
+    def test_release(self) -> None:
+        count = len(tidy.lib.docfactory)
+        for _ in range(10):
+            tidy.parseString(self.input1)
+        self.assertEqual(len(tidy.lib.docfactory), count)
+
+    def test_tree(self) -> None:
+        with tidy.parseString(
+            "<!-- note --><title>Caf\xe9</title>"
+            '<p class=intro hidden>One &amp; <a href="/two?a=1&amp;b=2">two</a>'
+            "<script>if (a < b) run()</script><img src=x.png alt=''>",
+            tidy_mark=0,
+        ) as doc:
+            root = doc.root
+            assert root is not None
+            self.assertEqual(root.type, tidy.tree.NodeType.ROOT)
+            self.assertEqual(
+                [node.type for node in root][:2],
+                [tidy.tree.NodeType.COMMENT, tidy.tree.NodeType.DOCTYPE],
+            )
+            self.assertEqual(next(iter(root)).value, " note ")
+            assert doc.head is not None
+            self.assertEqual(doc.head.text(), "Caf\xe9")
+            self.assertEqual(doc.head.parent, doc.html)
+            paragraph = next(doc.iter_elements("P"))
+            self.assertTrue(paragraph.is_element)
+            self.assertEqual(paragraph.attributes, {"class": "intro", "hidden": None})
+            self.assertEqual(paragraph.text(), "One & two")
+            self.assertEqual(paragraph.line, 1)
+            link = next(doc.iter_elements("a"))
+            self.assertEqual(link.get("href"), "/two?a=1&b=2")
+            self.assertIsNone(link.get("title"))
+            self.assertEqual(link.previous, next(iter(paragraph)))
+            self.assertEqual(link.next, next(paragraph.iter_elements("script")))
+            self.assertEqual(
+                [node.name for node in doc.iter_elements()],
+                ["html", "head", "title", "body", "p", "a", "script", "img"],
+            )
+            self.assertEqual(
+                [node.name for node in paragraph], [None, "a", "script", "img"]
+            )
+        with self.assertRaises(ValueError):
+            link.text()
+        with self.assertRaises(ValueError):
+            _ = doc.body
+        self.assertEqual(repr(link), "<Node closed>")
+
+    def test_tree_text(self) -> None:
+        with tidy.parseString(
+            "<title>Page</title><p>Hello</p><p>World</p><ul><li>a<li>b</ul>"
+            "<div><p>x</p>tail<br>after <b>bold</b> end</div>"
+        ) as doc:
+            assert doc.root is not None
+            self.assertEqual(
+                doc.root.text(),
+                "Page\nHello\nWorld\na\nb\nx\ntail\nafter bold end",
+            )
+        with tidy.parseString(
+            "<Root><Item>a</Item><item>b</item></Root>", input_xml=1
+        ) as doc:
+            self.assertEqual([node.text() for node in doc.iter_elements("Item")], ["a"])
+
+    def test_close(self) -> None:
+        with tidy.parseString(self.input2) as doc:
+            errors = [str(error) for error in doc.errors]
+            self.assertIn("</html>", str(doc))
+        self.assertIsNone(doc.cdoc)
+        self.assertEqual([str(error) for error in doc.errors], errors)
+        self.assertIn("</html>", str(doc))
+        doc.close()
+        with tidy.parseString(self.input2) as doc:
+            pass
+        with self.assertRaises(ValueError):
+            doc.getvalue()
+        # The report is parsed on first access only
+        self.assertEqual(doc._errors, [])  # noqa: SLF001
+        self.assertEqual([str(error) for error in doc.errors], errors)
+
+    def test_getvalue_cached(self) -> None:
+        doc = tidy.parseString(self.input2)
+        value = doc.getvalue()
+        self.assertIs(doc.getvalue(), value)
+        self.assertEqual(doc.getbuffer(), value)
+        self.assertTrue(doc.getbuffer().readonly)
+
+    def test_serialize_once(self) -> None:
+        loader = tidy.lib._tidy  # noqa: SLF001
+        backend = loader.backend
+        with (
+            mock.patch.object(
+                backend, "save_buffer", wraps=backend.save_buffer
+            ) as save_buffer,
+            mock.patch.object(
+                backend, "save_text", wraps=backend.save_text
+            ) as save_text,
+            mock.patch.object(loader, "SaveSink", wraps=loader.SaveSink) as save_sink,
+            mock.patch.object(loader, "SaveFile", wraps=loader.SaveFile) as save_file,
+            tempfile.TemporaryDirectory() as tmpdir,
+            tidy.parseString(self.input2) as doc,
+        ):
+            text = str(doc)
+            self.assertEqual(doc.getvalue(), text.encode())
+            stream = io.BytesIO()
+            doc.write(stream, chunk_size=10)
+            self.assertEqual(stream.getvalue(), text.encode())
+            doc.save(os.path.join(tmpdir, "output.html"))
+            self.assertEqual(
+                pathlib.Path(tmpdir, "output.html").read_text(encoding="utf-8"), text
+            )
+        self.assertEqual(save_text.call_count, 1)
+        # Text of the ctypes backend is decoded from save_buffer
+        self.assertEqual(
+            save_buffer.call_count, int(tidy.lib.get_backend() == "ctypes")
+        )
+        self.assertFalse(save_sink.called or save_file.called)
+
+    def test_pool(self) -> None:
+        with tidy.DocumentPool(size=2, output_xhtml=True) as pool:
+            for text in (self.input1, self.input2, self.input1):
+                expected = tidy.parseString(text, output_xhtml=True)
+                with pool.parseString(text) as doc:
+                    self.assertEqual(doc.getvalue(), expected.getvalue())
+                    self.assertEqual(
+                        [str(error) for error in doc.errors],
+                        [str(error) for error in expected.errors],
+                    )
+                self.assertEqual(len(pool), 1)
+            with pool.parse(self.test_file) as doc:
+                self.assertIn("é", doc.gettext())
+            with pool.parseString("<p>caf\xe9", char_encoding="latin1") as doc:
+                self.assertIn(b"caf\xe9", doc.getvalue())
+                self.assertEqual(doc.options["output_encoding"], "latin1")
+            with tidy.parseString(
+                "<p>caf\xe9", char_encoding="latin1", output_xhtml=True
+            ) as expected:
+                self.assertEqual(doc.getvalue(), expected.getvalue())
+            docs = [pool.parseString(self.input1) for _ in range(4)]
+            self.assertEqual(len(pool), 0)
+            for doc in docs:
+                doc.close()
+            self.assertEqual(len(pool), 2)
+            with self.assertRaises(tidy.InvalidOptionError):
+                pool.parseString(self.input1, foo=1)
+            self.assertEqual(len(pool), 2)
+            # Garbage collection can return a handle while the pool is locked
+            with pool._lock:  # noqa: SLF001
+                pool.parseString(self.input1)
+            self.assertEqual(len(pool), 2)
+        self.assertEqual(len(pool), 0)
+
+    def test_pool_errors(self) -> None:
+        with tidy.DocumentPool(size=1) as pool:
+            with pool.parseString("<body><foo>bad</foo>") as doc:
+                self.assertEqual(doc.getvalue(), b"")
+            # The handle which reported an error is not reused
+            self.assertEqual(len(pool), 0)
+            with pool.parseString("<p>ok") as doc:
+                self.assertIn(b"<p>ok</p>", doc.getvalue())
+            self.assertEqual(len(pool), 1)
+
+    def test_pool_recycle(self) -> None:
+        with (
+            mock.patch.object(tidy.lib, "HANDLE_USES", 2),
+            tidy.DocumentPool(size=1) as pool,
+        ):
+            with pool.parseString(self.input1):
+                pass
+            self.assertEqual(len(pool), 1)
+            with pool.parseString(self.input1):
+                pass
+            # Released after reaching the limit
+            self.assertEqual(len(pool), 0)
+
+    def test_live_objects(self) -> None:
+        before = tidy.metrics.live_objects()
+        with tidy.parseString(self.input2, diagnostics=True):
+            live = tidy.metrics.live_objects()
+            self.assertEqual(live.diagnostics, before.diagnostics + 1)
+        str(tidy.parseString(self.input1))
+        tidy.parse(self.test_file + ".missing").close()
+        tidy.validate(self.input2)
+        with self.assertRaises(tidy.InvalidOptionError):
+            tidy.parseString(self.input1, foo=1)
+        with self.assertRaises(tidy.OptionArgError):
+            tidy.parseString(self.input1, indent="bogus")
+        with self.assertRaises(tidy.MemoryLimitError):
+            tidy.parseString(self.input2, max_memory=100)
+        with tidy.DocumentPool(size=1) as pool, pool.parseString(self.input1):
+            pass
+        # Configuration of the pool holds a template document
+        del pool
+        self.assertEqual(tidy.metrics.live_objects(), before)
+        doc = tidy.parseString(self.input1)
+        live = tidy.metrics.live_objects()
+        self.assertEqual(live.documents, before.documents + 1)
+        self.assertEqual(live.handles, before.handles + 1)
+        doc.close()
+        # The closed document is still referenced
+        self.assertEqual(tidy.metrics.live_objects().handles, before.handles)
+        del doc
+        self.assertEqual(tidy.metrics.live_objects(), before)
+
+    def test_allocator_reclaim(self) -> None:
+        if tidy.lib.get_backend() != "ctypes":
+            self.skipTest("Blocks of the native allocator are not visible")
+        with tidy.parseString(self.input2, track_memory=True) as doc:
+            address = doc._allocator  # noqa: SLF001
+            assert address is not None
+            self.assertTrue(tidy.lib._blocks[address])  # noqa: SLF001
+        # Blocks left by TidyLib are freed with the allocator
+        self.assertNotIn(address, tidy.lib._blocks)  # noqa: SLF001
+
     def test_report_item(self) -> None:
         item = tidy.ReportItem("Invalid: error")
         self.assertEqual(item.get_severity(), "Invalid")
@@ -129,42 +975,94 @@ class TidyTestCase(unittest.TestCase):
     def test_missing_load(self) -> None:
         with self.assertRaises(OSError):
             tidy.lib.Loader(libnames=("not-existing-library",))
+        loader = tidy.lib.Loader(libnames=("not-existing-library",), lazy=True)
+        with self.assertRaises(OSError):
+            loader.Create()
 
-    def test_lib_from_environ(self) -> None:
-        os.environ["TIDY_LIBRARY_FULL_PATH"] = "/foo/bar/tidy"
+    def test_prototypes(self) -> None:
         loader = tidy.lib.Loader()
-        expected_libnames = (
-            "/foo/bar/tidy",
-            "/opt/homebrew/lib/libtidy.dylib",
-            "/opt/homebrew/lib/libtidy.5.dylib",
-            "/opt/homebrew/lib/libtidy.58.dylib",
-            "/usr/local/lib/libtidy.dylib",
-            "/usr/local/lib/libtidy.5.dylib",
-            "/usr/local/lib/libtidy.58.dylib",
-            "C:/ProgramData/chocolatey/lib/html-tidy/tools/tidy-5.9.14-win64/bin/tidy.dll",
-            "C:/ProgramData/chocolatey/lib/html-tidy/tools/bin/tidy.dll",
-            "C:/Program Files/tidy-html5/bin/tidy.dll",
-            "C:/tools/tidy-html5/bin/tidy.dll",
-            "libtidy.so",
-            "libtidy.dylib",
-            "tidy.dll",
-            "tidy",
-            "cygtidy-0-99-0",
-            "libtidy-0.99.so.0",
-            "libtidy-0.99.so.0.0.0",
-            "libtidy.so.5",
-            "libtidy.so.58",
-            "libtidy.so.5deb1",
-            "libtidy.dll",
-            "libtidy",
-            "tidylib.dll",
-            "tidylib",
-        )
-        self.assertEqual(loader.libnames, expected_libnames)
+        for name, (restype, argtypes) in tidy.lib.PROTOTYPES.items():
+            function = vars(loader)[name]
+            self.assertEqual(function.restype, restype)
+            self.assertEqual(tuple(function.argtypes), argtypes)
+        cdoc = loader.Create()
+        # Full 64-bit pointer is kept
+        self.assertIsInstance(cdoc, int)
+        self.assertEqual(loader.OptParseValue(cdoc, b"indent", b"yes"), 1)
+        loader.Release(cdoc)
+
+    def test_old_library(self) -> None:
+        class OldLibrary(ctypes.CDLL):
+            def __getattr__(self, name: str) -> Any:  # noqa: ANN401
+                if name.removeprefix("tidy") in tidy.lib.OPTIONAL_FUNCTIONS:
+                    raise AttributeError(name)
+                return super().__getattr__(name)
+
+        with mock.patch("ctypes.CDLL", OldLibrary):
+            loader = tidy.lib.Loader()
+        self.assertEqual(loader.missing, tidy.lib.OPTIONAL_FUNCTIONS)
+        with mock.patch.object(tidy.lib, "_tidy", loader):
+            with tidy.parseString(self.input1) as doc:
+                self.assertIn(b"<script>", doc.getvalue())
+            for options in (
+                {"diagnostics": True},
+                {"max_errors": 1},
+                {"track_memory": True},
+                {"max_memory": 1000},
+            ):
+                with (
+                    self.subTest(options=options),
+                    self.assertRaisesRegex(tidy.TidyLibError, "not supported by"),
+                ):
+                    tidy.parseString(self.input1, **options)
+
+    def test_platform_libnames(self) -> None:
+        self.assertTrue(tidy.lib.PLATFORM_LIBNAMES)
+        self.assertTrue(set(tidy.lib.PLATFORM_LIBNAMES) < set(tidy.lib.LIBNAMES))
+        for libname in tidy.lib.PLATFORM_LIBNAMES:
+            if os.name == "nt":
+                self.assertNotIn(".so", libname)
+            else:
+                self.assertNotIn(".dll", libname)
+
+    def test_lib_from_environ(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = pathlib.Path(tmpdir) / "library"
+            os.environ["TIDY_LIBRARY_CACHE"] = str(cache)
+            os.environ["TIDY_LIBRARY_FULL_PATH"] = "/foo/bar/tidy"
+            try:
+                loader = tidy.lib.Loader()
+                self.assertEqual(loader.libnames[0], "/foo/bar/tidy")
+                libname = loader.libnames[-1]
+                self.assertEqual(cache.read_text(encoding="utf-8"), libname)
+                del os.environ["TIDY_LIBRARY_FULL_PATH"]
+                # The library is loaded from the cached path at first attempt
+                self.assertEqual(tidy.lib.Loader().libnames, (libname,))
+            finally:
+                os.environ.pop("TIDY_LIBRARY_FULL_PATH", None)
+                del os.environ["TIDY_LIBRARY_CACHE"]
 
     def test_lib_version(self) -> None:
         self.assertEqual(len(tidy.lib.getTidyVersion().split(".")), 3)
 
+    def test_backend(self) -> None:
+        backend = tidy.lib.get_backend()
+        self.assertIn(backend, tidy.lib.BACKENDS)
+        self.assertEqual(tidy.lib.set_backend("ctypes"), "ctypes")
+        tidy.lib.set_backend(backend)
+        with self.assertRaises(ValueError):
+            tidy.lib.set_backend("fortran")
+
+
+@unittest.skipIf(tidy.lib.get_backend() == "ctypes", "Native backend is not used")
+class CtypesTidyTestCase(TidyTestCase):
+    """Run the tests with the ctypes backend as well."""
+
+    def setUp(self) -> None:
+        backend = tidy.lib.get_backend()
+        tidy.lib.set_backend("ctypes")
+        self.addCleanup(tidy.lib.set_backend, backend)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,205 @@
+"""
+Read-only view of the tree of a tidied document.
+
+Nodes are thin wrappers of TidyLib nodes created on access, data is read
+from TidyLib without serializing and parsing the document again:
+
+>>> import tidy
+>>> doc = tidy.parseString('<title>Page</title><p>Hello <a href="/world">world')
+>>> doc.head.text()
+'Page'
+>>> [link.get("href") for link in doc.iter_elements("a")]
+['/world']
+>>> doc.body.text()
+'Hello world'
+
+Nodes are valid only until the document is closed, accessing them later
+raises :exc:`ValueError`. Documents tidied in another process, such as with
+the ``timeout`` option, have no tree.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import enum
+from typing import TYPE_CHECKING
+
+from tidy.lib import _tidy, _TidyBuffer
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from tidy.lib import Document
+
+__all__ = ("Node", "NodeType")
+
+
+class NodeType(enum.IntEnum):
+    """Type of a node, values of TidyLib ``TidyNodeType``."""
+
+    ROOT = 0
+    DOCTYPE = 1
+    COMMENT = 2
+    PROCESSING_INSTRUCTION = 3
+    TEXT = 4
+    START = 5
+    END = 6
+    START_END = 7
+    CDATA = 8
+    SECTION = 9
+    ASP = 10
+    JSTE = 11
+    PHP = 12
+    XML_DECL = 13
+
+
+ELEMENT_TYPES = frozenset((NodeType.START.value, NodeType.START_END.value))
+
+
+class Node:
+    """
+    Node of a document tree, see :attr:`tidy.Document.root`.
+
+    Iterating over a node yields its children. Nodes compare equal when
+    they wrap the same TidyLib node.
+    """
+
+    __slots__ = ("_pointer", "document")
+
+    def __init__(self, document: Document, pointer: int) -> None:
+        self.document = document  #: Document the node belongs to
+        self._pointer = pointer
+
+    def _check(self) -> None:
+        if self.document.cdoc is None:
+            raise ValueError("Document is closed")
+
+    def _wrap(self, pointer: int | None) -> Node | None:
+        return None if pointer is None else Node(self.document, pointer)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Node):
+            return NotImplemented
+        return self._pointer == other._pointer
+
+    def __hash__(self) -> int:
+        return hash(self._pointer)
+
+    def __repr__(self) -> str:
+        if self.document.cdoc is None:
+            return f"<{self.__class__.__name__} closed>"
+        return f"<{self.__class__.__name__} {self.type.name} {self.name!r}>"
+
+    @property
+    def type(self) -> NodeType:
+        """Type of the node."""
+        self._check()
+        return NodeType(_tidy.NodeGetType(self._pointer))
+
+    @property
+    def name(self) -> str | None:
+        """Lowercase name of an element, ``None`` for text and comments."""
+        self._check()
+        name = _tidy.NodeGetName(self._pointer)
+        return None if name is None else name.decode("utf-8")
+
+    @property
+    def is_element(self) -> bool:
+        """Whether the node is an element."""
+        return self.type in ELEMENT_TYPES
+
+    @property
+    def line(self) -> int:
+        """Line of the node in the input, 0 for inserted nodes."""
+        self._check()
+        return _tidy.NodeLine(self._pointer)
+
+    @property
+    def column(self) -> int:
+        """Column of the node in the input, 0 for inserted nodes."""
+        self._check()
+        return _tidy.NodeColumn(self._pointer)
+
+    @property
+    def attributes(self) -> dict[str, str | None]:
+        """Attributes of an element, ``None`` values for attributes without one."""
+        self._check()
+        result = {}
+        attr = _tidy.AttrFirst(self._pointer)
+        while attr is not None:
+            value = _tidy.AttrValue(attr)
+            result[_tidy.AttrName(attr).decode("utf-8")] = (
+                None if value is None else value.decode("utf-8")
+            )
+            attr = _tidy.AttrNext(attr)
+        return result
+
+    def get(self, name: str, default: str | None = None) -> str | None:
+        """Return value of the attribute, or default when it is missing."""
+        return self.attributes.get(name, default)
+
+    @property
+    def value(self) -> str | None:
+        """Content of text, comment and CDATA nodes, ``None`` for elements."""
+        self._check()
+        buffer = _TidyBuffer()
+        _tidy.BufInit(ctypes.byref(buffer))
+        try:
+            if not _tidy.NodeGetValue(
+                self.document.cdoc, self._pointer, ctypes.byref(buffer)
+            ):
+                return None
+            return ctypes.string_at(buffer.bp, buffer.size).decode("utf-8")
+        finally:
+            _tidy.BufFree(ctypes.byref(buffer))
+
+    @property
+    def parent(self) -> Node | None:
+        """Parent node, ``None`` for the root."""
+        self._check()
+        return self._wrap(_tidy.GetParent(self._pointer))
+
+    @property
+    def next(self) -> Node | None:
+        """Next sibling node."""
+        self._check()
+        return self._wrap(_tidy.GetNext(self._pointer))
+
+    @property
+    def previous(self) -> Node | None:
+        """Previous sibling node."""
+        self._check()
+        return self._wrap(_tidy.GetPrev(self._pointer))
+
+    def __iter__(self) -> Iterator[Node]:
+        self._check()
+        child = _tidy.GetChild(self._pointer)
+        while child is not None:
+            yield Node(self.document, child)
+            self._check()
+            child = _tidy.GetNext(child)
+
+    def iter_elements(self, tag: str | None = None) -> Iterator[Node]:
+        """
+        Iterate over descendant elements in document order.
+
+        :param tag: yield only elements with this name
+        """
+        self._check()
+        # Names of XML elements are case-sensitive, TidyLib lowercases HTML ones
+        if tag is not None and not self.document._get_bool("input_xml"):  # noqa: SLF001
+            tag = tag.lower()
+        for pointer in _tidy.backend.elements(self._pointer, tag):
+            # The document might have been closed meanwhile
+            self._check()
+            yield Node(self.document, pointer)
+
+    def text(self) -> str:
+        """
+        Return text of the node and its descendants, except scripts and styles.
+
+        Text of block elements, such as paragraphs or list items, and text
+        around line breaks is separated by newlines.
+        """
+        self._check()
+        return _tidy.backend.text(self.document.cdoc, self._pointer).decode("utf-8")
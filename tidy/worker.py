@@ -0,0 +1,159 @@
+"""
+Tidying in worker processes which can be killed.
+
+Used by :func:`tidy.parse` and :func:`tidy.parseString` to enforce the
+``timeout`` option, TidyLib can not be interrupted otherwise. Idle workers
+are kept for reuse, a worker exceeding the time limit is killed. The limit
+applies to tidying only, starting a worker does not count.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import threading
+from typing import TYPE_CHECKING, Any
+
+from tidy.error import LimitExceededError, TidyLibError
+from tidy.lib import (
+    DOCUMENT_OPTIONS,
+    Document,
+    ReportItem,
+    _Messages,
+    _tidy,
+    docfactory,
+)
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+    from multiprocessing.process import BaseProcess
+
+    from tidy.lib import OPTION_DICT_TYPE
+
+    # Tidied output, raw report lines and message handling
+    RESULT_TYPE = tuple[bytes, list[str], _Messages | None]
+
+__all__ = ("shutdown",)
+
+# Workers are started fresh, forking a process with running threads and
+# loaded TidyLib is not safe
+_context = multiprocessing.get_context("spawn")
+
+
+def _tidy_request(
+    kind: str, source: str | bytes, options: OPTION_DICT_TYPE
+) -> RESULT_TYPE:
+    with docfactory.create(config=None, **options) as doc:
+        if kind == "file":
+            assert isinstance(source, str)
+            docfactory.loadFile(doc, source)
+        else:
+            docfactory.loadString(doc, source)
+        output = doc.getvalue()
+        return output, [error.err for error in doc.errors], doc._messages  # noqa: SLF001
+
+
+def _serve(connection: Connection) -> None:
+    """Tidy documents sent over the connection until it is closed."""
+    _tidy.load()
+    # Requests are sent once the worker is ready
+    connection.send(None)
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+        try:
+            result = _tidy_request(*request)
+        except Exception as error:  # noqa: BLE001
+            connection.send((False, error))
+        else:
+            connection.send((True, result))
+
+
+class _Worker:
+    def __init__(self) -> None:
+        self.connection, child = _context.Pipe()
+        self.process: BaseProcess = _context.Process(
+            target=_serve, args=(child,), daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    def call(
+        self, request: tuple[str, str | bytes, OPTION_DICT_TYPE], timeout: float
+    ) -> Any:  # noqa: ANN401
+        try:
+            if not self.ready:
+                # Not limited, importing tidy takes a while
+                self.connection.recv()
+                self.ready = True
+            self.connection.send(request)
+            if not self.connection.poll(timeout):
+                msg = f"Tidying took longer than {timeout} seconds"
+                raise LimitExceededError(msg)
+            return self.connection.recv()
+        except (EOFError, OSError):
+            msg = f"Worker process exited with code {self.process.exitcode}"
+            raise TidyLibError(msg) from None
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+_idle: list[_Worker] = []
+_lock = threading.Lock()
+
+
+def run(
+    kind: str,
+    source: str | bytes,
+    options: OPTION_DICT_TYPE,
+    timeout: float,
+) -> Document:
+    """
+    Tidy in a worker process and return a detached document.
+
+    :param kind: ``"file"`` for a file name, ``"string"`` for text
+    :param source: the file name or the text
+    :param options: named options to pass to TidyLib
+    :param timeout: time limit in seconds
+    """
+    with _lock:
+        worker = _idle.pop() if _idle else None
+    if worker is None:
+        worker = _Worker()
+    try:
+        success, result = worker.call((kind, source, options), timeout)
+    except BaseException:
+        # Still tidying, crashed or interrupted in an unknown state
+        worker.kill()
+        raise
+    with _lock:
+        _idle.append(worker)
+    if not success:
+        raise result
+    output, errors, messages = result
+    doc = Document.detached(
+        output,
+        [ReportItem(error) for error in errors],
+        {
+            name: value
+            for name, value in options.items()
+            if name not in DOCUMENT_OPTIONS
+        },
+    )
+    if messages is not None:
+        doc._set_messages(messages)  # noqa: SLF001
+    return doc
+
+
+def shutdown() -> None:
+    """Stop idle worker processes."""
+    with _lock:
+        idle = _idle[:]
+        _idle.clear()
+    for worker in idle:
+        worker.kill()